@@ -0,0 +1,16 @@
+"""
+Celery application for background jobs (price comparison queue, etc.).
+
+Start a worker with:
+    celery -A jadeed_gadgets worker -l info
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'jadeed_gadgets.settings')
+
+app = Celery('jadeed_gadgets')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -176,6 +176,17 @@ CACHE_MIDDLEWARE_ALIAS = 'default'
 CACHE_MIDDLEWARE_SECONDS = 300
 CACHE_MIDDLEWARE_KEY_PREFIX = 'jadeed_gadgets'
 
+# Celery (background tasks)
+# Tasks go through the broker to a worker (celery -A jadeed_gadgets worker),
+# keeping re-matching off the request path. If the broker is down, queued
+# products wait in PendingComparison and are drained when a worker starts.
+# CELERY_TASK_ALWAYS_EAGER=true runs tasks in-process for local development
+# without a broker.
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+CELERY_TASK_ALWAYS_EAGER = os.environ.get('CELERY_TASK_ALWAYS_EAGER', 'false').lower() == 'true'
+CELERY_TASK_EAGER_PROPAGATES = True
+CELERY_TIMEZONE = TIME_ZONE
+
 # Static files optimization
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
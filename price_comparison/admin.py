@@ -1,11 +1,13 @@
 from django.contrib import admin
-from .models import CompetitorProduct, ProductComparison, PriceHistory, ScrapingLog
+from .models import (
+    CompetitorProduct, ProductComparison, CompetitorMatch, ComparisonCandidate, PriceHistory, DailyPrice, ScrapingLog
+)
 
 
 @admin.register(CompetitorProduct)
 class CompetitorProductAdmin(admin.ModelAdmin):
     list_display = ['title', 'competitor', 'price', 'timestamp', 'is_active']
-    list_filter = ['competitor', 'is_active', 'timestamp']
+    list_filter = ['competitor', 'is_active', 'brand', 'timestamp']
     search_fields = ['title']
     ordering = ['-timestamp']
     list_per_page = 50
@@ -13,13 +15,31 @@ class CompetitorProductAdmin(admin.ModelAdmin):
 
 @admin.register(ProductComparison)
 class ProductComparisonAdmin(admin.ModelAdmin):
-    list_display = ['seller_product', 'paklap_price_difference', 'priceoye_price_difference', 'last_compared']
-    list_filter = ['last_compared', 'seller_product__category']
+    list_display = ['seller_product', 'competitive_status', 'best_competitor_price', 'last_compared']
+    list_filter = ['competitive_status', 'last_compared', 'category']
     search_fields = ['seller_product__name']
     readonly_fields = ['last_compared']
     ordering = ['-last_compared']
 
 
+@admin.register(CompetitorMatch)
+class CompetitorMatchAdmin(admin.ModelAdmin):
+    list_display = ['seller_product', 'competitor', 'competitor_product', 'price_difference', 'confidence', 'pinned']
+    list_filter = ['competitor', 'pinned']
+    search_fields = ['seller_product__name', 'competitor_product__title']
+    raw_id_fields = ['seller_product', 'competitor_product']
+    ordering = ['seller_product', 'competitor']
+
+
+@admin.register(ComparisonCandidate)
+class ComparisonCandidateAdmin(admin.ModelAdmin):
+    list_display = ['seller_product', 'competitor', 'rank', 'competitor_product', 'score']
+    list_filter = ['competitor']
+    search_fields = ['seller_product__name', 'competitor_product__title']
+    raw_id_fields = ['seller_product', 'competitor_product']
+    ordering = ['seller_product', 'competitor', 'rank']
+
+
 @admin.register(PriceHistory)
 class PriceHistoryAdmin(admin.ModelAdmin):
     list_display = ['competitor_product', 'old_price', 'new_price', 'price_change', 'changed_at']
@@ -36,9 +56,17 @@ class PriceHistoryAdmin(admin.ModelAdmin):
     price_change.short_description = 'Price Change'
 
 
+@admin.register(DailyPrice)
+class DailyPriceAdmin(admin.ModelAdmin):
+    list_display = ['competitor_product', 'day', 'min_price', 'max_price', 'last_price', 'changes']
+    list_filter = ['day', 'competitor_product__competitor']
+    search_fields = ['competitor_product__title']
+    ordering = ['-day']
+
+
 @admin.register(ScrapingLog)
 class ScrapingLogAdmin(admin.ModelAdmin):
-    list_display = ['competitor', 'status', 'products_scraped', 'new_products', 'updated_products', 'started_at', 'duration']
+    list_display = ['competitor', 'status', 'products_scraped', 'new_products', 'updated_products', 'pages_processed', 'pages_skipped', 'started_at', 'duration']
     list_filter = ['competitor', 'status', 'started_at']
     ordering = ['-started_at']
     readonly_fields = ['started_at', 'completed_at']
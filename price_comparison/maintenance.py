@@ -0,0 +1,176 @@
+"""Catalog maintenance: the daily price rollup and merging duplicate listings.
+
+roll_up_price_history runs on every price change; the rest back the
+compact_price_history and dedupe_competitor_products commands.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+from .matching import listing_key
+from .models import CompetitorProduct, CompetitorMatch, ComparisonCandidate, CompetitorChange, PriceHistory, DailyPrice
+
+
+def roll_up_price_history(history, rebuild=False):
+    """Fold PriceHistory rows into their DailyPrice rollups; returns the rollups written.
+    
+    The stored days are merged with `history` using one read and one
+    upsert. With rebuild=True the days are replaced instead, so `history`
+    has to hold every row of the days it touches.
+    """
+    days = {}
+    for row in sorted(history, key=lambda row: row.changed_at):
+        key = (row.competitor_product_id, timezone.localdate(row.changed_at))
+        rollup = days.get(key)
+        if rollup is None:
+            rollup = days[key] = DailyPrice(
+                competitor_product_id=key[0], day=key[1], min_price=row.old_price, max_price=row.old_price,
+                last_price=row.new_price, changes=0
+            )
+        rollup.min_price = min(rollup.min_price, row.old_price, row.new_price)
+        rollup.max_price = max(rollup.max_price, row.old_price, row.new_price)
+        rollup.last_price = row.new_price
+        rollup.changes += 1
+    if not days:
+        return []
+    
+    if not rebuild:
+        product_ids = {product_id for product_id, _ in days}
+        for stored in DailyPrice.objects.filter(
+            competitor_product_id__in=product_ids, day__in={day for _, day in days}
+        ):
+            rollup = days.get((stored.competitor_product_id, stored.day))
+            if rollup is not None:
+                rollup.min_price = min(rollup.min_price, stored.min_price)
+                rollup.max_price = max(rollup.max_price, stored.max_price)
+                rollup.changes += stored.changes
+    
+    return DailyPrice.objects.bulk_create(
+        list(days.values()), batch_size=500,
+        update_conflicts=True, unique_fields=['competitor_product', 'day'],
+        update_fields=['min_price', 'max_price', 'last_price', 'changes']
+    )
+
+
+def compact_price_history(keep_days=90, batch_size=5000):
+    """Rebuild the daily rollup from raw PriceHistory older than keep_days, then delete those rows.
+    
+    The cutoff is a local midnight so every compacted day is complete.
+    keep_days=None rebuilds the rollup from all raw history and deletes
+    nothing (a one-off backfill). Returns (rollups written, rows deleted).
+    """
+    history = PriceHistory.objects.all()
+    if keep_days is not None:
+        cutoff_day = timezone.localdate() - timedelta(days=keep_days)
+        cutoff = timezone.make_aware(datetime.combine(cutoff_day, datetime.min.time()))
+        history = history.filter(changed_at__lt=cutoff)
+    
+    # Rows of one product stay in the same batch so each of its days is rebuilt whole
+    rolled_up, batch = 0, []
+    for row in history.order_by('competitor_product_id', 'changed_at').only(
+        'id', 'competitor_product_id', 'old_price', 'new_price', 'changed_at'
+    ).iterator(chunk_size=batch_size):
+        if len(batch) >= batch_size and row.competitor_product_id != batch[-1].competitor_product_id:
+            rolled_up += len(roll_up_price_history(batch, rebuild=True))
+            batch = []
+        batch.append(row)
+    rolled_up += len(roll_up_price_history(batch, rebuild=True))
+    
+    deleted = history.delete()[0] if keep_days is not None else 0
+    return rolled_up, deleted
+
+
+def fold_duplicate_listings(survivor, duplicate_ids):
+    """Move the history, changes, candidates and matches of duplicate listings onto survivor, then delete them"""
+    PriceHistory.objects.filter(competitor_product_id__in=duplicate_ids).update(competitor_product=survivor)
+    CompetitorChange.objects.filter(competitor_product_id__in=duplicate_ids).update(competitor_product=survivor)
+    # A seller product has one match per competitor, so it can't already be matched to the survivor
+    CompetitorMatch.objects.filter(competitor_product_id__in=duplicate_ids).update(competitor_product=survivor)
+    
+    # Rollup days the survivor already has absorb the duplicates' ranges; its last price stays current
+    days = {rollup.day: rollup for rollup in DailyPrice.objects.filter(competitor_product=survivor)}
+    rollups = set()
+    for rollup in DailyPrice.objects.filter(competitor_product_id__in=duplicate_ids).order_by('day'):
+        kept = days.get(rollup.day)
+        if kept is None:
+            rollup.competitor_product = survivor
+            days[rollup.day] = kept = rollup
+        else:
+            kept.min_price = min(kept.min_price, rollup.min_price)
+            kept.max_price = max(kept.max_price, rollup.max_price)
+            kept.changes += rollup.changes
+        rollups.add(kept)
+    DailyPrice.objects.bulk_update(
+        rollups, ['competitor_product', 'min_price', 'max_price', 'changes'], batch_size=500
+    )
+    
+    # Candidates are unique per seller product and listing; keep the best ranked one of each product
+    ranked = set(
+        ComparisonCandidate.objects.filter(competitor_product=survivor).values_list('seller_product_id', flat=True)
+    )
+    candidates = []
+    for candidate in ComparisonCandidate.objects.filter(competitor_product_id__in=duplicate_ids).order_by('rank'):
+        if candidate.seller_product_id not in ranked:
+            ranked.add(candidate.seller_product_id)
+            candidate.competitor_product = survivor
+            candidates.append(candidate)
+    ComparisonCandidate.objects.bulk_update(candidates, ['competitor_product'], batch_size=500)
+    
+    # Whatever wasn't moved goes with the duplicates
+    CompetitorProduct.objects.filter(pk__in=duplicate_ids).delete()
+
+
+def dedupe_competitor_products(competitor=None, dry_run=False):
+    """Recompute every listing's url_key and fold listings sharing a key into one survivor.
+    
+    Rows written before listings were keyed on their URL, or before the
+    canonicalization in listing_key changed, can describe the same listing.
+    The survivor is the one seen most recently (active first, then the
+    latest scrape generation); see fold_duplicate_listings for what it
+    inherits. Returns (listings rekeyed, duplicates merged).
+    """
+    listings = CompetitorProduct.objects.all()
+    if competitor:
+        listings = listings.filter(competitor=competitor)
+    
+    groups = defaultdict(list)
+    for listing in listings.only(
+        'id', 'title', 'url', 'url_key', 'competitor', 'is_active', 'scrape_generation', 'timestamp'
+    ).iterator(chunk_size=2000):
+        groups[listing.competitor, listing_key(listing.url, listing.title)].append(listing)
+    
+    merges, rekeyed = [], []
+    for (_, key), group in groups.items():
+        group.sort(key=lambda listing: (listing.is_active, listing.scrape_generation, listing.timestamp, listing.pk))
+        survivor = group.pop()
+        if group:
+            merges.append((survivor, [listing.pk for listing in group]))
+        if survivor.url_key != key:
+            survivor.url_key = key
+            rekeyed.append(survivor)
+    merged = sum(len(duplicate_ids) for _, duplicate_ids in merges)
+    if dry_run:
+        return len(rekeyed), merged
+    
+    # Imported here because services imports this module for the price rollup
+    from .services import PriceComparisonService, bump_catalog_version
+    
+    with transaction.atomic():
+        for survivor, duplicate_ids in merges:
+            fold_duplicate_listings(survivor, duplicate_ids)
+        
+        # Park the new keys first, so rows trading keys can't trip the unique index half way
+        keys = {listing.pk: listing.url_key for listing in rekeyed}
+        for listing in rekeyed:
+            listing.url_key = f'~{listing.pk}'
+        CompetitorProduct.objects.bulk_update(rekeyed, ['url_key'], batch_size=500)
+        for listing in rekeyed:
+            listing.url_key = keys[listing.pk]
+        CompetitorProduct.objects.bulk_update(rekeyed, ['url_key'], batch_size=500)
+        
+        # Matches moved onto a survivor still hold the duplicate's price difference
+        PriceComparisonService().refresh_price_differences([survivor.pk for survivor, _ in merges])
+        bump_catalog_version({listing.competitor for listing in rekeyed} | {survivor.competitor for survivor, _ in merges})
+    return len(rekeyed), merged
@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand
+from price_comparison.models import CompetitorProduct, SellerProductFeatures
+from price_comparison.services import PriceComparisonService, bump_catalog_version
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Precompute match features for competitor and seller products'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--competitor',
+            type=str,
+            help='Backfill competitor products for a specific competitor only (paklap/priceoye)',
+            choices=['paklap', 'priceoye']
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of rows written per bulk update'
+        )
+        parser.add_argument(
+            '--skip-sellers',
+            action='store_true',
+            help='Only backfill competitor products',
+        )
+
+    def handle(self, *args, **options):
+        competitor = options.get('competitor')
+        batch_size = options['batch_size']
+        comparison_service = PriceComparisonService()
+        
+        # Competitor side: recompute every row, write back only the ones that changed
+        competitor_products = CompetitorProduct.objects.all()
+        if competitor:
+            competitor_products = competitor_products.filter(competitor=competitor)
+        
+        changed = []
+        for competitor_product in competitor_products.only('id', 'title', 'competitor', *CompetitorProduct.FEATURE_FIELDS).iterator(chunk_size=batch_size):
+            columns = comparison_service.match_feature_columns(competitor_product.title)
+            if any(getattr(competitor_product, field) != value for field, value in columns.items()):
+                competitor_product.set_match_features(columns)
+                changed.append(competitor_product)
+        
+        # bulk_update skips the pre_save signals, which is what we want here
+        CompetitorProduct.objects.bulk_update(changed, CompetitorProduct.FEATURE_FIELDS, batch_size=batch_size)
+        bump_catalog_version({competitor_product.competitor for competitor_product in changed})
+        self.stdout.write(f"✅ Updated match features for {len(changed)} competitor products")
+        
+        if options['skip_sellers']:
+            return
+        
+        # Seller side: only laptops are ever compared
+        refreshed = 0
+        products = Product.objects.filter(category='laptop').select_related('match_features')
+        for product in products.iterator(chunk_size=batch_size):
+            try:
+                stored = product.match_features
+            except SellerProductFeatures.DoesNotExist:
+                stored = None
+            if stored is None or stored.source_name != product.name:
+                comparison_service.store_product_features(product)
+                refreshed += 1
+        
+        self.stdout.write(f"✅ Updated match features for {refreshed} seller products")
@@ -0,0 +1,286 @@
+import json
+import random
+import re
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from price_comparison.matching import clean_product_name, extract_key_features
+from price_comparison.models import CompetitorProduct
+from price_comparison.services import SCORERS, CompetitorBlockIndex, PriceComparisonService
+
+DEFAULT_CORPUS = Path(__file__).resolve().parents[2] / 'testdata' / 'matching_pairs_v1.json'
+
+# Spec and wording variations used to grow the labelled corpus into a large catalog
+RAM_SIZES = ['8GB', '16GB', '24GB', '32GB']
+STORAGE_SIZES = ['256GB SSD', '512GB SSD', '1TB SSD', '2TB SSD']
+COLOURS = ['Silver', 'Grey', 'Black', 'Blue', 'Natural Silver', 'Mica Silver']
+SUFFIXES = ['NEW', 'Open Box', 'DOS', 'Win 11', 'Local Warranty', 'Backlit KB']
+
+
+def load_pair_corpus(path):
+    """Load a labelled (seller title, competitor title, is_match) pair corpus"""
+    try:
+        with open(path, encoding='utf-8') as corpus_file:
+            corpus = json.load(corpus_file)
+    except (OSError, ValueError) as e:
+        raise CommandError(f"Cannot read pair corpus {path}: {e}")
+    
+    if not corpus.get('pairs'):
+        raise CommandError(f"Pair corpus {path} has no pairs")
+    return corpus
+
+
+def vary_title(title, rng):
+    """Return a plausible relisting of a title with different specs and wording"""
+    title = re.sub(r'\b(8|16|24|32)\s*-?\s*GB\b', rng.choice(RAM_SIZES), title, count=1, flags=re.IGNORECASE)
+    if rng.random() < 0.5:
+        title = f"{title} {rng.choice(STORAGE_SIZES)}"
+    title = f"{title} {rng.choice(COLOURS)} {rng.choice(SUFFIXES)}"
+    return title.upper() if rng.random() < 0.1 else title
+
+
+def synthesize_titles(titles, size, rng):
+    """Grow a list of titles to exactly `size` by adding varied copies"""
+    titles = list(titles)[:size]
+    seeds = list(titles)
+    while len(titles) < size:
+        titles.append(vary_title(rng.choice(seeds), rng))
+    return titles
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Command(BaseCommand):
+    help = 'Measure matcher accuracy and speed for each scorer backend over a labelled pair corpus'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--corpus',
+            type=str,
+            default=str(DEFAULT_CORPUS),
+            help='Labelled pair corpus (JSON with a version and seller_title/competitor_title/is_match pairs)',
+        )
+        parser.add_argument(
+            '--scorer',
+            action='append',
+            choices=sorted(SCORERS),
+            help='Scorer backend to benchmark (repeatable, default: all)',
+        )
+        parser.add_argument(
+            '--catalog-size',
+            type=int,
+            default=5000,
+            help='Competitor listings per competitor, synthesized from the corpus titles',
+        )
+        parser.add_argument(
+            '--products',
+            type=int,
+            default=500,
+            help='Seller products to match, synthesized from the corpus titles',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Random seed for catalog synthesis, so runs are comparable',
+        )
+        parser.add_argument(
+            '--json',
+            type=str,
+            metavar='PATH',
+            help="Append the results as one JSON line to PATH ('-' for stdout)",
+        )
+    
+    def handle(self, *args, **options):
+        corpus = load_pair_corpus(options['corpus'])
+        scorers = options['scorer'] or sorted(SCORERS)
+        catalog_size = max(options['catalog_size'], 1)
+        product_count = max(options['products'], 1)
+        
+        rng = random.Random(options['seed'])
+        catalogs = {}
+        for competitor, _ in CompetitorProduct.COMPETITOR_CHOICES:
+            titles = dict.fromkeys(pair['competitor_title'] for pair in corpus['pairs'] if pair['competitor'] == competitor)
+            catalogs[competitor] = synthesize_titles(titles, catalog_size, rng)
+        seller_titles = synthesize_titles(dict.fromkeys(pair['seller_title'] for pair in corpus['pairs']), product_count, rng)
+        
+        self.stdout.write(
+            f"⏱️ Corpus v{corpus.get('version', '?')}: {len(corpus['pairs'])} labelled pairs, "
+            f"{catalog_size} listings per competitor, {product_count} seller products"
+        )
+        
+        results = {}
+        for scorer in scorers:
+            service = PriceComparisonService(scorer=scorer)
+            result = self.measure_accuracy(service, corpus['pairs'])
+            result.update(self.measure_speed(service, catalogs, seller_titles))
+            result['peak_memory_mb'] = self.measure_memory(service, catalogs, seller_titles)
+            results[scorer] = result
+            
+            self.stdout.write(
+                f"🎯 {scorer}: precision {result['precision']:.3f}, recall {result['recall']:.3f}, "
+                f"f1 {result['f1']:.3f} at threshold {result['threshold']}"
+            )
+            self.stdout.write(
+                f"📊 {scorer}: {result['pairs_per_sec']:,.0f} pairs/sec, "
+                f"p50 {result['p50_ms']:.2f} ms, p99 {result['p99_ms']:.2f} ms per product, "
+                f"score matrix {result['matrix_sec']:.2f}s, index build {result['index_build_sec']:.2f}s, "
+                f"peak memory {result['peak_memory_mb']:.1f} MB"
+            )
+        
+        if options['json']:
+            record = {
+                'timestamp': timezone.now().isoformat(),
+                'corpus': Path(options['corpus']).name,
+                'corpus_version': corpus.get('version'),
+                'catalog_size': catalog_size,
+                'products': product_count,
+                'seed': options['seed'],
+                'scorers': results,
+            }
+            line = json.dumps(record, sort_keys=True)
+            if options['json'] == '-':
+                self.stdout.write(line)
+            else:
+                with open(options['json'], 'a', encoding='utf-8') as output:
+                    output.write(line + '\n')
+                self.stdout.write(f"💾 Results appended to {options['json']}")
+    
+    def measure_accuracy(self, service, pairs):
+        """Score every labelled pair and count outcomes at the production threshold"""
+        true_positives = false_positives = false_negatives = 0
+        for pair in pairs:
+            predicted = service.calculate_similarity(pair['seller_title'], pair['competitor_title']) >= service.min_confidence
+            if predicted and pair['is_match']:
+                true_positives += 1
+            elif predicted:
+                false_positives += 1
+            elif pair['is_match']:
+                false_negatives += 1
+        
+        precision = true_positives / (true_positives + false_positives) if true_positives + false_positives else 0.0
+        recall = true_positives / (true_positives + false_negatives) if true_positives + false_negatives else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        return {
+            'threshold': service.min_confidence,
+            'true_positives': true_positives,
+            'false_positives': false_positives,
+            'false_negatives': false_negatives,
+            'precision': round(precision, 4),
+            'recall': round(recall, 4),
+            'f1': round(f1, 4),
+        }
+    
+    def build_indexes(self, service, catalogs):
+        """Build blocking indexes over unsaved listings whose feature columns are filled in, as stored rows are"""
+        indexes = {}
+        for competitor, titles in catalogs.items():
+            products = []
+            for title in titles:
+                competitor_product = CompetitorProduct(competitor=competitor, title=title, price=0, url='')
+                competitor_product.set_match_features(service.match_feature_columns(title))
+                products.append(competitor_product)
+            indexes[competitor] = CompetitorBlockIndex(service, products)
+        return indexes
+    
+    def match_chunks(self, service, indexes, seller_titles, chunk_size):
+        """Match seller titles the way compare_all_products does, a chunk at a time.
+        
+        This is match_features_bulk split open so its steps can be timed
+        apart: each chunk gets one basic_score_matrix call (skipped by scorers
+        that aren't bulk), then each product is matched from its row. Yields
+        (matrix seconds, [seconds per product]) per chunk, where a product's
+        time covers its feature extraction and matching against every
+        competitor.
+        """
+        indexes = list(indexes.items())
+        for start in range(0, len(seller_titles), chunk_size):
+            product_features, product_secs = [], []
+            for title in seller_titles[start:start + chunk_size]:
+                started = time.perf_counter()
+                product_features.append((service.extract_key_features(title), service.clean_product_name(title)))
+                product_secs.append(time.perf_counter() - started)
+            
+            started = time.perf_counter()
+            basic_scores = service.basic_score_matrix(product_features, indexes)
+            matrix_sec = time.perf_counter() - started
+            
+            for row, (features, clean_name) in enumerate(product_features):
+                started = time.perf_counter()
+                service.match_features_row(
+                    features, clean_name, indexes, basic_scores[row] if basic_scores is not None else None
+                )
+                product_secs[row] += time.perf_counter() - started
+            yield matrix_sec, product_secs
+    
+    def count_pairs(self, service, indexes, seller_titles):
+        """Number of (product, listing) pairs that get feature-scored after blocking"""
+        scored = 0
+        for title in seller_titles:
+            features = service.extract_key_features(title)
+            scored += sum(len(index.candidate_positions(features)) for index in indexes.values())
+        return scored
+    
+    def measure_speed(self, service, catalogs, seller_titles):
+        """Time index construction and chunked bulk matching.
+        
+        Percentiles are over each product's own matching time; the shared
+        score matrix calls are reported separately as matrix_sec. Feature
+        caches are cleared first so a scorer doesn't ride on the extraction
+        work of the one benchmarked before it.
+        """
+        clean_product_name.cache_clear()
+        extract_key_features.cache_clear()
+        chunk_size = getattr(settings, 'PRICE_COMPARISON_CHUNK_SIZE', 200)
+        
+        started = time.perf_counter()
+        indexes = self.build_indexes(service, catalogs)
+        index_build_sec = time.perf_counter() - started
+        
+        latencies = []
+        matrix_sec = 0.0
+        for chunk_matrix_sec, product_secs in self.match_chunks(service, indexes, seller_titles, chunk_size):
+            matrix_sec += chunk_matrix_sec
+            latencies.extend(product_secs)
+        total = matrix_sec + sum(latencies)
+        
+        scored = self.count_pairs(service, indexes, seller_titles)
+        return {
+            'index_build_sec': round(index_build_sec, 4),
+            'matrix_sec': round(matrix_sec, 4),
+            'pairs_scored': scored,
+            'pairs_per_sec': round(scored / total, 1) if total > 0 else 0.0,
+            'p50_ms': round(statistics.median(latencies) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        }
+    
+    def measure_memory(self, service, catalogs, seller_titles):
+        """Peak Python heap for building the indexes and matching every product.
+        
+        Runs separately from the timed pass because tracing allocations slows
+        matching down. Allocations made inside C extensions are not counted.
+        """
+        clean_product_name.cache_clear()
+        extract_key_features.cache_clear()
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        try:
+            indexes = self.build_indexes(service, catalogs)
+            for _ in self.match_chunks(service, indexes, seller_titles, getattr(settings, 'PRICE_COMPARISON_CHUNK_SIZE', 200)):
+                pass
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            if not tracing:
+                tracemalloc.stop()
+        return round(peak / (1024 * 1024), 2)
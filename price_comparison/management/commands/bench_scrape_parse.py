@@ -0,0 +1,70 @@
+import statistics
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from price_comparison.scrapers import SITES
+
+DEFAULT_SNAPSHOT_DIR = Path(__file__).resolve().parents[2] / 'testdata' / 'scrapers'
+
+
+class Command(BaseCommand):
+    help = 'Time the listing parsers over saved HTML snapshots of both competitors'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--snapshot-dir',
+            type=str,
+            default=str(DEFAULT_SNAPSHOT_DIR),
+            help='Directory of <competitor>_*.html snapshots (scrape_* --save-snapshots writes them)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Number of timed parses per snapshot',
+        )
+    
+    def handle(self, *args, **options):
+        snapshot_dir = Path(options['snapshot_dir'])
+        repeat = max(options['repeat'], 1)
+        
+        snapshots = sorted(snapshot_dir.glob('*.html'))
+        if not snapshots:
+            raise CommandError(f"No HTML snapshots found in {snapshot_dir}")
+        
+        self.stdout.write(f"⏱️ Parsing {len(snapshots)} snapshots from {snapshot_dir}, {repeat} runs each")
+        
+        totals = {}
+        for path in snapshots:
+            competitor = path.name.split('_', 1)[0]
+            if competitor not in SITES:
+                self.stdout.write(f"⚠️ Skipping {path.name}: unknown competitor '{competitor}'")
+                continue
+            
+            site = SITES[competitor]()
+            html = path.read_bytes()
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                listings = site.parse_listings(html, site.start_url)
+                timings.append(time.perf_counter() - started)
+            
+            best = min(timings)
+            median = statistics.median(timings)
+            self.stdout.write(
+                f"📄 {path.name}: {len(listings)} listings, {len(html) / 1024:.0f} KB - "
+                f"best {best * 1000:.2f} ms, median {median * 1000:.2f} ms"
+            )
+            
+            total = totals.setdefault(competitor, {'listings': 0, 'seconds': 0.0, 'pages': 0})
+            total['listings'] += len(listings)
+            total['seconds'] += median
+            total['pages'] += 1
+        
+        for competitor, total in totals.items():
+            rate = total['listings'] / total['seconds'] if total['seconds'] > 0 else 0.0
+            self.stdout.write(
+                f"📊 {competitor}: {total['pages']} pages, {total['listings']} listings in "
+                f"{total['seconds'] * 1000:.2f} ms ({rate:,.0f} listings/sec)"
+            )
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from price_comparison.maintenance import compact_price_history
+
+
+class Command(BaseCommand):
+    help = 'Compact raw competitor price history into daily rollups'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=90,
+            help='Keep this many days of raw price history; older rows are folded into the daily rollup',
+        )
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Rebuild the daily rollup from all raw history without deleting anything',
+        )
+    
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            self.stdout.write("🔄 Rebuilding daily price rollups from all raw history...")
+            rolled_up, deleted = compact_price_history(keep_days=None)
+        else:
+            self.stdout.write(f"🗜️ Compacting price history older than {options['days']} days...")
+            rolled_up, deleted = compact_price_history(keep_days=options['days'])
+        
+        self.stdout.write(f"✅ {rolled_up} daily rollups written, {deleted} raw rows deleted")
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from price_comparison.models import CompetitorProduct
+from price_comparison.maintenance import dedupe_competitor_products
+
+
+class Command(BaseCommand):
+    help = 'Rekey competitor listings on their canonical URL and merge the duplicates into one row each'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--competitor',
+            type=str,
+            help='Dedupe a specific competitor only',
+            choices=CompetitorProduct.COMPETITORS
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count the listings that would be rekeyed or merged',
+        )
+    
+    def handle(self, *args, **options):
+        competitor = options.get('competitor')
+        self.stdout.write(f"🔍 Looking for duplicate {competitor or 'competitor'} listings...")
+        rekeyed, merged = dedupe_competitor_products(competitor=competitor, dry_run=options['dry_run'])
+        
+        if options['dry_run']:
+            self.stdout.write(f"📝 {merged} duplicates would be merged and {rekeyed} listings rekeyed")
+        else:
+            self.stdout.write(f"✅ Merged {merged} duplicates and rekeyed {rekeyed} listings")
@@ -1,6 +1,6 @@
 from django.core.management.base import BaseCommand
 from price_comparison.services import PriceComparisonService
-from price_comparison.models import ProductComparison, CompetitorProduct
+from price_comparison.models import ProductComparison, CompetitorMatch, CompetitorProduct
 from products.models import Product
 from django.db import transaction
 
@@ -19,6 +19,24 @@ class Command(BaseCommand):
             action='store_true',
             help='Clear existing comparisons before rebuilding'
         )
+        parser.add_argument(
+            '--matcher',
+            choices=PriceComparisonService.MATCHERS,
+            default='blocking',
+            help='Matching strategy: blocking (score every candidate in a block) or tfidf (re-rank TF-IDF top-k)'
+        )
+        parser.add_argument(
+            '--top-k',
+            type=int,
+            default=20,
+            help='Number of TF-IDF candidates re-ranked per product (tfidf matcher only)'
+        )
+        parser.add_argument(
+            '--scorer',
+            choices=PriceComparisonService.SCORERS,
+            default='rapidfuzz',
+            help='String similarity backend (difflib is the slower reference implementation)'
+        )
         parser.add_argument(
             '--dry-run',
             action='store_true',
@@ -35,10 +53,12 @@ class Command(BaseCommand):
         self.stdout.write("="*60)
         
         # Initialize comparison service
-        comparison_service = PriceComparisonService()
+        comparison_service = PriceComparisonService(
+            matcher=options['matcher'], top_k=options['top_k'], scorer=options['scorer']
+        )
         
         # Get products to compare
-        products = Product.objects.filter(is_active=True, category='laptop')
+        products = Product.objects.filter(is_active=True, category='laptop').select_related('match_features')
         if seller_id:
             products = products.filter(seller_id=seller_id)
             
@@ -49,14 +69,16 @@ class Command(BaseCommand):
             return
         
         # Check competitor data availability
-        paklap_count = CompetitorProduct.objects.filter(competitor='paklap', is_active=True).count()
-        priceoye_count = CompetitorProduct.objects.filter(competitor='priceoye', is_active=True).count()
+        competitor_counts = {
+            competitor: CompetitorProduct.objects.filter(competitor=competitor, is_active=True).count()
+            for competitor in CompetitorProduct.COMPETITORS
+        }
         
         self.stdout.write(f"📦 Products to compare: {total_products}")
-        self.stdout.write(f"🏪 PakLap competitors: {paklap_count}")
-        self.stdout.write(f"🏪 PriceOye competitors: {priceoye_count}")
+        for competitor, name in CompetitorProduct.COMPETITOR_CHOICES:
+            self.stdout.write(f"🏪 {name} competitors: {competitor_counts[competitor]}")
         
-        if paklap_count == 0 and priceoye_count == 0:
+        if not any(competitor_counts.values()):
             self.stdout.write(self.style.WARNING("⚠️ No competitor data found. Please run scrapers first."))
             return
         
@@ -65,6 +87,7 @@ class Command(BaseCommand):
             existing_count = ProductComparison.objects.count()
             if not dry_run:
                 ProductComparison.objects.all().delete()
+                CompetitorMatch.objects.all().delete()
                 self.stdout.write(f"🧹 Cleared {existing_count} existing comparisons")
             else:
                 self.stdout.write(f"🧹 Would clear {existing_count} existing comparisons")
@@ -78,10 +101,21 @@ class Command(BaseCommand):
         
         # Process products
         processed = 0
-        matched_paklap = 0
-        matched_priceoye = 0
-        matched_both = 0
+        matched = {competitor: 0 for competitor in CompetitorProduct.COMPETITORS}
+        matched_all = 0
         no_matches = 0
+        names = dict(CompetitorProduct.COMPETITOR_CHOICES)
+        
+        # Index competitor products once instead of rescanning them per product
+        indexes = comparison_service.build_competitor_indexes()
+        
+        products = list(products)
+        if comparison_service.matcher == 'tfidf':
+            self.stdout.write(f"🧮 Scoring TF-IDF top-{comparison_service.top_k} candidates...")
+            batch_matches = comparison_service.find_best_matches_tfidf(products, indexes=indexes)
+        else:
+            self.stdout.write(f"🧮 Scoring block candidates with {comparison_service.scorer.name}...")
+            batch_matches = comparison_service.find_best_matches_bulk(products, indexes=indexes)
         
         try:
             with transaction.atomic():
@@ -89,46 +123,38 @@ class Command(BaseCommand):
                     self.stdout.write(f"📱 [{i:3d}/{total_products}] Processing: {product.name[:40]}...")
                     
                     # Run comparison
-                    comparison = comparison_service.compare_single_product(product)
+                    comparison = comparison_service.compare_single_product(
+                        product, indexes=indexes, matches=batch_matches.get(product.pk)
+                    )
                     
                     if comparison:
                         processed += 1
                         
                         # Count matches
-                        has_paklap = comparison.best_paklap_match is not None
-                        has_priceoye = comparison.best_priceoye_match is not None
+                        matches = comparison.get_matches()
+                        for match in matches:
+                            matched[match.competitor] += 1
                         
-                        if has_paklap and has_priceoye:
-                            matched_both += 1
-                            self.stdout.write(f"   ✅ Matched both (PakLap: {comparison.match_confidence_paklap:.2f}, PriceOye: {comparison.match_confidence_priceoye:.2f})")
-                        elif has_paklap:
-                            matched_paklap += 1
-                            self.stdout.write(f"   🔵 Matched PakLap only (confidence: {comparison.match_confidence_paklap:.2f})")
-                        elif has_priceoye:
-                            matched_priceoye += 1
-                            self.stdout.write(f"   🟡 Matched PriceOye only (confidence: {comparison.match_confidence_priceoye:.2f})")
-                        else:
+                        if not matches:
                             no_matches += 1
                             self.stdout.write("   ❌ No matches found")
+                        else:
+                            if len(matches) == len(matched):
+                                matched_all += 1
+                            self.stdout.write("   ✅ Matched " + ", ".join(
+                                f"{names[match.competitor]}: {match.confidence:.2f}" for match in matches
+                            ))
                         
                         # Show price differences if available
-                        if has_paklap:
-                            diff = comparison.paklap_price_difference
-                            if diff > 0:
-                                self.stdout.write(f"      💰 PakLap: Your price PKR {diff:,.0f} higher")
-                            elif diff < 0:
-                                self.stdout.write(f"      💰 PakLap: Your price PKR {abs(diff):,.0f} lower")
-                            else:
-                                self.stdout.write(f"      💰 PakLap: Same price")
-                        
-                        if has_priceoye:
-                            diff = comparison.priceoye_price_difference
+                        for match in matches:
+                            diff = match.price_difference
+                            name = names[match.competitor]
                             if diff > 0:
-                                self.stdout.write(f"      💰 PriceOye: Your price PKR {diff:,.0f} higher")
+                                self.stdout.write(f"      💰 {name}: Your price PKR {diff:,.0f} higher")
                             elif diff < 0:
-                                self.stdout.write(f"      💰 PriceOye: Your price PKR {abs(diff):,.0f} lower")
+                                self.stdout.write(f"      💰 {name}: Your price PKR {abs(diff):,.0f} lower")
                             else:
-                                self.stdout.write(f"      💰 PriceOye: Same price")
+                                self.stdout.write(f"      💰 {name}: Same price")
         
         except Exception as e:
             self.stdout.write(self.style.ERROR(f"❌ Error during processing: {str(e)}"))
@@ -140,22 +166,19 @@ class Command(BaseCommand):
         self.stdout.write("="*60)
         self.stdout.write(f"📊 SUMMARY:")
         self.stdout.write(f"   • Total Products Processed: {processed}")
-        self.stdout.write(f"   • Matched Both Competitors: {matched_both}")
-        self.stdout.write(f"   • Matched PakLap Only: {matched_paklap}")
-        self.stdout.write(f"   • Matched PriceOye Only: {matched_priceoye}")
+        self.stdout.write(f"   • Matched All Competitors: {matched_all}")
+        for competitor, name in CompetitorProduct.COMPETITOR_CHOICES:
+            self.stdout.write(f"   • Matched {name}: {matched[competitor]}")
         self.stdout.write(f"   • No Matches Found: {no_matches}")
         
         # Calculate percentages
         if processed > 0:
-            both_pct = (matched_both / processed) * 100
-            paklap_pct = ((matched_paklap + matched_both) / processed) * 100
-            priceoye_pct = ((matched_priceoye + matched_both) / processed) * 100
             no_match_pct = (no_matches / processed) * 100
             
             self.stdout.write(f"\n📈 MATCH RATES:")
-            self.stdout.write(f"   • Both Competitors: {both_pct:.1f}%")
-            self.stdout.write(f"   • PakLap Total: {paklap_pct:.1f}%")
-            self.stdout.write(f"   • PriceOye Total: {priceoye_pct:.1f}%")
+            self.stdout.write(f"   • All Competitors: {matched_all / processed * 100:.1f}%")
+            for competitor, name in CompetitorProduct.COMPETITOR_CHOICES:
+                self.stdout.write(f"   • {name} Total: {matched[competitor] / processed * 100:.1f}%")
             self.stdout.write(f"   • No Matches: {no_match_pct:.1f}%")
         
         self.stdout.write("\n🎉 All product comparisons have been rebuilt!")
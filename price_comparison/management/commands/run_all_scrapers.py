@@ -1,5 +1,8 @@
 from django.core.management.base import BaseCommand
-from django.core.management import call_command
+from django.utils import timezone
+from price_comparison.models import CompetitorChange
+from price_comparison.scrapers import SITES
+from price_comparison.scraping import scrape_competitors
 from price_comparison.services import PriceComparisonService
 
 
@@ -12,33 +15,84 @@ class Command(BaseCommand):
             action='store_true',
             help='Skip scraping and only update comparisons',
         )
+        parser.add_argument(
+            '--competitor',
+            action='append',
+            choices=sorted(SITES),
+            help='Only scrape this competitor (repeatable; defaults to every registered competitor)',
+        )
+        parser.add_argument(
+            '--engine',
+            choices=['auto', 'http', 'selenium'],
+            default='auto',
+            help='Scraping engine for every competitor (auto falls back to headless Chrome per site)',
+        )
+        parser.add_argument(
+            '--max-pages',
+            type=int,
+            default=20,
+            help='Maximum number of listing pages to scrape per competitor',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Continue an interrupted run from its last saved page instead of starting over',
+        )
+        parser.add_argument(
+            '--all-pages',
+            action='store_true',
+            help='Parse every listing page, even those unchanged since the last scrape',
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Re-match every product instead of only those affected by catalog changes',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Number of matching processes (defaults to the CPU count)',
+        )
 
     def handle(self, *args, **options):
         self.stdout.write("🚀 Starting comprehensive price comparison update...")
         
         if not options['skip_scraping']:
-            # Run PakLap scraper
-            self.stdout.write("📊 Scraping PakLap...")
-            try:
-                call_command('scrape_paklap')
-                self.stdout.write("✅ PakLap scraping completed")
-            except Exception as e:
-                self.stdout.write(f"❌ PakLap scraping failed: {e}")
-            
-            # Run PriceOye scraper
-            self.stdout.write("📊 Scraping PriceOye...")
-            try:
-                call_command('scrape_priceoye')
-                self.stdout.write("✅ PriceOye scraping completed")
-            except Exception as e:
-                self.stdout.write(f"❌ PriceOye scraping failed: {e}")
+            # Scrape every competitor concurrently; comparisons run once afterwards
+            competitors = options['competitor'] or sorted(SITES)
+            self.stdout.write(f"📊 Scraping {', '.join(competitors)}...")
+            runs = scrape_competitors(
+                [SITES[competitor]() for competitor in competitors], engine=options['engine'], max_pages=options['max_pages'], stdout=self.stdout,
+                verbose=options['verbosity'] > 1, use_page_cache=not options['all_pages'], resume=options['resume']
+            )
+            for run in runs:
+                if run.log.status == 'completed':
+                    self.stdout.write(f"✅ {run.site.competitor} scraping completed")
+                else:
+                    self.stdout.write(f"❌ {run.site.competitor} scraping failed")
         
-        # Update all price comparisons
-        self.stdout.write("🔄 Updating price comparisons...")
+        # Update price comparisons
         try:
             comparison_service = PriceComparisonService()
-            results = comparison_service.compare_all_products()
-            self.stdout.write(f"✅ Updated {len(results)} product comparisons")
+            if options['full']:
+                self.stdout.write("🔄 Updating all price comparisons...")
+                started = timezone.now()
+                results = comparison_service.compare_all_products(workers=options['workers'])
+                # The full run already covers every change recorded before it started
+                CompetitorChange.objects.filter(detected_at__lte=started).delete()
+            else:
+                self.stdout.write("🔄 Updating price comparisons affected by catalog changes...")
+                results = comparison_service.apply_catalog_changes(workers=options['workers'])
+            stats = comparison_service.last_run_stats
+            self.stdout.write(f"✅ Re-matched {len(results)} product comparisons")
+            if not options['full']:
+                self.stdout.write(
+                    f"📊 {stats['changes']} catalog changes, {stats['repriced']} comparisons repriced without matching"
+                )
+            self.stdout.write(
+                f"📊 {stats['created']} new, {stats['updated']} changed, {stats['unchanged']} unchanged "
+                f"in {stats['seconds']:.1f}s ({stats['products_per_second']:.1f} products/sec)"
+            )
         except Exception as e:
             self.stdout.write(f"❌ Price comparison update failed: {e}")
         
@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+from price_comparison.scrapers import SITES
+from price_comparison.scraping import CompetitorScrape
+
+
+class Command(BaseCommand):
+    help = 'Scrapes laptop products from a competitor'
+    # Set by the per-competitor commands (scrape_paklap, scrape_priceoye)
+    competitor = None
+    
+    def add_arguments(self, parser):
+        if self.competitor is None:
+            parser.add_argument(
+                'competitor',
+                choices=sorted(SITES),
+                help='Competitor to scrape',
+            )
+        parser.add_argument(
+            '--engine',
+            choices=['auto', 'http', 'selenium'],
+            default='auto',
+            help='auto fetches pages over HTTP and only falls back to headless Chrome if that finds nothing',
+        )
+        parser.add_argument(
+            '--max-pages',
+            type=int,
+            default=20,
+            help='Maximum number of listing pages to scrape',
+        )
+        parser.add_argument(
+            '--start-url',
+            type=str,
+            help='Listing URL to start from (defaults to the live listing)',
+        )
+        parser.add_argument(
+            '--save-snapshots',
+            type=str,
+            metavar='DIR',
+            help='Save every fetched listing page to DIR (input for bench_scrape_parse)',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Continue an interrupted run from its last saved page instead of starting over',
+        )
+        parser.add_argument(
+            '--all-pages',
+            action='store_true',
+            help='Parse every listing page, even those unchanged since the last scrape',
+        )
+    
+    def handle(self, *args, **options):
+        site = SITES[self.competitor or options['competitor']](start_url=options['start_url'])
+        self.stdout.write(f"🌐 Scraping {site.start_url} ({options['engine']} engine)")
+        
+        scrape = CompetitorScrape(
+            site, engine=options['engine'], max_pages=options['max_pages'],
+            snapshot_dir=options['save_snapshots'], stdout=self.stdout, verbose=options['verbosity'] > 1,
+            use_page_cache=not options['all_pages'], resume=options['resume']
+        )
+        scrape.run()
+        self.stdout.write(f"📊 Total processed: {scrape.log.products_scraped}")
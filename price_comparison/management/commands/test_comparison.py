@@ -96,21 +96,16 @@ class Command(BaseCommand):
                 comparison = comparison_service.compare_single_product(product)
                 
                 # Display results
-                if comparison.best_asif_match:
-                    self.stdout.write(f"🔍 Asif Match: {comparison.best_asif_match.title}")
-                    self.stdout.write(f"💵 Asif Price: Rs. {comparison.best_asif_match.price}")
-                    self.stdout.write(f"📊 Price Difference: Rs. {comparison.asif_price_difference}")
-                    self.stdout.write(f"🎯 Confidence: {comparison.match_confidence_asif:.2f}")
-                else:
-                    self.stdout.write("❌ No Asif match found")
-                
-                if comparison.best_paklap_match:
-                    self.stdout.write(f"🔍 PakLap Match: {comparison.best_paklap_match.title}")
-                    self.stdout.write(f"💵 PakLap Price: Rs. {comparison.best_paklap_match.price}")
-                    self.stdout.write(f"📊 Price Difference: Rs. {comparison.paklap_price_difference}")
-                    self.stdout.write(f"🎯 Confidence: {comparison.match_confidence_paklap:.2f}")
-                else:
-                    self.stdout.write("❌ No PakLap match found")
+                matches = {match.competitor: match for match in comparison.get_matches()}
+                for competitor, name in CompetitorProduct.COMPETITOR_CHOICES:
+                    match = matches.get(competitor)
+                    if match:
+                        self.stdout.write(f"🔍 {name} Match: {match.competitor_product.title}")
+                        self.stdout.write(f"💵 {name} Price: Rs. {match.competitor_product.price}")
+                        self.stdout.write(f"📊 Price Difference: Rs. {match.price_difference}")
+                        self.stdout.write(f"🎯 Confidence: {match.confidence:.2f}")
+                    else:
+                        self.stdout.write(f"❌ No {name} match found")
                 
                 self.stdout.write("-" * 50)
             
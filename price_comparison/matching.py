@@ -0,0 +1,255 @@
+"""Title normalization, feature extraction and listing keys shared by the matcher and the scrapers.
+
+Patterns are compiled once at import and results are memoized per title in
+bounded LRU caches, since the same seller and competitor titles are
+extracted over and over during a comparison run. Cached results are
+immutable (strings and KeyFeatures tuples), so callers can't corrupt them.
+
+This module doesn't import Django, so standalone scripts can use it too.
+"""
+
+import hashlib
+import re
+from functools import lru_cache
+from typing import NamedTuple, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+# Titles memoized per cache; roughly two full competitor catalogs plus every seller product
+FEATURE_CACHE_SIZE = 65536
+
+BRANDS = ('hp', 'dell', 'lenovo', 'asus', 'acer', 'msi', 'apple', 'samsung')
+SPECIAL_FEATURES = ('gaming', 'touch', 'convertible', '2in1', 'ultrabook', 'business')
+STOP_WORDS = frozenset(['laptop', 'computer', 'pc', 'the', 'and', 'with', 'for', 'of', 'in', 'inch', '"', 'prices', 'pakistan'])
+
+NON_WORD_PATTERN = re.compile(r'[^\w\s]')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+MODEL_PATTERN = re.compile(
+    r'(pavilion|inspiron|thinkpad|vivobook|aspire|victus|latitude|precision|ideapad|legion|zenbook|tuf|rog)\s*(\d+)'
+)
+SIZE_PATTERN = re.compile(r'(\d+\.?\d*)\s*inch|\b(\d+)\s*"|\b(\d+)\s*in\b|(\d{2})(?=\s|$|[^\d])')
+MODEL_SIZE_PATTERN = re.compile(r'\s(1[3-7])(?=\s|$)')
+PROCESSOR_PATTERN = re.compile(r'(core\s*i\d+|ryzen\s*\d+|celeron|pentium|m\d+)')
+
+# Scraped title clean-up, see normalize_product_title
+TITLE_NOISE_PATTERN = re.compile(r'\b(price in pakistan|prices pakistan|laptop)\b', re.IGNORECASE)
+MODEL_SPACING_PATTERN = re.compile(r'([a-zA-Z]+)(\d+)')
+TITLE_PUNCTUATION_PATTERN = re.compile(r'[^\w\s\-\.\"]')
+
+# Query parameters that only track the visit and never pick a different listing
+TRACKING_PARAMS = frozenset(['gclid', 'fbclid'])
+
+
+class KeyFeatures(NamedTuple):
+    """Key features extracted from a product title.
+    
+    Fields can also be read by name with features['brand'], as with the
+    dicts this replaces.
+    """
+    brand: Optional[str] = None
+    model_number: Optional[str] = None
+    screen_size: Optional[str] = None
+    processor: Optional[str] = None
+    special_features: Tuple[str, ...] = ()
+    
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return getattr(self, key)
+        return tuple.__getitem__(self, key)
+
+
+def normalize_product_title(title):
+    """Normalize product title for better matching"""
+    if not title:
+        return ""
+    
+    # Remove extra whitespace and normalize
+    title = WHITESPACE_PATTERN.sub(' ', title.strip())
+    
+    # Remove common prefixes/suffixes that don't help with matching
+    title = TITLE_NOISE_PATTERN.sub('', title)
+    
+    # Clean up model numbers (ensure proper spacing)
+    title = MODEL_SPACING_PATTERN.sub(r'\1 \2', title)
+    
+    # Remove excessive punctuation
+    title = TITLE_PUNCTUATION_PATTERN.sub(' ', title)
+    
+    # Clean up extra spaces again
+    return WHITESPACE_PATTERN.sub(' ', title.strip())
+
+
+@lru_cache(maxsize=FEATURE_CACHE_SIZE)
+def clean_product_name(name):
+    """Clean and normalize product name for better matching"""
+    # Remove special characters and extra spaces
+    name = NON_WORD_PATTERN.sub(' ', name.lower())
+    name = WHITESPACE_PATTERN.sub(' ', name).strip()
+    
+    # Remove common words that don't help with matching
+    return ' '.join(word for word in name.split() if word not in STOP_WORDS)
+
+
+@lru_cache(maxsize=FEATURE_CACHE_SIZE)
+def extract_key_features(name):
+    """Extract key features like model numbers, screen sizes, etc."""
+    name_lower = name.lower()
+    
+    # First listed brand found anywhere in the title
+    brand = next((brand for brand in BRANDS if brand in name_lower), None)
+    
+    # Model numbers like pavilion 15, inspiron 14, victus 15
+    model_number = None
+    model_match = MODEL_PATTERN.search(name_lower)
+    if model_match:
+        model_number = f"{model_match.group(1)} {model_match.group(2)}"
+    
+    # Screen size, only when it's a plausible laptop size (13-17 inches)
+    screen_size = None
+    size_match = SIZE_PATTERN.search(name_lower)
+    if size_match:
+        size = size_match.group(1) or size_match.group(2) or size_match.group(3) or size_match.group(4)
+        if size and 13 <= float(size) <= 17:
+            screen_size = size
+    
+    # Otherwise take it from the model number, as in "victus 15" or "pavilion 14"
+    if not screen_size and model_number:
+        model_size_match = MODEL_SIZE_PATTERN.search(model_number)
+        if model_size_match:
+            screen_size = model_size_match.group(1)
+    
+    processor_match = PROCESSOR_PATTERN.search(name_lower)
+    
+    return KeyFeatures(
+        brand=brand,
+        model_number=model_number,
+        screen_size=screen_size,
+        processor=processor_match.group(1) if processor_match else None,
+        special_features=tuple(feature for feature in SPECIAL_FEATURES if feature in name_lower),
+    )
+
+
+def features_from_columns(brand, model_number, screen_size, processor, special_features):
+    """Rebuild the KeyFeatures record from its stored columns (see feature_columns)"""
+    return KeyFeatures(
+        brand=brand or None,
+        model_number=model_number or None,
+        screen_size=screen_size or None,
+        processor=processor or None,
+        special_features=tuple(special_features.split(',')) if special_features else (),
+    )
+
+
+def feature_columns(name):
+    """Return the precomputed feature columns stored for a product name"""
+    features = extract_key_features(name)
+    return {
+        'normalized_title': clean_product_name(name),
+        'brand': features.brand or '',
+        'model_number': features.model_number or '',
+        'screen_size': features.screen_size or '',
+        'processor': features.processor or '',
+        'special_features': ','.join(features.special_features),
+    }
+
+
+def score_features(features1, clean_text1, features2, clean_text2, basic_similarity):
+    """Score two products from their extracted features, cleaned names and string similarity"""
+    # Feature-based scoring
+    feature_score = 0.0
+    feature_weight = 0.0
+    
+    # Brand matching (very important - 30% weight)
+    if features1.brand and features2.brand:
+        feature_weight += 0.3
+        if features1.brand == features2.brand:
+            feature_score += 0.3
+        # Penalize different brands heavily
+        else:
+            feature_score -= 0.2  # Negative score for different brands
+    
+    # Model number matching (very important - 25% weight)
+    if features1.model_number and features2.model_number:
+        feature_weight += 0.25
+        if features1.model_number == features2.model_number:
+            feature_score += 0.25
+        # Partial model match (e.g., pavilion 15 vs pavilion 14)
+        elif features1.model_number.split()[0] == features2.model_number.split()[0]:
+            # Same series but different size - much lower score
+            feature_score += 0.05
+        # Different model series - negative score
+        else:
+            feature_score -= 0.15
+    
+    # Screen size matching (important - 15% weight)
+    if features1.screen_size and features2.screen_size:
+        feature_weight += 0.15
+        if features1.screen_size == features2.screen_size:
+            feature_score += 0.15
+    
+    # Processor matching (important - 15% weight)
+    if features1.processor and features2.processor:
+        feature_weight += 0.15
+        if features1.processor == features2.processor:
+            feature_score += 0.15
+    
+    # Special features matching (moderate - 15% weight)
+    if features1.special_features or features2.special_features:
+        feature_weight += 0.15
+        common_features = set(features1.special_features).intersection(features2.special_features)
+        all_features = set(features1.special_features).union(features2.special_features)
+        if all_features:
+            feature_similarity = len(common_features) / len(all_features)
+            feature_score += 0.15 * feature_similarity
+    
+    # Word-based similarity for remaining comparison
+    words1 = set(clean_text1.split())
+    words2 = set(clean_text2.split())
+    
+    word_similarity = 0.0
+    if words1 and words2:
+        common_words = words1.intersection(words2)
+        word_similarity = len(common_words) / max(len(words1), len(words2))
+    
+    # Combine scores with weights
+    if feature_weight > 0:
+        # Normalize feature score
+        normalized_feature_score = feature_score / feature_weight
+        # 70% feature-based, 20% word-based, 10% basic similarity
+        final_similarity = (normalized_feature_score * 0.7) + (word_similarity * 0.2) + (basic_similarity * 0.1)
+    else:
+        # Fallback to original method if no features extracted
+        final_similarity = (basic_similarity * 0.6) + (word_similarity * 0.4)
+    
+    return min(final_similarity, 1.0)  # Ensure score doesn't exceed 1.0
+
+
+def canonical_listing_url(url):
+    """Reduce a listing URL to what identifies the listing: host without www, path and sorted query.
+    
+    The scheme, fragment, trailing slash and tracking parameters are dropped,
+    so the same page reached through http, a campaign link or an anchor
+    yields the same string.
+    """
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    path = parts.path.rstrip('/')
+    query = sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not name.startswith('utm_') and name not in TRACKING_PARAMS
+    )
+    return f"{host}{path}?{urlencode(query)}" if query else f"{host}{path}"
+
+
+def listing_key(url, title):
+    """Canonical identity of a competitor listing: a SHA-1 of its canonical URL.
+    
+    Listings scraped without a usable URL fall back to their whitespace and
+    case folded title, which is as close to an identity as they have.
+    """
+    if url and url.startswith('http'):
+        identity = canonical_listing_url(url)
+    else:
+        identity = 'title:' + WHITESPACE_PATTERN.sub(' ', title.strip()).lower()
+    return hashlib.sha1(identity.encode('utf-8')).hexdigest()
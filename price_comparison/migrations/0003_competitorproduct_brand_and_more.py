@@ -0,0 +1,63 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_auto_20250727_2155'),
+        ('price_comparison', '0002_rename_match_confidence_asif_productcomparison_match_confidence_priceoye_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='competitorproduct',
+            name='brand',
+            field=models.CharField(blank=True, db_index=True, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='competitorproduct',
+            name='model_number',
+            field=models.CharField(blank=True, db_index=True, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='competitorproduct',
+            name='normalized_title',
+            field=models.CharField(blank=True, db_index=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='competitorproduct',
+            name='processor',
+            field=models.CharField(blank=True, db_index=True, max_length=30),
+        ),
+        migrations.AddField(
+            model_name='competitorproduct',
+            name='screen_size',
+            field=models.CharField(blank=True, db_index=True, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='competitorproduct',
+            name='special_features',
+            field=models.CharField(blank=True, help_text='Comma-separated feature tags', max_length=100),
+        ),
+        migrations.CreateModel(
+            name='SellerProductFeatures',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('normalized_title', models.CharField(blank=True, db_index=True, max_length=255)),
+                ('brand', models.CharField(blank=True, db_index=True, max_length=20)),
+                ('model_number', models.CharField(blank=True, db_index=True, max_length=50)),
+                ('screen_size', models.CharField(blank=True, db_index=True, max_length=10)),
+                ('processor', models.CharField(blank=True, db_index=True, max_length=30)),
+                ('special_features', models.CharField(blank=True, help_text='Comma-separated feature tags', max_length=100)),
+                ('source_name', models.CharField(help_text='Product name the features were extracted from', max_length=100)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('seller_product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='match_features', to='products.product')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_auto_20250727_2155'),
+        ('price_comparison', '0003_competitorproduct_brand_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingComparison',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('queued_at', models.DateTimeField(auto_now_add=True)),
+                ('seller_product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='pending_comparison', to='products.product')),
+            ],
+            options={
+                'ordering': ['queued_at'],
+            },
+        ),
+    ]
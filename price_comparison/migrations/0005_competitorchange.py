@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('price_comparison', '0004_pendingcomparison'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompetitorChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('change_type', models.CharField(choices=[('new', 'New listing'), ('title', 'Title changed'), ('price', 'Price changed'), ('deactivated', 'Deactivated')], max_length=20)),
+                ('old_title', models.CharField(blank=True, max_length=255)),
+                ('old_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('detected_at', models.DateTimeField(auto_now_add=True)),
+                ('competitor_product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='changes', to='price_comparison.competitorproduct')),
+                ('scraping_log', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='changes', to='price_comparison.scrapinglog')),
+            ],
+            options={
+                'ordering': ['detected_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('price_comparison', '0005_competitorchange'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scrapinglog',
+            name='pages_processed',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='scrapinglog',
+            name='pages_skipped',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='ScrapedPage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('competitor', models.CharField(choices=[('paklap', 'PakLap'), ('priceoye', 'PriceOye')], max_length=20)),
+                ('url', models.URLField(max_length=500)),
+                ('content_hash', models.CharField(max_length=64)),
+                ('etag', models.CharField(blank=True, max_length=200)),
+                ('last_modified', models.CharField(blank=True, max_length=100)),
+                ('listings', models.JSONField(default=list)),
+                ('scraped_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('competitor', 'url')},
+            },
+        ),
+    ]
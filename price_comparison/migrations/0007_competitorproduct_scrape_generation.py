@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('price_comparison', '0006_scrapedpage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='competitorproduct',
+            name='scrape_generation',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='competitorproduct',
+            index=models.Index(fields=['competitor', 'is_active', 'scrape_generation'], name='price_compa_competi_43b3e1_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('price_comparison', '0007_competitorproduct_scrape_generation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScrapeCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('generation', models.PositiveIntegerField(help_text='Scrape generation stamped on the listings this run saw')),
+                ('last_page', models.PositiveIntegerField(default=0, help_text='Last page saved with every page before it')),
+                ('next_url', models.URLField(blank=True, help_text='Where a resumed run picks up', max_length=500)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('scraping_log', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoint', to='price_comparison.scrapinglog')),
+            ],
+        ),
+    ]
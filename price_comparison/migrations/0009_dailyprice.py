@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('price_comparison', '0008_scrapecheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyPrice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('min_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('max_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('last_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('changes', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['day'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='pricehistory',
+            index=models.Index(fields=['competitor_product', 'changed_at'], name='price_compa_competi_2653c6_idx'),
+        ),
+        migrations.AddField(
+            model_name='dailyprice',
+            name='competitor_product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_prices', to='price_comparison.competitorproduct'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='dailyprice',
+            unique_together={('competitor_product', 'day')},
+        ),
+    ]
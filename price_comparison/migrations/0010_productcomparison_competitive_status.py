@@ -0,0 +1,64 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:18
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_competitive_status(apps, schema_editor):
+    """Same rules as ProductComparison.refresh_competitive_status()"""
+    ProductComparison = apps.get_model('price_comparison', 'ProductComparison')
+    comparisons = list(ProductComparison.objects.select_related(
+        'seller_product', 'best_paklap_match', 'best_priceoye_match'
+    ))
+    for comparison in comparisons:
+        comparison.seller_id = comparison.seller_product.seller_id
+        if not comparison.best_paklap_match_id and not comparison.best_priceoye_match_id:
+            comparison.competitive_status = 'no_match'
+        else:
+            difference = (comparison.paklap_price_difference if comparison.best_paklap_match_id
+                          else comparison.priceoye_price_difference)
+            if difference is not None and difference < -100:
+                comparison.competitive_status = 'underpriced'
+            elif difference is not None and difference > 100:
+                comparison.competitive_status = 'overpriced'
+            else:
+                comparison.competitive_status = 'competitive'
+        prices = [
+            match.price for match in (comparison.best_paklap_match, comparison.best_priceoye_match) if match is not None
+        ]
+        comparison.best_competitor_price = min(prices) if prices else None
+    ProductComparison.objects.bulk_update(
+        comparisons, ['seller', 'competitive_status', 'best_competitor_price'], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('price_comparison', '0009_dailyprice'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productcomparison',
+            name='best_competitor_price',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Lowest matched competitor price', max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='productcomparison',
+            name='competitive_status',
+            field=models.CharField(choices=[('competitive', 'Competitive'), ('overpriced', 'Overpriced'), ('underpriced', 'Underpriced'), ('no_match', 'No Match')], default='no_match', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='productcomparison',
+            name='seller',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='price_comparisons', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='productcomparison',
+            index=models.Index(fields=['seller', 'competitive_status', '-last_compared'], name='price_compa_seller__3628b8_idx'),
+        ),
+        migrations.RunPython(backfill_competitive_status, migrations.RunPython.noop),
+    ]
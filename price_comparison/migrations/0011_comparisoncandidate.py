@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_auto_20250727_2155'),
+        ('price_comparison', '0010_productcomparison_competitive_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productcomparison',
+            name='paklap_match_pinned',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='productcomparison',
+            name='priceoye_match_pinned',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='ComparisonCandidate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('competitor', models.CharField(choices=[('paklap', 'PakLap'), ('priceoye', 'PriceOye')], max_length=20)),
+                ('score', models.FloatField(help_text='Matching confidence score (0-1)')),
+                ('rank', models.PositiveSmallIntegerField(help_text='1 for the best scored candidate of this competitor')),
+                ('competitor_product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='candidate_for', to='price_comparison.competitorproduct')),
+                ('seller_product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='match_candidates', to='products.product')),
+            ],
+            options={
+                'ordering': ['competitor', 'rank'],
+                'indexes': [models.Index(fields=['seller_product', 'competitor', 'rank'], name='price_compa_seller__14e64d_idx')],
+                'unique_together': {('seller_product', 'competitor_product')},
+            },
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:31
+
+from django.db import migrations
+
+SEARCH_TABLE = 'price_comparison_competitorproduct_fts'
+PRODUCT_TABLE = 'price_comparison_competitorproduct'
+
+SEARCH_TRIGGERS = [
+    f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_insert AFTER INSERT ON {PRODUCT_TABLE} BEGIN "
+    f"INSERT INTO {SEARCH_TABLE}(rowid, title) VALUES (new.id, new.title); END",
+    f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_delete AFTER DELETE ON {PRODUCT_TABLE} BEGIN "
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, title) VALUES ('delete', old.id, old.title); END",
+    f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_update AFTER UPDATE OF title ON {PRODUCT_TABLE} BEGIN "
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, title) VALUES ('delete', old.id, old.title); "
+    f"INSERT INTO {SEARCH_TABLE}(rowid, title) VALUES (new.id, new.title); END",
+]
+
+
+class SQLiteSearchSQL(migrations.RunSQL):
+    """RunSQL that only runs on SQLite builds with FTS5; elsewhere search uses title__icontains"""
+
+    def applies_to(self, connection):
+        if connection.vendor != 'sqlite':
+            return False
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA compile_options")
+            return 'ENABLE_FTS5' in {row[0] for row in cursor.fetchall()}
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if self.applies_to(schema_editor.connection):
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if self.applies_to(schema_editor.connection):
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('price_comparison', '0011_comparisoncandidate'),
+    ]
+
+    operations = [
+        SQLiteSearchSQL(
+            sql=[
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+                f"title, content='{PRODUCT_TABLE}', content_rowid='id', "
+                f"prefix='2 3', tokenize='unicode61 remove_diacritics 2')",
+                *SEARCH_TRIGGERS,
+                f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')",
+            ],
+            reverse_sql=[
+                f"DROP TRIGGER IF EXISTS {SEARCH_TABLE}_insert",
+                f"DROP TRIGGER IF EXISTS {SEARCH_TABLE}_delete",
+                f"DROP TRIGGER IF EXISTS {SEARCH_TABLE}_update",
+                f"DROP TABLE IF EXISTS {SEARCH_TABLE}",
+            ],
+        ),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+COMPETITORS = ('paklap', 'priceoye')
+
+
+def copy_matches_to_table(apps, schema_editor):
+    ProductComparison = apps.get_model('price_comparison', 'ProductComparison')
+    CompetitorMatch = apps.get_model('price_comparison', 'CompetitorMatch')
+    
+    matches = []
+    for comparison in ProductComparison.objects.iterator(chunk_size=2000):
+        for competitor in COMPETITORS:
+            competitor_product_id = getattr(comparison, f'best_{competitor}_match_id')
+            if competitor_product_id:
+                matches.append(CompetitorMatch(
+                    seller_product_id=comparison.seller_product_id,
+                    competitor=competitor,
+                    competitor_product_id=competitor_product_id,
+                    confidence=getattr(comparison, f'match_confidence_{competitor}'),
+                    price_difference=getattr(comparison, f'{competitor}_price_difference'),
+                    pinned=getattr(comparison, f'{competitor}_match_pinned'),
+                ))
+    CompetitorMatch.objects.bulk_create(matches, batch_size=500)
+
+
+def copy_matches_to_columns(apps, schema_editor):
+    ProductComparison = apps.get_model('price_comparison', 'ProductComparison')
+    CompetitorMatch = apps.get_model('price_comparison', 'CompetitorMatch')
+    
+    comparisons = {comparison.seller_product_id: comparison for comparison in ProductComparison.objects.all()}
+    for match in CompetitorMatch.objects.filter(competitor__in=COMPETITORS):
+        comparison = comparisons.get(match.seller_product_id)
+        if comparison is None:
+            continue
+        setattr(comparison, f'best_{match.competitor}_match_id', match.competitor_product_id)
+        setattr(comparison, f'match_confidence_{match.competitor}', match.confidence)
+        setattr(comparison, f'{match.competitor}_price_difference', match.price_difference)
+        setattr(comparison, f'{match.competitor}_match_pinned', match.pinned)
+    ProductComparison.objects.bulk_update(comparisons.values(), [
+        f'{prefix}{competitor}{suffix}'
+        for competitor in COMPETITORS
+        for prefix, suffix in (('best_', '_match'), ('match_confidence_', ''), ('', '_price_difference'), ('', '_match_pinned'))
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_auto_20250727_2155'),
+        ('price_comparison', '0013_catalogversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompetitorMatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('competitor', models.CharField(choices=[('paklap', 'PakLap'), ('priceoye', 'PriceOye')], max_length=20)),
+                ('confidence', models.FloatField(default=0.0, help_text='Matching confidence score (0-1)')),
+                ('price_difference', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('pinned', models.BooleanField(default=False)),
+                ('competitor_product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='matches', to='price_comparison.competitorproduct')),
+                ('seller_product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='competitor_matches', to='products.product')),
+            ],
+            options={
+                'unique_together': {('seller_product', 'competitor')},
+            },
+        ),
+        migrations.RunPython(copy_matches_to_table, copy_matches_to_columns),
+        migrations.RemoveField(
+            model_name='productcomparison',
+            name='best_paklap_match',
+        ),
+        migrations.RemoveField(
+            model_name='productcomparison',
+            name='best_priceoye_match',
+        ),
+        migrations.RemoveField(
+            model_name='productcomparison',
+            name='match_confidence_paklap',
+        ),
+        migrations.RemoveField(
+            model_name='productcomparison',
+            name='match_confidence_priceoye',
+        ),
+        migrations.RemoveField(
+            model_name='productcomparison',
+            name='paklap_match_pinned',
+        ),
+        migrations.RemoveField(
+            model_name='productcomparison',
+            name='paklap_price_difference',
+        ),
+        migrations.RemoveField(
+            model_name='productcomparison',
+            name='priceoye_match_pinned',
+        ),
+        migrations.RemoveField(
+            model_name='productcomparison',
+            name='priceoye_price_difference',
+        ),
+    ]
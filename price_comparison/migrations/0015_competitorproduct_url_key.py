@@ -0,0 +1,140 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:02
+
+import hashlib
+import re
+from collections import defaultdict
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from django.db import migrations, models
+
+SEARCH_TABLE = 'price_comparison_competitorproduct_fts'
+PRODUCT_TABLE = 'price_comparison_competitorproduct'
+
+# Rebuilding the table on SQLite drops the search index's sync triggers (see 0012)
+SEARCH_TRIGGERS = [
+    f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_insert AFTER INSERT ON {PRODUCT_TABLE} BEGIN "
+    f"INSERT INTO {SEARCH_TABLE}(rowid, title) VALUES (new.id, new.title); END",
+    f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_delete AFTER DELETE ON {PRODUCT_TABLE} BEGIN "
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, title) VALUES ('delete', old.id, old.title); END",
+    f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_update AFTER UPDATE OF title ON {PRODUCT_TABLE} BEGIN "
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, title) VALUES ('delete', old.id, old.title); "
+    f"INSERT INTO {SEARCH_TABLE}(rowid, title) VALUES (new.id, new.title); END",
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')",
+]
+
+
+class SQLiteSearchSQL(migrations.RunSQL):
+    """RunSQL that only runs on SQLite builds with FTS5, like the index it maintains"""
+
+    def applies_to(self, connection):
+        if connection.vendor != 'sqlite':
+            return False
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA compile_options")
+            return 'ENABLE_FTS5' in {row[0] for row in cursor.fetchall()}
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if self.applies_to(schema_editor.connection):
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if self.applies_to(schema_editor.connection):
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+# Frozen copy of matching.listing_key as of this migration, so later changes
+# to URL canonicalization can't change what it computes
+def listing_key(url, title):
+    if url and url.startswith('http'):
+        parts = urlsplit(url.strip())
+        host = parts.netloc.lower()
+        if host.startswith('www.'):
+            host = host[4:]
+        path = parts.path.rstrip('/')
+        query = sorted(
+            (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+            if not name.startswith('utm_') and name not in ('gclid', 'fbclid')
+        )
+        identity = f"{host}{path}?{urlencode(query)}" if query else f"{host}{path}"
+    else:
+        identity = 'title:' + re.sub(r'\s+', ' ', title.strip()).lower()
+    return hashlib.sha1(identity.encode('utf-8')).hexdigest()
+
+
+def key_and_merge_listings(apps, schema_editor):
+    CompetitorProduct = apps.get_model('price_comparison', 'CompetitorProduct')
+    PriceHistory = apps.get_model('price_comparison', 'PriceHistory')
+    DailyPrice = apps.get_model('price_comparison', 'DailyPrice')
+    CompetitorChange = apps.get_model('price_comparison', 'CompetitorChange')
+    CompetitorMatch = apps.get_model('price_comparison', 'CompetitorMatch')
+    ComparisonCandidate = apps.get_model('price_comparison', 'ComparisonCandidate')
+
+    groups = defaultdict(list)
+    for listing in CompetitorProduct.objects.only(
+        'id', 'title', 'url', 'competitor', 'is_active', 'scrape_generation', 'timestamp'
+    ).iterator(chunk_size=2000):
+        groups[listing.competitor, listing_key(listing.url, listing.title)].append(listing)
+
+    survivors = []
+    for (_, key), group in groups.items():
+        # The listing seen most recently keeps its row; the rest fold into it
+        group.sort(key=lambda listing: (listing.is_active, listing.scrape_generation, listing.timestamp, listing.pk))
+        survivor = group.pop()
+        survivor.url_key = key
+        survivors.append(survivor)
+        if not group:
+            continue
+
+        duplicate_ids = [listing.pk for listing in group]
+        PriceHistory.objects.filter(competitor_product_id__in=duplicate_ids).update(competitor_product=survivor)
+        CompetitorChange.objects.filter(competitor_product_id__in=duplicate_ids).update(competitor_product=survivor)
+        CompetitorMatch.objects.filter(competitor_product_id__in=duplicate_ids).update(competitor_product=survivor)
+
+        days = {rollup.day: rollup for rollup in DailyPrice.objects.filter(competitor_product=survivor)}
+        for rollup in DailyPrice.objects.filter(competitor_product_id__in=duplicate_ids).order_by('day'):
+            kept = days.get(rollup.day)
+            if kept is None:
+                rollup.competitor_product = survivor
+                days[rollup.day] = rollup
+            else:
+                kept.min_price = min(kept.min_price, rollup.min_price)
+                kept.max_price = max(kept.max_price, rollup.max_price)
+                kept.changes += rollup.changes
+        DailyPrice.objects.bulk_update(days.values(), ['competitor_product', 'min_price', 'max_price', 'changes'])
+
+        ranked = set(
+            ComparisonCandidate.objects.filter(competitor_product=survivor).values_list('seller_product_id', flat=True)
+        )
+        for candidate in ComparisonCandidate.objects.filter(competitor_product_id__in=duplicate_ids).order_by('rank'):
+            if candidate.seller_product_id not in ranked:
+                ranked.add(candidate.seller_product_id)
+                candidate.competitor_product = survivor
+                candidate.save(update_fields=['competitor_product'])
+
+        CompetitorProduct.objects.filter(pk__in=duplicate_ids).delete()
+
+    CompetitorProduct.objects.bulk_update(survivors, ['url_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('price_comparison', '0014_competitormatch'),
+    ]
+
+    operations = [
+        # Unapplying drops the column, rebuilding the table once more
+        SQLiteSearchSQL(sql=migrations.RunSQL.noop, reverse_sql=SEARCH_TRIGGERS),
+        migrations.AddField(
+            model_name='competitorproduct',
+            name='url_key',
+            field=models.CharField(default='', editable=False, max_length=40),
+            preserve_default=False,
+        ),
+        migrations.RunPython(key_and_merge_listings, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='competitorproduct',
+            unique_together={('competitor', 'url_key')},
+        ),
+        SQLiteSearchSQL(sql=SEARCH_TRIGGERS, reverse_sql=migrations.RunSQL.noop),
+    ]
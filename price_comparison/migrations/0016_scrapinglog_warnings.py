@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('price_comparison', '0015_competitorproduct_url_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scrapinglog',
+            name='warnings',
+            field=models.TextField(blank=True),
+        ),
+    ]
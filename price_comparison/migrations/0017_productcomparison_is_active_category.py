@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:05
+
+from django.db import migrations, models
+
+
+def copy_product_fields(apps, schema_editor):
+    ProductComparison = apps.get_model('price_comparison', 'ProductComparison')
+    comparisons = list(ProductComparison.objects.select_related('seller_product'))
+    for comparison in comparisons:
+        comparison.is_active = comparison.seller_product.is_active
+        comparison.category = comparison.seller_product.category
+    ProductComparison.objects.bulk_update(comparisons, ['is_active', 'category'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('price_comparison', '0016_scrapinglog_warnings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productcomparison',
+            name='category',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='productcomparison',
+            name='is_active',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.RemoveIndex(
+            model_name='productcomparison',
+            name='price_compa_seller__3628b8_idx',
+        ),
+        migrations.AddIndex(
+            model_name='productcomparison',
+            index=models.Index(fields=['seller', 'is_active', 'category', 'competitive_status', '-last_compared'], name='price_compa_seller__310893_idx'),
+        ),
+        migrations.RunPython(copy_product_fields, migrations.RunPython.noop),
+    ]
@@ -1,81 +1,242 @@
+from django.conf import settings
 from django.db import models
 from products.models import Product
 from django.utils import timezone
+from .matching import features_from_columns, listing_key
 
 
-class CompetitorProduct(models.Model):
+class MatchFeatures(models.Model):
+    """Precomputed matching features for a product title"""
+    normalized_title = models.CharField(max_length=255, blank=True, db_index=True)
+    brand = models.CharField(max_length=20, blank=True, db_index=True)
+    model_number = models.CharField(max_length=50, blank=True, db_index=True)
+    screen_size = models.CharField(max_length=10, blank=True, db_index=True)
+    processor = models.CharField(max_length=30, blank=True, db_index=True)
+    special_features = models.CharField(max_length=100, blank=True, help_text="Comma-separated feature tags")
+    
+    FEATURE_FIELDS = ['normalized_title', 'brand', 'model_number', 'screen_size', 'processor', 'special_features']
+    
+    class Meta:
+        abstract = True
+    
+    @property
+    def has_match_features(self):
+        return bool(self.normalized_title)
+    
+    def set_match_features(self, columns):
+        """Copy feature columns (see matching.feature_columns) onto this row"""
+        for field, value in columns.items():
+            setattr(self, field, value)
+    
+    def get_key_features(self):
+        """Rebuild the KeyFeatures record produced by matching.extract_key_features"""
+        return features_from_columns(
+            self.brand, self.model_number, self.screen_size, self.processor, self.special_features
+        )
+
+
+class CompetitorProduct(MatchFeatures):
     """Generic model for storing competitor products"""
     COMPETITOR_CHOICES = [
         ('paklap', 'PakLap'),
         ('priceoye', 'PriceOye'),
     ]
+    COMPETITORS = [competitor for competitor, _ in COMPETITOR_CHOICES]
     
     title = models.CharField(max_length=255)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     url = models.URLField()
+    # listing_key() of the URL (or of the title without one); the listing's identity for upserts
+    url_key = models.CharField(max_length=40, editable=False)
     competitor = models.CharField(max_length=20, choices=COMPETITOR_CHOICES)
     timestamp = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True)
+    # Number of the last scrape run that saw this listing, see CatalogChangeRecorder
+    scrape_generation = models.PositiveIntegerField(default=0)
     
     class Meta:
-        unique_together = ['title', 'competitor']
+        unique_together = ['competitor', 'url_key']
         ordering = ['-timestamp']
+        indexes = [models.Index(fields=['competitor', 'is_active', 'scrape_generation'])]
     
     def __str__(self):
         return f"{self.title} - {self.get_competitor_display()}"
+    
+    def save(self, *args, **kwargs):
+        self.url_key = listing_key(self.url, self.title)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'url', 'title'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'url_key'}
+        super().save(*args, **kwargs)
+
+
+class CatalogVersion(models.Model):
+    """Change counter for one competitor's catalog, bumped whenever its listings are written.
+    
+    Processes keep a snapshot of the catalog (see services.shared_competitor_indexes)
+    and only reload it when the token changes.
+    """
+    competitor = models.CharField(max_length=20, choices=CompetitorProduct.COMPETITOR_CHOICES, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    # Fresh for every bump, so a rolled back bump can't leave two catalogs with the same version
+    token = models.CharField(max_length=32, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.get_competitor_display()} catalog v{self.version}"
+
+
+class SellerProductFeatures(MatchFeatures):
+    """Precomputed matching features for a seller product"""
+    seller_product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='match_features')
+    source_name = models.CharField(max_length=100, help_text="Product name the features were extracted from")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Match features for {self.seller_product.name}"
+    
+    @property
+    def is_current(self):
+        return self.source_name == self.seller_product.name
 
 
 class ProductComparison(models.Model):
     """Model to store price comparisons for seller products"""
+    COMPETITIVE_STATUS_CHOICES = [
+        ('competitive', 'Competitive'),
+        ('overpriced', 'Overpriced'),
+        ('underpriced', 'Underpriced'),
+        ('no_match', 'No Match'),
+    ]
+    # Price differences within this many rupees count as competitive
+    COMPETITIVE_MARGIN = 100
+    
     seller_product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='price_comparison')
-    best_paklap_match = models.ForeignKey(
-        CompetitorProduct, 
-        on_delete=models.SET_NULL, 
-        null=True, 
-        blank=True, 
-        related_name='paklap_comparisons',
-        limit_choices_to={'competitor': 'paklap'}
+    # Copied from seller_product so the seller's list can be served by one index
+    seller = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, related_name='price_comparisons'
     )
-    best_priceoye_match = models.ForeignKey(
-        CompetitorProduct, 
-        on_delete=models.SET_NULL, 
-        null=True, 
-        blank=True, 
-        related_name='priceoye_comparisons',
-        limit_choices_to={'competitor': 'priceoye'}
-    )
-    priceoye_price_difference = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
-    paklap_price_difference = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    is_active = models.BooleanField(default=True)
+    category = models.CharField(max_length=50, blank=True)
     last_compared = models.DateTimeField(auto_now=True)
-    match_confidence_paklap = models.FloatField(default=0.0, help_text="Matching confidence score (0-1)")
-    match_confidence_priceoye = models.FloatField(default=0.0, help_text="Matching confidence score (0-1)")
+    # Derived from the product's CompetitorMatch rows by refresh_competitive_status() whenever a comparison is written
+    competitive_status = models.CharField(max_length=20, choices=COMPETITIVE_STATUS_CHOICES, default='no_match')
+    best_competitor_price = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, blank=True, help_text="Lowest matched competitor price"
+    )
+    
+    # Fields refresh_competitive_status() sets, for bulk writes
+    DERIVED_FIELDS = ['seller', 'is_active', 'category', 'competitive_status', 'best_competitor_price']
+    
+    class Meta:
+        indexes = [models.Index(fields=['seller', 'is_active', 'category', 'competitive_status', '-last_compared'])]
     
     def __str__(self):
         return f"Comparison for {self.seller_product.name}"
     
+    def save(self, *args, **kwargs):
+        self.refresh_competitive_status()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, *self.DERIVED_FIELDS}
+        super().save(*args, **kwargs)
+    
+    def get_matches(self):
+        """The product's CompetitorMatch rows in COMPETITOR_CHOICES order, from the prefetch cache when there is one"""
+        matches = self.seller_product.competitor_matches.all()
+        if 'competitor_matches' not in getattr(self.seller_product, '_prefetched_objects_cache', {}):
+            matches = matches.select_related('competitor_product')
+        return sorted(matches, key=lambda match: CompetitorProduct.COMPETITORS.index(match.competitor))
+    
     @property
-    def is_competitive_priceoye(self):
-        """Check if seller's price is competitive with PriceOye"""
-        if self.priceoye_price_difference is None:
-            return None
-        return self.priceoye_price_difference >= 0  # True if seller's price is equal or higher
+    def match_slots(self):
+        """(competitor, display name, CompetitorMatch or None) for every competitor, for table columns"""
+        matches = {match.competitor: match for match in self.get_matches()}
+        return [(competitor, name, matches.get(competitor)) for competitor, name in CompetitorProduct.COMPETITOR_CHOICES]
+    
+    def refresh_competitive_status(self, matches=None):
+        """Recompute the denormalized product fields, status and best competitor price.
+        
+        matches are the product's CompetitorMatch rows, read from the
+        database when not given. Products are judged against the first
+        competitor in COMPETITOR_CHOICES they are matched on.
+        """
+        matches = self.get_matches() if matches is None else sorted(
+            matches, key=lambda match: CompetitorProduct.COMPETITORS.index(match.competitor)
+        )
+        self.seller_id = self.seller_product.seller_id
+        self.is_active = self.seller_product.is_active
+        self.category = self.seller_product.category
+        if not matches:
+            self.competitive_status = 'no_match'
+        else:
+            difference = matches[0].price_difference
+            if difference is not None and difference < -self.COMPETITIVE_MARGIN:
+                self.competitive_status = 'underpriced'
+            elif difference is not None and difference > self.COMPETITIVE_MARGIN:
+                self.competitive_status = 'overpriced'
+            else:
+                self.competitive_status = 'competitive'
+        
+        prices = [match.competitor_product.price for match in matches]
+        self.best_competitor_price = min(prices) if prices else None
+
+
+class CompetitorMatch(models.Model):
+    """A seller product's current match on one competitor; one row per competitor that has a match"""
+    seller_product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='competitor_matches')
+    competitor = models.CharField(max_length=20, choices=CompetitorProduct.COMPETITOR_CHOICES)
+    competitor_product = models.ForeignKey(CompetitorProduct, on_delete=models.CASCADE, related_name='matches')
+    confidence = models.FloatField(default=0.0, help_text="Matching confidence score (0-1)")
+    # Seller price minus competitor price
+    price_difference = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    # Set when the seller picked the match from its candidates; re-matching keeps it while the listing is active
+    pinned = models.BooleanField(default=False)
+    
+    # Fields the matcher writes, for bulk upserts
+    MATCH_FIELDS = ['competitor_product', 'confidence', 'price_difference', 'pinned']
+    
+    class Meta:
+        unique_together = ['seller_product', 'competitor']
+    
+    def __str__(self):
+        return f"{self.seller_product.name} - {self.get_competitor_display()} match"
     
     @property
-    def is_competitive_paklap(self):
-        """Check if seller's price is competitive with PakLap"""
-        if self.paklap_price_difference is None:
+    def is_competitive(self):
+        """Check if seller's price is competitive with this competitor"""
+        if self.price_difference is None:
             return None
-        return self.paklap_price_difference >= 0  # True if seller's price is equal or higher
+        return self.price_difference >= 0  # True if seller's price is equal or higher
+
+
+class ComparisonCandidate(models.Model):
+    """One of the best scored competitor listings for a seller product, kept by the batch matcher"""
+    seller_product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='match_candidates')
+    competitor_product = models.ForeignKey(CompetitorProduct, on_delete=models.CASCADE, related_name='candidate_for')
+    competitor = models.CharField(max_length=20, choices=CompetitorProduct.COMPETITOR_CHOICES)
+    score = models.FloatField(help_text="Matching confidence score (0-1)")
+    rank = models.PositiveSmallIntegerField(help_text="1 for the best scored candidate of this competitor")
     
-    @property
-    def best_competitor_price(self):
-        """Get the best (lowest) competitor price"""
-        prices = []
-        if self.best_paklap_match:
-            prices.append(self.best_paklap_match.price)
-        if self.best_priceoye_match:
-            prices.append(self.best_priceoye_match.price)
-        return min(prices) if prices else None
+    class Meta:
+        ordering = ['competitor', 'rank']
+        unique_together = ['seller_product', 'competitor_product']
+        indexes = [models.Index(fields=['seller_product', 'competitor', 'rank'])]
+    
+    def __str__(self):
+        return f"#{self.rank} {self.get_competitor_display()} candidate for product #{self.seller_product_id}"
+
+
+class PendingComparison(models.Model):
+    """Deduplicated queue of seller products whose comparison needs refreshing"""
+    seller_product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='pending_comparison')
+    queued_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['queued_at']
+    
+    def __str__(self):
+        return f"Pending comparison for product #{self.seller_product_id}"
 
 
 class PriceHistory(models.Model):
@@ -87,11 +248,29 @@ class PriceHistory(models.Model):
     
     class Meta:
         ordering = ['-changed_at']
+        indexes = [models.Index(fields=['competitor_product', 'changed_at'])]
     
     def __str__(self):
         return f"{self.competitor_product.title}: {self.old_price} → {self.new_price}"
 
 
+class DailyPrice(models.Model):
+    """Daily rollup of a competitor product's PriceHistory, kept after the raw rows are compacted"""
+    competitor_product = models.ForeignKey(CompetitorProduct, on_delete=models.CASCADE, related_name='daily_prices')
+    day = models.DateField()
+    min_price = models.DecimalField(max_digits=10, decimal_places=2)
+    max_price = models.DecimalField(max_digits=10, decimal_places=2)
+    last_price = models.DecimalField(max_digits=10, decimal_places=2)
+    changes = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['competitor_product', 'day']
+        ordering = ['day']
+    
+    def __str__(self):
+        return f"{self.competitor_product.title} on {self.day}: {self.last_price}"
+
+
 class ScrapingLog(models.Model):
     """Log scraping activities"""
     STATUS_CHOICES = [
@@ -105,7 +284,11 @@ class ScrapingLog(models.Model):
     products_scraped = models.IntegerField(default=0)
     new_products = models.IntegerField(default=0)
     updated_products = models.IntegerField(default=0)
+    pages_processed = models.IntegerField(default=0)
+    pages_skipped = models.IntegerField(default=0)
     errors = models.TextField(blank=True)
+    # Failures the run recovered from, e.g. the HTTP error behind a Selenium fallback
+    warnings = models.TextField(blank=True)
     started_at = models.DateTimeField(auto_now_add=True)
     completed_at = models.DateTimeField(null=True, blank=True)
     
@@ -125,3 +308,55 @@ class ScrapingLog(models.Model):
         self.completed_at = timezone.now()
         self.errors = error_message
         self.save()
+
+
+class ScrapeCheckpoint(models.Model):
+    """Progress of a scrape run, committed with each saved page so an interrupted run can resume"""
+    scraping_log = models.OneToOneField(ScrapingLog, on_delete=models.CASCADE, related_name='checkpoint')
+    generation = models.PositiveIntegerField(help_text="Scrape generation stamped on the listings this run saw")
+    last_page = models.PositiveIntegerField(default=0, help_text="Last page saved with every page before it")
+    next_url = models.URLField(max_length=500, blank=True, help_text="Where a resumed run picks up")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.scraping_log} - page {self.last_page}"
+
+
+class ScrapedPage(models.Model):
+    """Listing page state from the last scrape, used to skip pages that haven't changed"""
+    competitor = models.CharField(max_length=20, choices=CompetitorProduct.COMPETITOR_CHOICES)
+    url = models.URLField(max_length=500)
+    content_hash = models.CharField(max_length=64)
+    etag = models.CharField(max_length=200, blank=True)
+    last_modified = models.CharField(max_length=100, blank=True)
+    listings = models.JSONField(default=list)
+    scraped_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['competitor', 'url']
+    
+    def __str__(self):
+        return f"{self.get_competitor_display()} - {self.url}"
+
+
+class CompetitorChange(models.Model):
+    """Competitor catalog change recorded by a scrape, waiting to be applied to comparisons"""
+    CHANGE_TYPES = [
+        ('new', 'New listing'),
+        ('title', 'Title changed'),
+        ('price', 'Price changed'),
+        ('deactivated', 'Deactivated'),
+    ]
+    
+    competitor_product = models.ForeignKey(CompetitorProduct, on_delete=models.CASCADE, related_name='changes')
+    scraping_log = models.ForeignKey(ScrapingLog, on_delete=models.SET_NULL, null=True, blank=True, related_name='changes')
+    change_type = models.CharField(max_length=20, choices=CHANGE_TYPES)
+    old_title = models.CharField(max_length=255, blank=True)
+    old_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    detected_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['detected_at']
+    
+    def __str__(self):
+        return f"{self.get_change_type_display()}: {self.competitor_product.title}"
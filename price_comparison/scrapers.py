@@ -0,0 +1,707 @@
+"""HTTP-first competitor scrapers.
+
+Listing pages are fetched concurrently over a pooled aiohttp session and
+parsed with lxml. Headless Chrome is only kept as a fallback for
+when a site stops serving its listings in the HTML, from a shared
+BrowserPool of resource-trimmed drivers.
+
+This module doesn't touch the database; the scrape commands feed the parsed
+listings to CatalogChangeRecorder.
+"""
+
+import asyncio
+import atexit
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from decimal import Decimal
+from urllib.parse import parse_qs, urlencode, urljoin, urlsplit, urlunsplit
+
+import aiohttp
+from lxml import etree, html as lxml_html
+
+from .matching import normalize_product_title
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+ScrapedListing = namedtuple('ScrapedListing', ['title', 'price', 'url', 'image'])
+FetchResponse = namedtuple('FetchResponse', ['status', 'body', 'etag', 'last_modified'])
+
+
+# A scraped listing page; `unchanged` pages carry the listings cached by the last scrape
+FetchedPage = namedtuple('FetchedPage', [
+    'number', 'url', 'listings', 'content_hash', 'etag', 'last_modified', 'unchanged'
+])
+
+
+class FetchError(Exception):
+    """A page could not be fetched after every retry"""
+
+
+class Fetcher:
+    """Pooled async HTTP client with bounded per-host concurrency and retries.
+    
+    Use as an async context manager so the connection pool is shared by every
+    request of a scrape and closed afterwards.
+    """
+    
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+    
+    def __init__(self, per_host=4, total=20, retries=3, backoff=0.5, timeout=20):
+        self.per_host = per_host
+        self.total = total
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session = None
+    
+    async def __aenter__(self):
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.total, limit_per_host=self.per_host),
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={'User-Agent': USER_AGENT, 'Accept-Language': 'en-US,en;q=0.9'},
+        )
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+    
+    async def fetch(self, url, etag='', last_modified=''):
+        """Return a FetchResponse for url, retrying transient failures with exponential backoff.
+        
+        Pass the validators from the previous fetch to make a conditional
+        request; an unchanged page then comes back as a 304 without a body.
+        """
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        
+        for attempt in range(self.retries + 1):
+            try:
+                async with self.session.get(url, headers=headers) as response:
+                    if response.status not in self.RETRY_STATUSES:
+                        response.raise_for_status()
+                        body = await response.text() if response.status != 304 else None
+                        return FetchResponse(
+                            response.status, body,
+                            response.headers.get('ETag', etag), response.headers.get('Last-Modified', last_modified)
+                        )
+                    error = f"HTTP {response.status}"
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                error = str(e) or e.__class__.__name__
+            except aiohttp.ClientResponseError as e:
+                raise FetchError(f"{url}: HTTP {e.status}") from e
+            
+            if attempt < self.retries:
+                # Jitter keeps concurrent retries from hitting the host in lockstep
+                await asyncio.sleep(self.backoff * 2 ** attempt * (1 + random.random() / 2))
+        
+        raise FetchError(f"{url}: {error} after {self.retries + 1} attempts")
+    
+    async def get(self, url):
+        """Return the body of url"""
+        return (await self.fetch(url)).body
+    
+    async def fetch_many(self, requests):
+        """Fetch (url, etag, last_modified) requests concurrently; failures come back as FetchError instances"""
+        return await asyncio.gather(*(self.fetch(*request) for request in requests), return_exceptions=True)
+
+
+def has_class(name):
+    """XPath predicate matching elements with `name` among their classes (the CSS `.name` selector)"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+def parse_document(html):
+    """Parse page HTML with lxml; returns None for an empty body (already parsed documents pass through)"""
+    if isinstance(html, etree._Element):
+        return html
+    if isinstance(html, str):
+        # lxml refuses str input that carries an XML encoding declaration
+        html = html.encode('utf-8')
+    if not html.strip():
+        return None
+    return lxml_html.document_fromstring(html)
+
+
+def first(elements):
+    return elements[0] if elements else None
+
+
+def save_snapshot(snapshot_dir, site, number, html):
+    """Save a fetched listing page for bench_scrape_parse and parser fixtures"""
+    os.makedirs(snapshot_dir, exist_ok=True)
+    path = os.path.join(snapshot_dir, f'{site.competitor}_page{number}.html')
+    with open(path, 'w', encoding='utf-8') as snapshot:
+        snapshot.write(html)
+
+
+def build_page(site, number, url, body, known=None, etag='', last_modified=''):
+    """Turn a fetched page body into a FetchedPage, skipping the parse if its cards didn't change.
+    
+    `known` is the page's state from the last scrape (content_hash and the
+    parsed listings); a body of None means the server answered 304.
+    """
+    if body is None:
+        return FetchedPage(number, url, known['listings'], known['content_hash'], etag, last_modified, True)
+    
+    document = parse_document(body)
+    content_hash = site.content_hash(document)
+    if known and known['content_hash'] == content_hash:
+        return FetchedPage(number, url, known['listings'], content_hash, etag, last_modified, True)
+    
+    return FetchedPage(number, url, site.parse_listings(document, url), content_hash, etag, last_modified, False)
+
+
+SITES = {}
+
+
+class ListingSite:
+    """Adapter for a competitor's login-free laptop catalog: where it starts, how it pages and how to parse it.
+    
+    Subclasses that set `competitor` are registered in SITES, which is all
+    run_all_scrapers and the scrape commands need to pick up a new
+    competitor. They parse with lxml and XPath expressions compiled once at
+    import time; iter_listings() yields listings as it walks the page.
+    """
+    competitor = None
+    start_url = None
+    # Query parameter the site (or its infinite-scroll XHR endpoint) pages with
+    page_param = 'page'
+    # Concurrent connections this site gets during a scrape
+    concurrency = 4
+    # Rendered listing markers the Selenium fallback waits for / clicks
+    product_selector = None
+    next_selectors = []
+    # Compiled XPath selecting the product cards of a page
+    PRODUCTS = None
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.competitor:
+            SITES[cls.competitor] = cls
+    
+    LINK_HREFS = etree.XPath("//a/@href | //link[@rel='next']/@href")
+    
+    def __init__(self, start_url=None):
+        if start_url:
+            self.start_url = start_url
+        self.page_number_pattern = re.compile(rf'[?&]{re.escape(self.page_param)}=(\d+)')
+    
+    def page_url(self, number):
+        """Return the URL of listing page `number`"""
+        parts = urlsplit(self.start_url)
+        query = parse_qs(parts.query)
+        query[self.page_param] = [str(number)]
+        return urlunsplit(parts._replace(query=urlencode(query, doseq=True)))
+    
+    def last_page_number(self, html):
+        """Return the highest page number linked from a listing page, or None if it has no pagination"""
+        document = parse_document(html)
+        if document is None:
+            return None
+        numbers = []
+        for href in self.LINK_HREFS(document):
+            match = self.page_number_pattern.search(href)
+            if match:
+                numbers.append(int(match.group(1)))
+        return max(numbers) if numbers else None
+    
+    def content_hash(self, html):
+        """Fingerprint a listing page by its product cards only, ignoring per-request noise elsewhere"""
+        digest = hashlib.sha256()
+        document = parse_document(html)
+        if document is not None:
+            for card in self.PRODUCTS(document):
+                digest.update(etree.tostring(card))
+        return digest.hexdigest()
+    
+    def iter_listings(self, html, page_url):
+        """Yield the ScrapedListings on a listing page (HTML or a parsed document)"""
+        raise NotImplementedError
+    
+    def parse_listings(self, html, page_url):
+        """Return the ScrapedListings on a listing page"""
+        return list(self.iter_listings(html, page_url))
+
+
+class PakLapSite(ListingSite):
+    competitor = 'paklap'
+    start_url = 'https://www.paklap.pk/laptops-prices.html'
+    page_param = 'p'
+    product_selector = '.product-item-details'
+    next_selectors = ['a.action.next', 'li.pages-item-next a']
+    
+    PRODUCTS = etree.XPath(f"//*[{has_class('product-item-details')}]")
+    TITLE_LINK = etree.XPath(f".//*[{has_class('product-item-link')}]")
+    PRICE = etree.XPath(f".//*[{has_class('price')}]")
+    IMAGE = etree.XPath(
+        f"ancestor::*[{has_class('product-item-info')}][1]//img[{has_class('product-image-photo')}]/@src"
+    )
+    
+    def iter_listings(self, html, page_url):
+        document = parse_document(html)
+        if document is None:
+            return
+        for product in self.PRODUCTS(document):
+            title_tag = first(self.TITLE_LINK(product))
+            # Normalize the title for better matching
+            title = normalize_product_title(title_tag.text_content()) if title_tag is not None else ''
+            
+            # Prices look like "PKR 254,999.00"; keep the whole rupees
+            price_tag = first(self.PRICE(product))
+            price_text = price_tag.text_content().strip().replace(',', '').replace('.00', '') if price_tag is not None else ''
+            num_str = ''.join(filter(str.isdigit, price_text))
+            price = int(num_str) if num_str else 0
+            
+            href = title_tag.get('href') if title_tag is not None else None
+            url = urljoin(page_url, href) if href else ''
+            
+            image = first(self.IMAGE(product)) or ''
+            
+            # Only keep products with valid titles and prices
+            if title and price > 0:
+                yield ScrapedListing(title, price, url, str(image))
+
+
+class PriceOyeSite(ListingSite):
+    competitor = 'priceoye'
+    start_url = 'https://priceoye.pk/laptops/'
+    page_param = 'page'
+    product_selector = 'div.productBox.b-productBox'
+    
+    PRODUCTS = etree.XPath(f"//div[{has_class('productBox')} and {has_class('b-productBox')}]")
+    LINK = etree.XPath(f".//a[{has_class('ga-dataset')}]")
+    TITLE = etree.XPath(f".//div[{has_class('p-title')}]")
+    PRICE = etree.XPath(f".//div[{has_class('price-box')}]")
+    IMAGE = etree.XPath(".//img/@src")
+    
+    def iter_listings(self, html, page_url):
+        document = parse_document(html)
+        if document is None:
+            return
+        for div in self.PRODUCTS(document):
+            a_tag = first(self.LINK(div))
+            if a_tag is None or not a_tag.get('href'):
+                continue
+            title_div = first(self.TITLE(a_tag))
+            price_box = first(self.PRICE(a_tag))
+            if title_div is None or price_box is None:
+                continue
+            
+            price_clean = re.sub(r'[^\d]', '', price_box.text_content())
+            if not price_clean or int(price_clean) == 0:
+                continue
+            
+            yield ScrapedListing(
+                title=title_div.text_content().strip(),
+                price=Decimal(price_clean),
+                url=urljoin(page_url, a_tag.get('href')),
+                image=str(first(self.IMAGE(a_tag)) or ''),
+            )
+
+
+class HttpScraper:
+    """Scrape a listing site over plain HTTP.
+    
+    Page URLs are discovered from the first page: if it links to numbered
+    pages they are all fetched at once, otherwise (infinite scroll backed by
+    a paged XHR endpoint) pages are probed a window at a time until one
+    brings no new listings.
+    
+    `known_pages` maps page URLs to their state from the last scrape (etag,
+    last_modified, content_hash, listings); those pages are fetched
+    conditionally and not parsed again if unchanged. Pages between one and
+    `start_page` (already saved by an interrupted run) aren't fetched.
+    """
+    
+    def __init__(self, site, fetcher=None, max_pages=20, probe_window=4, snapshot_dir=None, known_pages=None,
+                 start_page=1):
+        self.site = site
+        self.fetcher = fetcher or Fetcher(per_host=site.concurrency)
+        self.max_pages = max_pages
+        self.probe_window = probe_window
+        self.snapshot_dir = snapshot_dir
+        self.known_pages = known_pages or {}
+        self.start_page = start_page
+        self.errors = []
+    
+    def scrape(self):
+        """Return a FetchedPage for page one and every page from start_page, in page order"""
+        return asyncio.run(self.scrape_async())
+    
+    async def scrape_async(self):
+        async with self.fetcher as fetcher:
+            # Always fetch page one in full: discovery needs its pagination links
+            response = await fetcher.fetch(self.site.start_url)
+            if self.snapshot_dir:
+                save_snapshot(self.snapshot_dir, self.site, 1, response.body)
+            document = parse_document(response.body)
+            pages = [build_page(
+                self.site, 1, self.site.start_url, document, self.known_pages.get(self.site.start_url),
+                response.etag, response.last_modified
+            )]
+            if not pages[0].listings:
+                return []
+            
+            last_page = self.site.last_page_number(document)
+            if last_page:
+                numbers = range(max(self.start_page, 2), min(last_page, self.max_pages) + 1)
+                pages += await self.fetch_pages(fetcher, numbers)
+                return pages
+            
+            seen = {listing.title for listing in pages[0].listings}
+            next_number = max(self.start_page, 2)
+            while next_number <= self.max_pages:
+                numbers = range(next_number, min(next_number + self.probe_window, self.max_pages + 1))
+                for page in await self.fetch_pages(fetcher, numbers):
+                    new_titles = {listing.title for listing in page.listings} - seen
+                    if not new_titles:
+                        return pages
+                    seen.update(new_titles)
+                    pages.append(page)
+                next_number += self.probe_window
+            return pages
+    
+    async def fetch_pages(self, fetcher, numbers):
+        urls = [self.site.page_url(number) for number in numbers]
+        known = [self.known_pages.get(url) for url in urls]
+        responses = await fetcher.fetch_many([
+            (url, state['etag'], state['last_modified']) if state else (url, '', '')
+            for url, state in zip(urls, known)
+        ])
+        
+        pages = []
+        for number, url, state, response in zip(numbers, urls, known, responses):
+            if isinstance(response, Exception):
+                self.errors.append(response)
+                pages.append(FetchedPage(number, url, [], '', '', '', False))
+                continue
+            if self.snapshot_dir and response.body is not None:
+                save_snapshot(self.snapshot_dir, self.site, number, response.body)
+            pages.append(build_page(self.site, number, url, response.body, state, response.etag, response.last_modified))
+        return pages
+
+
+class BrowserPool:
+    """Headless Chrome drivers shared by every Selenium scrape in the process.
+    
+    Drivers load pages with the "eager" strategy and don't download images,
+    media or fonts, since only the listing markup is needed. A driver is
+    recycled after `recycle_after` pages, when its page's JS heap grows
+    past `max_heap_mb`, or once it has failed. Every rendered page's load
+    time is kept for reporting. At most `size` drivers exist at once; a
+    scrape waits up to `acquire_timeout` seconds for one to come free.
+    """
+    
+    # Resource patterns blocked through the DevTools protocol
+    BLOCKED_URLS = [
+        '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.avif', '*.svg', '*.ico',
+        '*.mp4', '*.webm', '*.mp3', '*.woff', '*.woff2', '*.ttf', '*.otf',
+    ]
+    
+    def __init__(self, size=2, recycle_after=50, max_heap_mb=512, driver_factory=None, acquire_timeout=300):
+        self.size = size
+        self.recycle_after = recycle_after
+        self.max_heap_mb = max_heap_mb
+        self.driver_factory = driver_factory or self.create_driver
+        self.acquire_timeout = acquire_timeout
+        # Guards idle and created; notified whenever a driver or a free slot appears
+        self.available = threading.Condition()
+        self.idle = []
+        self.created = 0
+        self.page_counts = {}
+        self.page_loads = []
+    
+    def create_driver(self):
+        from selenium import webdriver
+        
+        chrome_options = webdriver.ChromeOptions()
+        chrome_options.page_load_strategy = 'eager'
+        for argument in ('--headless', '--no-sandbox', '--disable-dev-shm-usage', '--disable-gpu',
+                         '--window-size=1920,1080', '--disable-blink-features=AutomationControlled',
+                         '--blink-settings=imagesEnabled=false', '--mute-audio', f'user-agent={USER_AGENT}'):
+            chrome_options.add_argument(argument)
+        chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
+        chrome_options.add_experimental_option('useAutomationExtension', False)
+        chrome_options.add_experimental_option('prefs', {
+            'profile.managed_default_content_settings.images': 2,
+            'profile.default_content_setting_values.notifications': 2,
+        })
+        
+        driver = webdriver.Chrome(options=chrome_options)
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': self.BLOCKED_URLS})
+        driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {
+            'source': "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"
+        })
+        return driver
+    
+    def acquire(self, timeout=None):
+        """Return an idle driver, starting one if the pool isn't full, otherwise wait for one.
+        
+        Waiting ends when a driver is released or discarded (freeing a slot
+        for a replacement); FetchError is raised if neither happens within
+        `timeout` seconds (default: the pool's acquire_timeout).
+        """
+        timeout = self.acquire_timeout if timeout is None else timeout
+        with self.available:
+            if not self.available.wait_for(lambda: self.idle or self.created < self.size, timeout):
+                raise FetchError(f"No browser came free within {timeout}s (all {self.size} in use)")
+            if self.idle:
+                return self.idle.pop()
+            self.created += 1
+        try:
+            driver = self.driver_factory()
+        except Exception:
+            self.free_slot()
+            raise
+        self.page_counts[id(driver)] = 0
+        return driver
+    
+    def release(self, driver, broken=False):
+        """Hand a driver back, quitting it instead if it failed or is due for recycling"""
+        if broken or self.page_counts.get(id(driver), 0) >= self.recycle_after or self.heap_mb(driver) > self.max_heap_mb:
+            self.discard(driver)
+            return
+        try:
+            driver.delete_all_cookies()
+        except Exception:
+            self.discard(driver)
+            return
+        with self.available:
+            self.idle.append(driver)
+            self.available.notify()
+    
+    def discard(self, driver):
+        self.page_counts.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        self.free_slot()
+    
+    def free_slot(self):
+        """Give up a driver's slot so a waiting scrape can start a replacement"""
+        with self.available:
+            self.created -= 1
+            self.available.notify()
+    
+    @contextmanager
+    def driver(self):
+        """Lease a driver for one scrape; it is recycled if the scrape raises a WebDriver error"""
+        from selenium.common.exceptions import WebDriverException
+        
+        driver = self.acquire()
+        broken = False
+        try:
+            yield driver
+        except WebDriverException:
+            broken = True
+            raise
+        finally:
+            self.release(driver, broken=broken)
+    
+    def heap_mb(self, driver):
+        """JS heap used by the driver's current page, in MB (0 when Chrome doesn't report it)"""
+        try:
+            used = driver.execute_script('return performance.memory ? performance.memory.usedJSHeapSize : 0')
+        except Exception:
+            return 0
+        return (used or 0) / (1024 * 1024)
+    
+    def record_page_load(self, driver, label, seconds):
+        """Count a rendered page against its driver and keep its load time"""
+        self.page_counts[id(driver)] = self.page_counts.get(id(driver), 0) + 1
+        self.page_loads.append((label, seconds))
+    
+    def page_load_stats(self, label=None):
+        """Summarise recorded page load times, optionally for one label (competitor)"""
+        timings = sorted(seconds for page_label, seconds in self.page_loads if label in (None, page_label))
+        if not timings:
+            return {'pages': 0, 'mean': 0.0, 'median': 0.0, 'max': 0.0}
+        return {
+            'pages': len(timings),
+            'mean': sum(timings) / len(timings),
+            'median': timings[len(timings) // 2],
+            'max': timings[-1],
+        }
+    
+    def close(self):
+        """Quit every idle driver"""
+        with self.available:
+            drivers, self.idle = self.idle, []
+        for driver in drivers:
+            self.discard(driver)
+
+
+_shared_browser_pool = None
+_shared_browser_pool_lock = threading.Lock()
+
+
+def shared_browser_pool():
+    """The process-wide BrowserPool, started on first use and closed at exit"""
+    global _shared_browser_pool
+    with _shared_browser_pool_lock:
+        if _shared_browser_pool is None:
+            _shared_browser_pool = BrowserPool()
+            atexit.register(_shared_browser_pool.close)
+        return _shared_browser_pool
+
+
+class SeleniumScraper:
+    """Fallback adapter that renders listing pages in a pooled headless Chrome"""
+    
+    def __init__(self, site, max_pages=20, snapshot_dir=None, known_pages=None, start_page=1, resume_url='', pool=None):
+        self.site = site
+        self.max_pages = max_pages
+        self.snapshot_dir = snapshot_dir
+        self.known_pages = known_pages or {}
+        self.start_page = start_page
+        # URL of start_page as the site linked to it, when an interrupted run recorded one
+        self.resume_url = resume_url
+        self.pool = pool or shared_browser_pool()
+        self.errors = []
+    
+    def scrape(self):
+        """Return a FetchedPage for every rendered page; unchanged pages still skip the parse.
+        
+        A browser crash ends the run early: the pages rendered so far are
+        returned, the crash is recorded in self.errors and the driver is
+        dropped from the pool. Not getting a browser at all is recorded the
+        same way.
+        """
+        from selenium.common.exceptions import WebDriverException
+        
+        pages = []
+        try:
+            with self.pool.driver() as driver:
+                started = time.perf_counter()
+                driver.get(self.start_url())
+                for number in range(self.start_page, self.max_pages + 1):
+                    rendered = self.wait_for_listings(driver)
+                    self.pool.record_page_load(driver, self.site.competitor, (rendered or time.perf_counter()) - started)
+                    page_source = driver.page_source
+                    if self.snapshot_dir:
+                        save_snapshot(self.snapshot_dir, self.site, number, page_source)
+                    url = driver.current_url
+                    pages.append(build_page(self.site, number, url, page_source, self.known_pages.get(url)))
+                    started = time.perf_counter()
+                    if not self.click_next(driver):
+                        break
+        except WebDriverException as e:
+            self.errors.append(FetchError(f"Browser failed after {len(pages)} pages: {e.msg}"))
+        except FetchError as e:
+            self.errors.append(e)
+        return pages
+    
+    def start_url(self):
+        """Where rendering starts: the recorded resume URL, else start_page's URL by page number"""
+        if self.resume_url:
+            return self.resume_url
+        return self.site.page_url(self.start_page) if self.start_page > 1 else self.site.start_url
+    
+    def wait_for_listings(self, driver):
+        """Wait for listings to render, then scroll until lazy loading stops adding more.
+        
+        Returns the perf_counter() time the first listings appeared, or None
+        if they never did.
+        """
+        from selenium.common.exceptions import TimeoutException
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+        
+        try:
+            WebDriverWait(driver, 15).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, self.site.product_selector))
+            )
+        except TimeoutException:
+            return None
+        rendered = time.perf_counter()
+        
+        count = 0
+        while True:
+            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            try:
+                WebDriverWait(driver, 3).until(
+                    lambda d: len(d.find_elements(By.CSS_SELECTOR, self.site.product_selector)) > count
+                )
+            except TimeoutException:
+                return rendered
+            count = len(driver.find_elements(By.CSS_SELECTOR, self.site.product_selector))
+    
+    def click_next(self, driver):
+        """Follow the next-page link if the site has one; returns False on the last page"""
+        from selenium.common.exceptions import TimeoutException
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+        
+        for selector in self.site.next_selectors:
+            buttons = driver.find_elements(By.CSS_SELECTOR, selector)
+            if buttons and 'disabled' not in (buttons[0].get_attribute('class') or ''):
+                # JS click avoids overlays intercepting the click
+                driver.execute_script("arguments[0].click();", buttons[0])
+                try:
+                    # The old page's link goes stale once the next page replaces it
+                    WebDriverWait(driver, 10).until(EC.staleness_of(buttons[0]))
+                except TimeoutException:
+                    return False
+                return True
+        return False
+
+
+async def scrape_site_async(site, engine='auto', max_pages=20, fetcher=None, snapshot_dir=None, known_pages=None,
+                            start_page=1, resume_url=''):
+    """Scrape a site's listings; returns (FetchedPages, engine used, fetch errors, warnings).
+    
+    'auto' tries HTTP first and only renders pages in Chrome (in a worker
+    thread, so other sites keep scraping) when the HTTP path fails or finds
+    no listings. HTTP failures the browser recovered from come back as
+    warnings rather than errors. Pages before start_page are left out.
+    
+    resume_url is start_page's URL as recorded by an interrupted run. The
+    browser starts there, since pages reached by clicking through can live
+    at URLs page_url() can't rebuild; HTTP pages are addressed by number.
+    """
+    errors = []
+    if engine in ('auto', 'http'):
+        scraper = HttpScraper(
+            site, fetcher=fetcher, max_pages=max_pages, snapshot_dir=snapshot_dir, known_pages=known_pages,
+            start_page=start_page
+        )
+        try:
+            pages = await scraper.scrape_async()
+        except FetchError as e:
+            if engine == 'http':
+                raise
+            pages = []
+            scraper.errors.append(e)
+        errors = scraper.errors
+        if pages or engine == 'http':
+            return [page for page in pages if page.number >= start_page], 'http', errors, []
+    
+    fallback = SeleniumScraper(
+        site, max_pages=max_pages, snapshot_dir=snapshot_dir, known_pages=known_pages, start_page=start_page,
+        resume_url=resume_url
+    )
+    pages = await asyncio.to_thread(fallback.scrape)
+    if not pages:
+        return pages, 'selenium', errors + fallback.errors, []
+    return pages, 'selenium', fallback.errors, errors
+
+
+def scrape_site(site, engine='auto', max_pages=20, fetcher=None, snapshot_dir=None, known_pages=None, start_page=1,
+                resume_url=''):
+    """Synchronous wrapper around scrape_site_async for a single site"""
+    return asyncio.run(
+        scrape_site_async(site, engine, max_pages, fetcher, snapshot_dir, known_pages, start_page, resume_url)
+    )
@@ -0,0 +1,216 @@
+"""Competitor scrape runs: fetch a catalog through its site adapter, then save it.
+
+scrapers.py does the fetching and parsing without touching the database;
+this module checkpoints each run in ScrapingLog/ScrapeCheckpoint and writes
+the listings through CatalogChangeRecorder.
+"""
+
+import asyncio
+import traceback
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+from .models import ScrapingLog, ScrapedPage, ScrapeCheckpoint
+from .scrapers import ScrapedListing, scrape_site_async, shared_browser_pool
+from .services import CatalogChangeRecorder
+
+
+class CompetitorScrape:
+    """One competitor scrape run: fetch the catalog through its site adapter, then save it.
+    
+    fetch() is async and touches no database, so several competitors can be
+    fetched concurrently; save() writes the listings through
+    CatalogChangeRecorder and completes the ScrapingLog.
+    
+    With use_page_cache, pages whose product cards hash the same as last
+    time (or that the server reports as not modified) aren't parsed again;
+    their cached listings are only checked against the catalog in memory.
+    
+    Each page is saved in its own transaction together with the run's
+    ScrapeCheckpoint. A run that loses pages is marked failed, and with
+    resume the next run for the competitor continues it after the last
+    checkpointed page instead of starting over.
+    """
+    
+    def __init__(self, site, engine='auto', max_pages=20, snapshot_dir=None, fetcher=None, stdout=None, verbose=False,
+                 use_page_cache=True, resume=False):
+        self.site = site
+        self.engine = engine
+        self.max_pages = max_pages
+        self.snapshot_dir = snapshot_dir
+        self.fetcher = fetcher
+        self.write = stdout.write if stdout else (lambda message: None)
+        self.verbose = verbose
+        
+        self.checkpoint = None
+        if resume:
+            last_log = ScrapingLog.objects.filter(competitor=site.competitor).first()
+            if last_log is not None and last_log.status != 'completed':
+                self.checkpoint = ScrapeCheckpoint.objects.filter(scraping_log=last_log).first()
+        if self.checkpoint is not None:
+            self.log = self.checkpoint.scraping_log
+            self.log.status = 'started'
+            self.log.errors = ''
+            self.log.warnings = ''
+            self.log.completed_at = None
+            self.log.save()
+            self.start_page = self.checkpoint.last_page + 1
+            self.resume_url = self.checkpoint.next_url
+            self.write(f"⏩ {site.competitor}: resuming run #{self.log.pk} from page {self.start_page}")
+        else:
+            self.log = ScrapingLog.objects.create(competitor=site.competitor, status='started')
+            self.start_page = 1
+            self.resume_url = ''
+        
+        self.known_pages = {
+            page.url: {
+                'content_hash': page.content_hash,
+                'etag': page.etag,
+                'last_modified': page.last_modified,
+                'listings': [
+                    ScrapedListing(title, Decimal(price), url, image) for title, price, url, image in page.listings
+                ],
+            }
+            for page in ScrapedPage.objects.filter(competitor=site.competitor)
+        } if use_page_cache else {}
+        self.pages = []
+        self.errors = []
+        self.warnings = []
+    
+    async def fetch(self):
+        self.pages, self.engine, self.errors, self.warnings = await scrape_site_async(
+            self.site, engine=self.engine, max_pages=self.max_pages,
+            fetcher=self.fetcher, snapshot_dir=self.snapshot_dir, known_pages=self.known_pages,
+            start_page=self.start_page, resume_url=self.resume_url
+        )
+    
+    def save(self):
+        """Write the fetched listings page by page; returns change counts by type"""
+        competitor = self.site.competitor
+        for error in self.errors:
+            self.write(f"⚠️ {competitor}: {error}")
+        if self.warnings:
+            # Failures another engine recovered from don't make the run incomplete
+            self.log.warnings = "; ".join(str(warning) for warning in self.warnings)
+            self.write(f"ℹ️ {competitor}: fell back to {self.engine} after: {self.log.warnings}")
+        skipped = sum(page.unchanged for page in self.pages)
+        self.write(f"📦 {competitor}: {sum(len(page.listings) for page in self.pages)} products "
+                   f"on {len(self.pages)} pages, {skipped} unchanged ({self.engine} engine)")
+        if self.engine == 'selenium':
+            stats = shared_browser_pool().page_load_stats(competitor)
+            self.write(f"⏱️ {competitor}: {stats['pages']} pages rendered, load time median {stats['median']:.2f}s, "
+                       f"max {stats['max']:.2f}s")
+        
+        recorder = CatalogChangeRecorder(
+            competitor, scraping_log=self.log, generation=self.checkpoint.generation if self.checkpoint else None
+        )
+        if self.checkpoint is None:
+            self.checkpoint = ScrapeCheckpoint.objects.create(scraping_log=self.log, generation=recorder.generation)
+        # Counts saved before an interrupted run stopped
+        new_products, updated_products = self.log.new_products, self.log.updated_products
+        # The URL each page was actually fetched or rendered at, which resume_url hands back
+        page_urls = {page.number: page.url for page in self.pages}
+        
+        for page in self.pages:
+            # Pages that failed to load have no content hash; a resumed run fetches them again
+            if not page.content_hash:
+                continue
+            
+            with transaction.atomic():
+                for listing in page.listings:
+                    try:
+                        # Stage the listing for the bulk write, recording what changed for incremental re-matching
+                        competitor_product, change = recorder.record(listing.title, listing.price, listing.url)
+                    except Exception as e:
+                        self.write(f"⚠️ {competitor}: error processing '{listing.title[:50]}': {e}")
+                        continue
+                    self.log.products_scraped += 1
+                    if change is not None and self.verbose:
+                        self.write(f"  {change.get_change_type_display()}: {listing.title[:50]} - PKR {listing.price:,}")
+                
+                # Write this page's listings in bulk (unchanged pages normally have nothing to write)
+                recorder.flush()
+                self.save_page_cache([page])
+                
+                self.log.new_products = new_products + recorder.counts['new']
+                self.log.updated_products = updated_products + recorder.counts['title'] + recorder.counts['price']
+                self.log.pages_skipped += page.unchanged
+                self.log.pages_processed += not page.unchanged
+                self.log.save()
+                if page.number == self.checkpoint.last_page + 1:
+                    self.checkpoint.last_page = page.number
+                    self.checkpoint.next_url = page_urls.get(page.number + 1) or self.site.page_url(page.number + 1)
+                    self.checkpoint.save()
+        
+        if self.errors:
+            # Keep what was saved, but don't deactivate anything on a partial catalog
+            counts = recorder.finish(deactivate_missing=False)
+            self.log.mark_failed(
+                f"Incomplete after page {self.checkpoint.last_page}: " + "; ".join(str(error) for error in self.errors)
+            )
+            self.write(f"❌ {competitor}: stopped after page {self.checkpoint.last_page}, "
+                       f"run again with --resume to continue")
+            return counts
+        
+        # Deactivate listings that are gone from the site
+        counts = recorder.finish()
+        self.log.mark_completed()
+        self.write(f"✅ {competitor}: {self.log.new_products} new, {self.log.updated_products} updated, "
+                   f"{counts['deactivated']} deactivated")
+        return counts
+    
+    def save_page_cache(self, pages):
+        """Remember each parsed page's validators, card hash and listings for the next scrape"""
+        ScrapedPage.objects.bulk_create(
+            [
+                ScrapedPage(
+                    competitor=self.site.competitor, url=page.url, content_hash=page.content_hash,
+                    etag=page.etag or '', last_modified=page.last_modified or '',
+                    listings=[listing._replace(price=str(listing.price)) for listing in page.listings],
+                    scraped_at=timezone.now()
+                )
+                for page in pages
+                if page.content_hash and not page.unchanged
+            ],
+            batch_size=100,
+            update_conflicts=True, unique_fields=['competitor', 'url'],
+            update_fields=['content_hash', 'etag', 'last_modified', 'listings', 'scraped_at']
+        )
+    
+    def fail(self, error):
+        error_message = f"Fatal error: {error}\n{''.join(traceback.format_exception(type(error), error, error.__traceback__))}"
+        self.write(f"❌ {self.site.competitor}: {error_message}")
+        self.log.mark_failed(error_message)
+    
+    def run(self):
+        """Fetch and save this competitor on its own"""
+        try:
+            asyncio.run(self.fetch())
+            return self.save()
+        except Exception as e:
+            self.fail(e)
+            raise
+
+
+def scrape_competitors(sites, **options):
+    """Scrape several competitor sites concurrently; returns their CompetitorScrape runs.
+    
+    Every site is fetched in one event loop, each with its own connection
+    budget (ListingSite.concurrency), then the results are saved one
+    competitor at a time. A failing competitor is logged and doesn't stop
+    the others.
+    """
+    runs = [CompetitorScrape(site, **options) for site in sites]
+    
+    async def fetch_all():
+        return await asyncio.gather(*(run.fetch() for run in runs), return_exceptions=True)
+    
+    for run, outcome in zip(runs, asyncio.run(fetch_all())):
+        try:
+            if isinstance(outcome, Exception):
+                raise outcome
+            run.save()
+        except Exception as e:
+            run.fail(e)
+    return runs
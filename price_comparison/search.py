@@ -0,0 +1,104 @@
+"""Full-text search over competitor listing titles.
+
+On SQLite, titles are indexed in an FTS5 table kept in sync with
+CompetitorProduct by triggers, so every write path (admin saves, the
+scrapers' bulk upserts, queryset updates) updates it without extra code.
+Other backends, and SQLite builds without FTS5, fall back to
+title__icontains.
+
+The table and triggers are created by migration 0012. Django drops
+triggers when it rebuilds a table during a SQLite migration, so migrations
+that alter CompetitorProduct have to recreate them afterwards (see 0015).
+"""
+
+import hashlib
+import re
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.utils import OperationalError
+
+from .models import CompetitorProduct
+
+SEARCH_TABLE = 'price_comparison_competitorproduct_fts'
+PRODUCT_TABLE = 'price_comparison_competitorproduct'
+
+# Repeated keystroke queries are served from the cache for this long
+SEARCH_CACHE_TIMEOUT = 60
+
+TERM_PATTERN = re.compile(r'\w+')
+
+
+def search_terms(query):
+    """Lowercased word terms of a search query"""
+    return TERM_PATTERN.findall(query.lower())
+
+
+def fts_query(terms):
+    """FTS5 query matching every term, with the last one as a prefix since it's still being typed"""
+    # Terms are \w+ only, so quoting them is enough to keep FTS5 syntax out
+    return ' '.join([f'"{term}"' for term in terms[:-1]] + [f'"{terms[-1]}"*'])
+
+
+def ranked_listing_ids(terms, competitor='', limit=10):
+    """Ids of active listings matching the terms, best bm25 rank first; raises OperationalError without FTS5"""
+    match = fts_query(terms)
+    filters = ''
+    params = []
+    if competitor:
+        filters = 'AND product.competitor = %s'
+        params.append(competitor)
+    
+    # Every match is ranked, so broad queries still return the best bm25 matches
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT product.id FROM {SEARCH_TABLE} JOIN {PRODUCT_TABLE} product ON product.id = {SEARCH_TABLE}.rowid "
+            f"WHERE {SEARCH_TABLE} MATCH %s AND product.is_active {filters} "
+            f"ORDER BY bm25({SEARCH_TABLE}) LIMIT %s",
+            [match, *params, limit]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_competitor_products(query, competitor='', limit=10):
+    """Search active competitor listings by title; returns JSON-ready dicts, cached briefly per query"""
+    terms = search_terms(query)
+    if not terms:
+        return []
+    
+    # Hashed so arbitrary user input can't produce an invalid or oversized cache key
+    digest = hashlib.sha1(' '.join(terms).encode('utf-8')).hexdigest()
+    cache_key = f"competitor_search:{competitor}:{limit}:{digest}"
+    results = cache.get(cache_key)
+    if results is not None:
+        return results
+    
+    products = None
+    if connection.vendor == 'sqlite':
+        try:
+            ids = ranked_listing_ids(terms, competitor=competitor, limit=limit)
+        except OperationalError:
+            # SQLite built without FTS5, so the migration left the index out
+            pass
+        else:
+            by_id = CompetitorProduct.objects.in_bulk(ids)
+            products = [by_id[pk] for pk in ids if pk in by_id]
+    
+    if products is None:
+        products = CompetitorProduct.objects.filter(title__icontains=query, is_active=True)
+        if competitor:
+            products = products.filter(competitor=competitor)
+        products = products[:limit]
+    
+    results = [
+        {
+            'id': product.id,
+            'title': product.title,
+            'price': str(product.price),
+            'competitor': product.get_competitor_display(),
+            'url': product.url
+        }
+        for product in products
+    ]
+    cache.set(cache_key, results, SEARCH_CACHE_TIMEOUT)
+    return results
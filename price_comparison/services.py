@@ -1,210 +1,357 @@
-import re
+import heapq
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from decimal import Decimal
+from concurrent.futures import ProcessPoolExecutor
 from difflib import SequenceMatcher
-from django.db.models import Q
-from .models import CompetitorProduct, ProductComparison
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, F, Max, Q
+from django.utils import timezone
+from rapidfuzz import fuzz, process
+from .matching import (
+    clean_product_name, extract_key_features, feature_columns, features_from_columns, listing_key, score_features
+)
+from .models import (
+    CatalogVersion, CompetitorProduct, CompetitorMatch, ProductComparison, ComparisonCandidate, SellerProductFeatures,
+    PendingComparison, CompetitorChange, PriceHistory
+)
+from .maintenance import roll_up_price_history
 from products.models import Product
 
 
+class DifflibScorer:
+    """Reference string scorer built on difflib.SequenceMatcher"""
+    name = 'difflib'
+    # Too slow for whole catalogs; bulk matching scores only blocked candidates
+    bulk = False
+    
+    def ratio(self, text1, text2):
+        return SequenceMatcher(None, text1, text2).ratio()
+    
+    def ratio_matrix(self, queries, choices):
+        """Score every query against every choice (rows are queries)"""
+        return np.array([[self.ratio(query, choice) for choice in choices] for query in queries], dtype=np.float64)
+
+
+class RapidFuzzScorer:
+    """String scorer backed by RapidFuzz's C++ implementation"""
+    name = 'rapidfuzz'
+    bulk = True
+    
+    def __init__(self, workers=-1):
+        self.workers = workers  # -1 uses every core; pool workers drop this to 1
+    
+    def ratio(self, text1, text2):
+        return fuzz.ratio(text1, text2) / 100
+    
+    def ratio_matrix(self, queries, choices):
+        """Score every query against every choice (rows are queries) on all cores"""
+        return process.cdist(queries, choices, scorer=fuzz.ratio, dtype=np.float64, workers=self.workers) / 100
+
+
+SCORERS = {
+    DifflibScorer.name: DifflibScorer,
+    RapidFuzzScorer.name: RapidFuzzScorer,
+}
+
+# Cached insights are keyed on a fingerprint of the seller's comparisons read
+# from the database, so superseded entries are never served; the timeout only
+# evicts them
+PRICE_INSIGHTS_CACHE_TIMEOUT = 3600
+
+
 class PriceComparisonService:
     """Service for handling price comparison logic"""
     
-    def __init__(self):
+    MATCHERS = ('blocking', 'tfidf')
+    SCORERS = tuple(SCORERS)
+    
+    def __init__(self, matcher='blocking', top_k=20, scorer='rapidfuzz', candidate_count=5):
         self.min_confidence = 0.4  # Minimum confidence score for matching (increased for better accuracy)
+        # 'blocking' scores every candidate sharing a block; 'tfidf' re-ranks only
+        # the top_k nearest TF-IDF neighbours per product (bulk runs only)
+        if matcher not in self.MATCHERS:
+            raise ValueError(f"Unknown matcher '{matcher}', expected one of {self.MATCHERS}")
+        if scorer not in SCORERS:
+            raise ValueError(f"Unknown scorer '{scorer}', expected one of {self.SCORERS}")
+        self.matcher = matcher
+        self.top_k = top_k
+        self.scorer = SCORERS[scorer]()
+        # Best scored listings kept per product and competitor as ComparisonCandidate rows
+        self.candidate_count = candidate_count
+        # Throughput numbers for the most recent compare_all_products run
+        self.last_run_stats = None
+    
+    @property
+    def options(self):
+        """Constructor arguments, so pool workers can build an identical service"""
+        return {
+            'matcher': self.matcher, 'top_k': self.top_k, 'scorer': self.scorer.name,
+            'candidate_count': self.candidate_count,
+        }
     
     def clean_product_name(self, name):
         """Clean and normalize product name for better matching"""
-        # Convert to lowercase
-        name = name.lower()
-        
-        # Remove common words that don't help with matching
-        stop_words = ['laptop', 'computer', 'pc', 'the', 'and', 'with', 'for', 'of', 'in', 'inch', '"', 'prices', 'pakistan']
-        
-        # Remove special characters and extra spaces
-        name = re.sub(r'[^\w\s]', ' ', name)
-        name = re.sub(r'\s+', ' ', name).strip()
-        
-        # Remove stop words
-        words = [word for word in name.split() if word not in stop_words]
-        
-        return ' '.join(words)
+        return clean_product_name(name)
     
     def extract_key_features(self, name):
         """Extract key features like model numbers, screen sizes, etc."""
-        name_lower = name.lower()
-        features = {
-            'brand': None,
-            'model_number': None,
-            'screen_size': None,
-            'processor': None,
-            'special_features': []
-        }
+        return extract_key_features(name)
+    
+    def match_feature_columns(self, name):
+        """Return the precomputed feature columns stored for a product name"""
+        return feature_columns(name)
+    
+    def get_competitor_features(self, competitor_product):
+        """Return (features, cleaned name) for a competitor product, preferring stored columns"""
+        if competitor_product.has_match_features:
+            return competitor_product.get_key_features(), competitor_product.normalized_title
+        return self.extract_key_features(competitor_product.title), self.clean_product_name(competitor_product.title)
+    
+    def get_product_features(self, product):
+        """Return (features, cleaned name) for a seller product, preferring stored columns"""
+        try:
+            stored = product.match_features
+        except SellerProductFeatures.DoesNotExist:
+            stored = None
         
-        # Extract brand
-        brands = ['hp', 'dell', 'lenovo', 'asus', 'acer', 'msi', 'apple', 'samsung']
-        for brand in brands:
-            if brand in name_lower:
-                features['brand'] = brand
-                break
-        
-        # Extract model numbers (like pavilion 15, inspiron 14, victus 15, etc.)
-        import re
-        model_pattern = r'(pavilion|inspiron|thinkpad|vivobook|aspire|victus|latitude|precision|ideapad|legion|zenbook|tuf|rog)\s*(\d+)'
-        model_match = re.search(model_pattern, name_lower)
-        if model_match:
-            features['model_number'] = f"{model_match.group(1)} {model_match.group(2)}"
-        
-        # Extract screen size - improved to handle model numbers
-        size_pattern = r'(\d+\.?\d*)\s*inch|\b(\d+)\s*"|\b(\d+)\s*in\b|(\d{2})(?=\s|$|[^\d])'
-        size_match = re.search(size_pattern, name_lower)
-        if size_match:
-            # Extract the size, prioritizing specific patterns
-            size = size_match.group(1) or size_match.group(2) or size_match.group(3) or size_match.group(4)
-            # Only consider as screen size if it's a reasonable laptop screen size (13-17 inches typically)
-            if size and 13 <= float(size) <= 17:
-                features['screen_size'] = size
-            # Also extract from model numbers like "victus 15" or "pavilion 14"
-        
-        # Additional screen size extraction from model numbers
-        if not features['screen_size'] and features['model_number']:
-            model_size_match = re.search(r'\s(1[3-7])(?=\s|$)', features['model_number'])
-            if model_size_match:
-                features['screen_size'] = model_size_match.group(1)
-        
-        # Extract processor info
-        processor_pattern = r'(core\s*i\d+|ryzen\s*\d+|celeron|pentium|m\d+)'
-        processor_match = re.search(processor_pattern, name_lower)
-        if processor_match:
-            features['processor'] = processor_match.group(1)
-        
-        # Extract special features
-        special_features = ['gaming', 'touch', 'convertible', '2in1', 'ultrabook', 'business']
-        for feature in special_features:
-            if feature in name_lower:
-                features['special_features'].append(feature)
-        
-        return features
+        # Stored features are only valid for the name they were extracted from
+        if stored is not None and stored.source_name == product.name and stored.has_match_features:
+            return stored.get_key_features(), stored.normalized_title
+        return self.extract_key_features(product.name), self.clean_product_name(product.name)
+    
+    def store_product_features(self, product):
+        """Persist match features for a seller product if its name changed"""
+        stored = SellerProductFeatures.objects.filter(seller_product=product).first()
+        if stored is not None and stored.source_name == product.name:
+            return stored
+        
+        stored, created = SellerProductFeatures.objects.update_or_create(
+            seller_product=product,
+            defaults={'source_name': product.name, **self.match_feature_columns(product.name)}
+        )
+        return stored
     
     def calculate_similarity(self, text1, text2):
         """Calculate similarity between two text strings using feature-based matching"""
-        # Extract features from both products
-        features1 = self.extract_key_features(text1)
-        features2 = self.extract_key_features(text2)
-        
-        # Clean text for basic comparison
-        clean_text1 = self.clean_product_name(text1)
-        clean_text2 = self.clean_product_name(text2)
-        
-        # Use sequence matcher for basic similarity
-        basic_similarity = SequenceMatcher(None, clean_text1, clean_text2).ratio()
-        
-        # Feature-based scoring
-        feature_score = 0.0
-        feature_weight = 0.0
-        
-        # Brand matching (very important - 30% weight)
-        if features1['brand'] and features2['brand']:
-            feature_weight += 0.3
-            if features1['brand'] == features2['brand']:
-                feature_score += 0.3
-            # Penalize different brands heavily
-            else:
-                feature_score -= 0.2  # Negative score for different brands
-        
-        # Model number matching (very important - 25% weight)
-        if features1['model_number'] and features2['model_number']:
-            feature_weight += 0.25
-            if features1['model_number'] == features2['model_number']:
-                feature_score += 0.25
-            # Partial model match (e.g., pavilion 15 vs pavilion 14)
-            elif features1['model_number'].split()[0] == features2['model_number'].split()[0]:
-                # Same series but different size - much lower score
-                feature_score += 0.05
-            # Different model series - negative score
-            else:
-                feature_score -= 0.15
-        
-        # Screen size matching (important - 15% weight)
-        if features1['screen_size'] and features2['screen_size']:
-            feature_weight += 0.15
-            if features1['screen_size'] == features2['screen_size']:
-                feature_score += 0.15
-        
-        # Processor matching (important - 15% weight)
-        if features1['processor'] and features2['processor']:
-            feature_weight += 0.15
-            if features1['processor'] == features2['processor']:
-                feature_score += 0.15
-        
-        # Special features matching (moderate - 15% weight)
-        if features1['special_features'] or features2['special_features']:
-            feature_weight += 0.15
-            common_features = set(features1['special_features']).intersection(set(features2['special_features']))
-            all_features = set(features1['special_features']).union(set(features2['special_features']))
-            if all_features:
-                feature_similarity = len(common_features) / len(all_features)
-                feature_score += 0.15 * feature_similarity
-        
-        # Word-based similarity for remaining comparison
-        words1 = set(clean_text1.split())
-        words2 = set(clean_text2.split())
-        
-        word_similarity = 0.0
-        if words1 and words2:
-            common_words = words1.intersection(words2)
-            word_similarity = len(common_words) / max(len(words1), len(words2))
-        
-        # Combine scores with weights
-        if feature_weight > 0:
-            # Normalize feature score
-            normalized_feature_score = feature_score / feature_weight if feature_weight > 0 else 0
-            # 70% feature-based, 20% word-based, 10% basic similarity
-            final_similarity = (normalized_feature_score * 0.7) + (word_similarity * 0.2) + (basic_similarity * 0.1)
-        else:
-            # Fallback to original method if no features extracted
-            final_similarity = (basic_similarity * 0.6) + (word_similarity * 0.4)
-        
-        return min(final_similarity, 1.0)  # Ensure score doesn't exceed 1.0
+        return self.score_features(
+            self.extract_key_features(text1), self.clean_product_name(text1),
+            self.extract_key_features(text2), self.clean_product_name(text2)
+        )
     
-    def find_best_matches(self, product):
+    def score_features(self, features1, clean_text1, features2, clean_text2, basic_similarity=None):
+        """Score two products from their extracted features and cleaned names"""
+        # Basic string similarity, unless the caller already scored it in bulk
+        if basic_similarity is None:
+            basic_similarity = self.scorer.ratio(clean_text1, clean_text2)
+        return score_features(features1, clean_text1, features2, clean_text2, basic_similarity)
+    
+    def build_competitor_indexes(self):
+        """Build one blocking index per competitor over its active products"""
+        return {
+            competitor: load_competitor_index(self, competitor)
+            for competitor, _ in CompetitorProduct.COMPETITOR_CHOICES
+        }
+    
+    def find_best_matches(self, product, indexes=None):
         """Find best matches for a product from competitors"""
-        product_name = self.clean_product_name(product.name)
-        
-        # Get all competitor products
-        paklap_products = CompetitorProduct.objects.filter(competitor='paklap', is_active=True)
-        priceoye_products = CompetitorProduct.objects.filter(competitor='priceoye', is_active=True)
+        # One-off comparisons use the process's catalog snapshot; bulk callers
+        # build the indexes once and pass them in
+        if indexes is None:
+            indexes = shared_competitor_indexes(self)
         
-        best_paklap = None
-        best_paklap_score = 0
+        features, clean_name = self.get_product_features(product)
         
-        best_priceoye = None
-        best_priceoye_score = 0
+        # Only score competitors that share a block with this product
+        return {
+            competitor: self.best_match_among(features, clean_name, index, index.candidate_positions(features))
+            for competitor, index in indexes.items()
+        }
+    
+    def best_match_among(self, features, clean_name, index, positions, basic_scores=None):
+        """Pick the best scoring competitor product among candidate catalog positions.
         
-        # Find best PakLap match
-        for competitor_product in paklap_products:
-            similarity = self.calculate_similarity(product.name, competitor_product.title)
-            if similarity > best_paklap_score and similarity >= self.min_confidence:
-                best_paklap_score = similarity
-                best_paklap = competitor_product
+        The best scored products, confident or not, come back too as
+        (product, score) pairs, best first: the best match plus
+        candidate_count runners-up a seller can pick instead.
+        """
+        best_match = None
+        best_score = 0
+        scored = []
         
-        # Find best PriceOye match
-        for competitor_product in priceoye_products:
-            similarity = self.calculate_similarity(product.name, competitor_product.title)
-            if similarity > best_priceoye_score and similarity >= self.min_confidence:
-                best_priceoye_score = similarity
-                best_priceoye = competitor_product
+        for position in positions:
+            competitor_features, competitor_clean_name = index.features[position]
+            similarity = self.score_features(
+                features, clean_name, competitor_features, competitor_clean_name,
+                basic_similarity=basic_scores[position] if basic_scores is not None else None
+            )
+            if similarity > 0:
+                scored.append((similarity, position))
+            if similarity > best_score and similarity >= self.min_confidence:
+                best_score = similarity
+                best_match = index.products[position]
         
+        # Ties go to the earlier catalog position, as for the best match
+        top = heapq.nlargest(self.candidate_count + 1, scored, key=lambda item: (item[0], -item[1]))
         return {
-            'paklap': {'product': best_paklap, 'confidence': best_paklap_score},
-            'priceoye': {'product': best_priceoye, 'confidence': best_priceoye_score}
+            'product': best_match,
+            'confidence': best_score,
+            'candidates': [(index.products[position], score) for score, position in top],
         }
     
-    def compare_single_product(self, product):
+    def find_best_matches_bulk(self, products, indexes=None):
+        """Find best matches for many products using the blocking index.
+        
+        With a bulk scorer, string similarity for the whole seller product x
+        competitor matrix is computed up front (rapidfuzz's cdist runs it in C
+        on all cores), so the per-candidate loop only does the feature
+        arithmetic.
+        """
+        if indexes is None:
+            indexes = self.build_competitor_indexes()
+        
+        products = list(products)
+        product_features = [self.get_product_features(product) for product in products]
+        matches = self.match_features_bulk(product_features, indexes)
+        return {product.pk: product_matches for product, product_matches in zip(products, matches)}
+    
+    def match_features_bulk(self, product_features, indexes):
+        """Match a list of (features, cleaned name) pairs; returns one matches dict per entry"""
+        indexes = list(indexes.items())
+        basic_scores = self.basic_score_matrix(product_features, indexes)
+        return [
+            self.match_features_row(
+                features, clean_name, indexes, basic_scores[row] if basic_scores is not None else None
+            )
+            for row, (features, clean_name) in enumerate(product_features)
+        ]
+    
+    def basic_score_matrix(self, product_features, indexes):
+        """String similarity of every entry against every competitor's catalog, or None if the scorer isn't bulk.
+        
+        One scorer call covers every competitor: their catalogs sit side by
+        side as columns, in the order of `indexes` (a list of (competitor,
+        index) pairs). Without it, only blocked candidates get scored.
+        """
+        choices = [clean_name for _, index in indexes for _, clean_name in index.features]
+        if not (self.scorer.bulk and product_features and choices):
+            return None
+        return self.scorer.ratio_matrix([clean_name for _, clean_name in product_features], choices)
+    
+    def match_features_row(self, features, clean_name, indexes, basic_scores=None):
+        """Match one entry against every competitor; basic_scores is its row of basic_score_matrix"""
+        matches = {}
+        offset = 0
+        for competitor, index in indexes:
+            matches[competitor] = self.best_match_among(
+                features, clean_name, index, index.candidate_positions(features),
+                basic_scores=basic_scores[offset:offset + len(index)] if basic_scores is not None else None
+            )
+            offset += len(index)
+        return matches
+    
+    def find_best_matches_parallel(self, products, indexes=None, workers=None, chunk_size=None):
+        """Find best matches for many products, fanning chunks out to a process pool.
+        
+        Workers receive the competitor snapshot once (as position-only index
+        copies) and send back catalog positions, which are mapped back to
+        competitor products here. Small runs stay in-process since starting
+        the pool costs more than it saves.
+        """
+        if indexes is None:
+            indexes = self.build_competitor_indexes()
+        workers = workers or getattr(settings, 'PRICE_COMPARISON_WORKERS', None) or os.cpu_count() or 1
+        chunk_size = chunk_size or getattr(settings, 'PRICE_COMPARISON_CHUNK_SIZE', 200)
+        
+        products = list(products)
+        if workers <= 1 or len(products) <= chunk_size:
+            return self.find_best_matches_bulk(products, indexes=indexes)
+        
+        from .workers import init_match_worker, match_chunk
+        
+        product_features = [self.get_product_features(product) for product in products]
+        chunks = [product_features[start:start + chunk_size] for start in range(0, len(product_features), chunk_size)]
+        snapshots = {competitor: index.snapshot() for competitor, index in indexes.items()}
+        
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(chunks)),
+            initializer=init_match_worker,
+            initargs=(self.options, snapshots)
+        ) as executor:
+            chunk_results = list(executor.map(match_chunk, chunks))
+        
+        results = {}
+        position_matches = [matches for chunk in chunk_results for matches in chunk]
+        for product, matches in zip(products, position_matches):
+            for competitor, match in matches.items():
+                products_by_position = indexes[competitor].products
+                if match['product'] is not None:
+                    match['product'] = products_by_position[match['product']]
+                match['candidates'] = [(products_by_position[position], score) for position, score in match['candidates']]
+            results[product.pk] = matches
+        return results
+    
+    def find_best_matches_tfidf(self, products, indexes=None, top_k=None):
+        """Find best matches for many products at once.
+        
+        Seller and competitor names are vectorized once into character n-gram
+        TF-IDF matrices. A single sparse matrix product gives every seller
+        product its top_k nearest competitor titles, and only those are
+        re-ranked with the feature-weighted score.
+        """
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        
+        if indexes is None:
+            indexes = self.build_competitor_indexes()
+        top_k = top_k or self.top_k
+        
+        products = list(products)
+        product_features = [self.get_product_features(product) for product in products]
+        results = {product.pk: {} for product in products}
+        
+        for competitor, index in indexes.items():
+            similarity = None
+            if products and len(index):
+                vectorizer = TfidfVectorizer(analyzer='char_wb', ngram_range=(2, 4), sublinear_tf=True)
+                try:
+                    competitor_matrix = vectorizer.fit_transform([clean_name for _, clean_name in index.features])
+                except ValueError:
+                    # Every competitor title normalized to nothing, so there's no vocabulary
+                    competitor_matrix = None
+                if competitor_matrix is not None:
+                    product_matrix = vectorizer.transform([clean_name for _, clean_name in product_features])
+                    similarity = (product_matrix @ competitor_matrix.T).tocsr()
+            
+            for row, product in enumerate(products):
+                positions = []
+                if similarity is not None:
+                    start, end = similarity.indptr[row], similarity.indptr[row + 1]
+                    positions = similarity.indices[start:end]
+                    if len(positions) > top_k:
+                        nearest = np.argpartition(-similarity.data[start:end], top_k - 1)[:top_k]
+                        positions = positions[nearest]
+                
+                # Catalog order keeps ties deterministic, as in the full scan
+                features, clean_name = product_features[row]
+                results[product.pk][competitor] = self.best_match_among(features, clean_name, index, sorted(positions))
+        
+        return results
+    
+    def compare_single_product(self, product, indexes=None, matches=None):
         """Compare a single product with competitors"""
         # Only compare laptops, not accessories
         if product.category != 'laptop':
             return None
-            
-        matches = self.find_best_matches(product)
+        
+        # Bulk runs may hand in matches computed up front
+        if matches is None:
+            matches = self.find_best_matches(product, indexes=indexes)
         
         # Get or create comparison object
         comparison, created = ProductComparison.objects.get_or_create(
@@ -212,98 +359,747 @@ class PriceComparisonService:
             defaults={}
         )
         
-        # Update PakLap comparison
-        if matches['paklap']['product']:
-            comparison.best_paklap_match = matches['paklap']['product']
-            comparison.match_confidence_paklap = matches['paklap']['confidence']
-            comparison.paklap_price_difference = product.price - matches['paklap']['product'].price
-        else:
-            comparison.best_paklap_match = None
-            comparison.match_confidence_paklap = 0.0
-            comparison.paklap_price_difference = None
-        
-        # Update PriceOye comparison
-        if matches['priceoye']['product']:
-            comparison.best_priceoye_match = matches['priceoye']['product']
-            comparison.match_confidence_priceoye = matches['priceoye']['confidence']
-            comparison.priceoye_price_difference = product.price - matches['priceoye']['product'].price
-        else:
-            comparison.best_priceoye_match = None
-            comparison.match_confidence_priceoye = 0.0
-            comparison.priceoye_price_difference = None
+        stored_matches = {
+            match.competitor: match
+            for match in CompetitorMatch.objects.filter(seller_product=product).select_related('competitor_product')
+        }
+        current, changed, removed = self.apply_matches(product, matches, stored_matches)
+        self.save_matches(changed, removed)
         
+        # save() derives the status from the match rows just written
+        comparison.seller_product = product
         comparison.save()
+        self.save_candidates([product], {product.pk: matches})
         return comparison
     
-    def compare_all_products(self, seller=None):
+    def apply_matches(self, product, matches, stored_matches):
+        """Work out a product's CompetitorMatch rows from freshly scored matches.
+        
+        stored_matches maps competitors to the product's current rows. A
+        match the seller pinned is kept while its listing is active; only its
+        price difference is refreshed. Returns the resulting rows by
+        competitor, the rows that changed and need writing, and the stored
+        rows to delete because their competitor has no match any more.
+        """
+        current = {}
+        changed = []
+        removed = []
+        for competitor, match in matches.items():
+            stored = stored_matches.get(competitor)
+            if stored is not None and stored.pinned and stored.competitor_product.is_active:
+                competitor_product, confidence, pinned = stored.competitor_product, stored.confidence, True
+            else:
+                # Without a pin, or once the pinned listing is gone, the matcher decides
+                competitor_product, confidence, pinned = match['product'], match['confidence'], False
+            
+            if competitor_product is None:
+                if stored is not None:
+                    removed.append(stored)
+                continue
+            
+            difference = product.price - competitor_product.price
+            if stored is None:
+                stored = CompetitorMatch(seller_product=product, competitor=competitor)
+            elif (stored.competitor_product_id == competitor_product.pk
+                    and abs(stored.confidence - confidence) <= 1e-9
+                    and stored.price_difference == difference and stored.pinned == pinned):
+                current[competitor] = stored
+                continue
+            
+            stored.competitor_product = competitor_product
+            stored.confidence = confidence
+            stored.price_difference = difference
+            stored.pinned = pinned
+            current[competitor] = stored
+            changed.append(stored)
+        
+        return current, changed, removed
+    
+    def save_matches(self, matches, removed=()):
+        """Write changed CompetitorMatch rows and delete the ones whose competitor lost its match"""
+        if removed:
+            CompetitorMatch.objects.filter(pk__in=[match.pk for match in removed]).delete()
+        CompetitorMatch.objects.bulk_update(
+            [match for match in matches if match.pk is not None], CompetitorMatch.MATCH_FIELDS, batch_size=500
+        )
+        # A concurrent comparison of the same product may have created the row since we looked
+        CompetitorMatch.objects.bulk_create(
+            [match for match in matches if match.pk is None], batch_size=500,
+            update_conflicts=True, unique_fields=['seller_product', 'competitor'],
+            update_fields=CompetitorMatch.MATCH_FIELDS
+        )
+    
+    def compare_all_products(self, seller=None, workers=None):
         """Compare all products (optionally filtered by seller)"""
         # Only compare laptops, not accessories
-        products = Product.objects.filter(is_active=True, category='laptop')
+        products = Product.objects.filter(is_active=True, category='laptop').select_related('match_features')
         
         if seller:
             products = products.filter(seller=seller)
         
+        # A full run reads the catalog fresh rather than trusting the snapshot
+        return self.compare_products(products, workers=workers, indexes=self.build_competitor_indexes())
+    
+    def compare_products(self, products, workers=None, indexes=None):
+        """Compare a batch of laptop products, writing only the comparisons that changed"""
+        started = time.monotonic()
+        products = list(products)
+        
+        # Use the same competitor snapshot for the whole run
+        if indexes is None:
+            indexes = shared_competitor_indexes(self)
+        
+        # Score every product up front so the scorer can work on whole matrices
+        if self.matcher == 'tfidf':
+            batch_matches = self.find_best_matches_tfidf(products, indexes=indexes)
+        else:
+            batch_matches = self.find_best_matches_parallel(products, indexes=indexes, workers=workers)
+        
+        results, created_count, updated_count = self.save_comparisons(products, batch_matches)
+        
+        elapsed = time.monotonic() - started
+        self.last_run_stats = {
+            'products': len(products),
+            'created': created_count,
+            'updated': updated_count,
+            'unchanged': len(products) - created_count - updated_count,
+            'seconds': elapsed,
+            'products_per_second': len(products) / elapsed if elapsed > 0 else 0.0,
+        }
+        return results
+    
+    def save_comparisons(self, products, batch_matches):
+        """Write matches for many products with bulk queries, skipping rows that didn't change"""
+        existing = {
+            comparison.seller_product_id: comparison
+            for comparison in ProductComparison.objects.filter(seller_product__in=products)
+        }
+        stored_matches = defaultdict(dict)
+        for match in CompetitorMatch.objects.filter(seller_product__in=products).select_related('competitor_product'):
+            stored_matches[match.seller_product_id][match.competitor] = match
+        
+        now = timezone.now()
         results = []
+        to_create = []
+        to_update = []
+        changed_matches = []
+        removed_matches = []
         for product in products:
-            comparison = self.compare_single_product(product)
-            if comparison:  # Only add if comparison was created (laptop products)
+            current, changed, removed = self.apply_matches(product, batch_matches[product.pk], stored_matches[product.pk])
+            changed_matches.extend(changed)
+            removed_matches.extend(removed)
+            
+            comparison = existing.get(product.pk)
+            if comparison is None:
+                comparison = ProductComparison(seller_product=product)
+                to_create.append(comparison)
+            elif changed or removed:
+                comparison.seller_product = product
+                comparison.last_compared = now
+                to_update.append(comparison)
+            else:
                 results.append(comparison)
+                continue
+            comparison.refresh_competitive_status(current.values())
+            results.append(comparison)
+        
+        self.save_matches(changed_matches, removed_matches)
+        update_fields = ['last_compared', *ProductComparison.DERIVED_FIELDS]
+        # A concurrent Product save may have created the row since we looked
+        ProductComparison.objects.bulk_create(
+            to_create, batch_size=500,
+            update_conflicts=True, unique_fields=['seller_product'], update_fields=update_fields
+        )
+        ProductComparison.objects.bulk_update(to_update, update_fields, batch_size=500)
+        self.save_candidates(products, batch_matches)
+        
+        return results, len(to_create), len(to_update)
+    
+    def save_candidates(self, products, batch_matches):
+        """Replace the stored top candidates of these products with the ones just scored"""
+        candidates = [
+            ComparisonCandidate(
+                seller_product=product, competitor_product=competitor_product, competitor=competitor,
+                score=score, rank=rank
+            )
+            for product in products
+            for competitor, match in batch_matches[product.pk].items()
+            for rank, (competitor_product, score) in enumerate(match['candidates'], 1)
+        ]
+        with transaction.atomic():
+            ComparisonCandidate.objects.filter(seller_product__in=products).delete()
+            ComparisonCandidate.objects.bulk_create(candidates, batch_size=500)
+    
+    def pick_candidate(self, comparison, candidate):
+        """Make a stored candidate the product's match for its competitor and pin it there; returns the match"""
+        product = comparison.seller_product
+        match, created = CompetitorMatch.objects.update_or_create(
+            seller_product=product,
+            competitor=candidate.competitor,
+            defaults={
+                'competitor_product': candidate.competitor_product,
+                'confidence': candidate.score,
+                'price_difference': product.price - candidate.competitor_product.price,
+                'pinned': True,
+            }
+        )
+        comparison.save()
+        return match
+    
+    def unpin_match(self, comparison, competitor):
+        """Drop a seller's pinned match for one competitor and re-match the product"""
+        CompetitorMatch.objects.filter(seller_product_id=comparison.seller_product_id, competitor=competitor).update(
+            pinned=False
+        )
+        return self.compare_single_product(comparison.seller_product)
+    
+    def enqueue_comparison(self, product_id):
+        """Mark a product's comparison as dirty; returns True if it wasn't queued already"""
+        pending, created = PendingComparison.objects.get_or_create(seller_product_id=product_id)
+        return created
+    
+    def process_comparison_queue(self, batch_size=500):
+        """Drain the pending comparison queue and compare the claimed products in bulk"""
+        processed = 0
+        while True:
+            product_ids = list(
+                PendingComparison.objects.values_list('seller_product_id', flat=True)[:batch_size]
+            )
+            if not product_ids:
+                return processed
+            
+            # Claim the batch before comparing, so a save that happens meanwhile
+            # queues the product again instead of being folded into this run
+            PendingComparison.objects.filter(seller_product_id__in=product_ids).delete()
+            
+            products = list(
+                Product.objects.filter(
+                    id__in=product_ids, is_active=True, category='laptop', seller__isnull=False
+                ).select_related('match_features')
+            )
+            for product in products:
+                self.store_product_features(product)
+            self.compare_products(products)
+            processed += len(products)
+    
+    def apply_catalog_changes(self, workers=None):
+        """Update comparisons for the competitor catalog changes recorded by scrapers.
+        
+        Only seller laptops a changed listing could now be a candidate for (per
+        the reverse blocking index), or whose current best match changed, are
+        re-matched. Price-only changes just refresh the stored differences.
+        """
+        started = time.monotonic()
+        changes = list(CompetitorChange.objects.select_related('competitor_product'))
+        
+        rematch_changes = [change for change in changes if change.change_type != 'price']
+        product_ids = self.affected_seller_product_ids(rematch_changes) if rematch_changes else set()
+        products = Product.objects.filter(
+            id__in=product_ids, is_active=True, category='laptop'
+        ).select_related('match_features')
+        if product_ids:
+            results = self.compare_products(products, workers=workers)
+            rematch_stats = self.last_run_stats
+        else:
+            results, rematch_stats = [], {}
+        
+        # Re-matched products already carry fresh differences
+        repriced = self.refresh_price_differences(
+            {change.competitor_product_id for change in changes if change.change_type == 'price'},
+            exclude_product_ids=product_ids
+        )
+        CompetitorChange.objects.filter(pk__in=[change.pk for change in changes]).delete()
         
+        elapsed = time.monotonic() - started
+        self.last_run_stats = {
+            'changes': len(changes),
+            'products': len(results),
+            'created': rematch_stats.get('created', 0),
+            'updated': rematch_stats.get('updated', 0),
+            'unchanged': rematch_stats.get('unchanged', 0),
+            'repriced': repriced,
+            'seconds': elapsed,
+            'products_per_second': len(results) / elapsed if elapsed > 0 else 0.0,
+        }
         return results
     
-    def get_price_insights(self, seller):
-        """Get pricing insights for a seller"""
-        comparisons = ProductComparison.objects.filter(
-            seller_product__seller=seller,
-            seller_product__is_active=True
+    def affected_seller_product_ids(self, changes):
+        """Return seller products whose best match may differ after these catalog changes"""
+        changed_ids = [change.competitor_product_id for change in changes]
+        
+        # Products currently matched to a retitled or removed listing
+        product_ids = set(
+            CompetitorMatch.objects.filter(competitor_product_id__in=changed_ids).values_list('seller_product_id', flat=True)
         )
         
-        total_products = comparisons.count()
-        if total_products == 0:
-            return {
-                'total_products': 0,
-                'competitive_count': 0,
-                'overpriced_count': 0,
-                'underpriced_count': 0,
-                'no_match_count': 0
-            }
+        # Products a new or retitled listing is now a candidate for
+        candidates = [
+            change.competitor_product for change in changes
+            if change.change_type in ('new', 'title') and change.competitor_product.is_active
+        ]
+        if candidates:
+            seller_index = SellerBlockIndex(
+                self, Product.objects.filter(is_active=True, category='laptop').select_related('match_features')
+            )
+            for competitor_product in candidates:
+                features, clean_name = self.get_competitor_features(competitor_product)
+                product_ids |= seller_index.affected_by(features)
         
-        competitive_count = 0
-        overpriced_count = 0
-        underpriced_count = 0
-        no_match_count = 0
+        return product_ids
+    
+    def refresh_price_differences(self, competitor_product_ids, exclude_product_ids=()):
+        """Recompute stored price differences against repriced competitor listings; no matching"""
+        if not competitor_product_ids:
+            return 0
         
-        for comparison in comparisons:
-            has_match = False
-            
-            # Check competitiveness against PakLap
-            if comparison.best_paklap_match:
-                has_match = True
-                if comparison.paklap_price_difference < -100:
-                    underpriced_count += 1
-                elif comparison.paklap_price_difference > 100:
-                    overpriced_count += 1
-                else:
-                    competitive_count += 1
-            
-            # Check competitiveness against PriceOye
-            elif comparison.best_priceoye_match:
-                has_match = True
-                if comparison.priceoye_price_difference < -100:  # Seller price is 100+ less
-                    underpriced_count += 1
-                elif comparison.priceoye_price_difference > 100:  # Seller price is 100+ more
-                    overpriced_count += 1
-                else:
-                    competitive_count += 1
+        matches = list(
+            CompetitorMatch.objects.filter(competitor_product_id__in=competitor_product_ids).exclude(
+                seller_product_id__in=exclude_product_ids
+            ).select_related('seller_product', 'competitor_product')
+        )
+        for match in matches:
+            match.price_difference = match.seller_product.price - match.competitor_product.price
+        CompetitorMatch.objects.bulk_update(matches, ['price_difference'], batch_size=500)
+        
+        now = timezone.now()
+        to_update = list(
+            ProductComparison.objects.filter(
+                seller_product_id__in={match.seller_product_id for match in matches}
+            ).select_related('seller_product').prefetch_related('seller_product__competitor_matches__competitor_product')
+        )
+        for comparison in to_update:
+            comparison.refresh_competitive_status()
+            comparison.last_compared = now
+        
+        ProductComparison.objects.bulk_update(
+            to_update, ['last_compared', *ProductComparison.DERIVED_FIELDS], batch_size=500
+        )
+        return len(to_update)
+    
+    def get_price_insights(self, seller, use_cache=True):
+        """Get pricing insights for a seller, classified in one aggregate query and cached per seller.
+        
+        The cache key carries the seller's comparison count and latest
+        last_compared. Every comparison write stamps last_compared and a
+        delete changes the count, so a write from any process (the worker,
+        the scrapers) makes the next read here miss the cache.
+        """
+        comparisons = ProductComparison.objects.filter(seller=seller)
+        if use_cache:
+            version = comparisons.aggregate(rows=Count('pk'), latest=Max('last_compared'))
+            cache_key = price_insights_cache_key(seller.pk, version['rows'], version['latest'])
+            insights = cache.get(cache_key)
+            if insights is not None:
+                return insights
+        
+        # The status is denormalized onto each comparison, so this is one indexed aggregate
+        counts = comparisons.filter(is_active=True).aggregate(
+            total_products=Count('pk'),
+            **{
+                f'{status}_count': Count('pk', filter=Q(competitive_status=status))
+                for status, _ in ProductComparison.COMPETITIVE_STATUS_CHOICES
+            }
+        )
+        
+        total_products = counts['total_products']
+        insights = {
+            **counts,
+            'competitive_percentage': (counts['competitive_count'] / total_products) * 100 if total_products > 0 else 0
+        }
+        if use_cache:
+            cache.set(cache_key, insights, PRICE_INSIGHTS_CACHE_TIMEOUT)
+        return insights
+
+
+def bump_catalog_version(competitors):
+    """Mark competitors' catalogs as changed, so every process reloads its snapshot of them"""
+    for competitor in set(competitors):
+        bumped = CatalogVersion.objects.filter(competitor=competitor).update(
+            version=F('version') + 1, token=uuid.uuid4().hex, updated_at=timezone.now()
+        )
+        if not bumped:
+            catalog_version, created = CatalogVersion.objects.get_or_create(
+                competitor=competitor, defaults={'version': 1, 'token': uuid.uuid4().hex}
+            )
+            if not created:
+                # Another process created the row first; bump it all the same
+                bump_catalog_version([competitor])
+
+
+def price_insights_cache_key(seller_id, rows, latest):
+    """Cache key for a seller's insights as of their comparisons' count and latest last_compared"""
+    stamp = int(latest.timestamp() * 1_000_000) if latest else 0
+    return f'price_insights_{seller_id}_{rows}_{stamp}'
+
+
+class CatalogProducts:
+    """One competitor's active listings held in arrays instead of model instances.
+    
+    Ids and prices (in paisa) live in numpy arrays and titles and URLs in
+    plain lists. Indexing builds a CompetitorProduct on demand, so only the
+    listings a comparison actually picks are ever instantiated.
+    """
+    FIELDS = ('id', 'title', 'price', 'url')
+    
+    def __init__(self, competitor, rows):
+        self.competitor = competitor
+        self.ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        self.prices = np.fromiter((int(row[2] * 100) for row in rows), dtype=np.int64, count=len(rows))
+        self.titles = [row[1] for row in rows]
+        self.urls = [row[3] for row in rows]
+    
+    def __len__(self):
+        return len(self.ids)
+    
+    def __getitem__(self, position):
+        values = {
+            'id': int(self.ids[position]),
+            'title': self.titles[position],
+            'price': Decimal(int(self.prices[position])).scaleb(-2),
+            'url': self.urls[position],
+            'competitor': self.competitor,
+            'is_active': True,
+        }
+        # from_db wants the loaded fields in model order; the rest stay deferred
+        field_names = [field.attname for field in CompetitorProduct._meta.concrete_fields if field.attname in values]
+        return CompetitorProduct.from_db(DEFAULT_DB_ALIAS, field_names, [values[name] for name in field_names])
+    
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self[position]
+
+
+def load_competitor_index(service, competitor):
+    """Build a blocking index over a competitor's active listings from column values alone"""
+    rows = list(
+        CompetitorProduct.objects.filter(competitor=competitor, is_active=True).values_list(
+            *CatalogProducts.FIELDS, *CompetitorProduct.FEATURE_FIELDS
+        )
+    )
+    product_features = []
+    for row in rows:
+        title, (normalized_title, *columns) = row[1], row[len(CatalogProducts.FIELDS):]
+        if normalized_title:
+            product_features.append((features_from_columns(*columns), normalized_title))
+        else:
+            # Not backfilled yet
+            product_features.append((service.extract_key_features(title), service.clean_product_name(title)))
+    return CompetitorBlockIndex(service, CatalogProducts(competitor, rows), product_features=product_features)
+
+
+# competitor -> (CatalogVersion token, CompetitorBlockIndex), shared by every service in the process
+_catalog_indexes = {}
+_catalog_indexes_lock = threading.Lock()
+
+
+def shared_competitor_indexes(service):
+    """Return the process's blocking indexes, reloading only competitors whose catalog version changed"""
+    # Read the tokens before the listings: a write landing in between leaves
+    # a stale token next to newer data, which just costs one extra reload
+    tokens = dict(CatalogVersion.objects.values_list('competitor', 'token'))
+    indexes = {}
+    with _catalog_indexes_lock:
+        for competitor, _ in CompetitorProduct.COMPETITOR_CHOICES:
+            token = tokens.get(competitor)
+            cached = _catalog_indexes.get(competitor)
+            if token and cached and cached[0] == token:
+                indexes[competitor] = cached[1]
+                continue
             
-            if not has_match:
-                no_match_count += 1
+            indexes[competitor] = load_competitor_index(service, competitor)
+            # Catalogs nothing has bumped yet can't be told apart, so they're never cached
+            if token:
+                _catalog_indexes[competitor] = (token, indexes[competitor])
+            else:
+                _catalog_indexes.pop(competitor, None)
+    return indexes
+
+
+class CompetitorBlockIndex:
+    """In-memory blocking index over one competitor's products.
+    
+    Competitor products are bucketed by brand, model series and processor
+    family. A seller product is only scored against competitors sharing at
+    least one of those blocks. Competitors without a recognised brand can't
+    be ruled out cheaply, so they are always candidates, and a seller product
+    without a recognised brand is scored against everything.
+    """
+    
+    def __init__(self, service, competitor_products, product_features=None):
+        # product_features gives (features, cleaned name) per product when they're already known
+        if not isinstance(competitor_products, CatalogProducts):
+            competitor_products = list(competitor_products)
+        self.products = competitor_products
+        self.features = []
+        self.blocks = defaultdict(list)
+        self.unbranded = []
         
-        return {
-            'total_products': total_products,
-            'competitive_count': competitive_count,
-            'overpriced_count': overpriced_count,
-            'underpriced_count': underpriced_count,
-            'no_match_count': no_match_count,
-            'competitive_percentage': (competitive_count / total_products) * 100 if total_products > 0 else 0
+        for position in range(len(self.products)):
+            if product_features is None:
+                features, clean_name = service.get_competitor_features(self.products[position])
+            else:
+                features, clean_name = product_features[position]
+            self.features.append((features, clean_name))
+            if not features['brand']:
+                self.unbranded.append(position)
+            for key in self.block_keys(features):
+                self.blocks[key].append(position)
+    
+    def __len__(self):
+        return len(self.products)
+    
+    def snapshot(self):
+        """Return a picklable copy whose products are catalog positions instead of model instances"""
+        snapshot = CompetitorBlockIndex.__new__(CompetitorBlockIndex)
+        snapshot.products = list(range(len(self.products)))
+        snapshot.features = self.features
+        snapshot.blocks = self.blocks
+        snapshot.unbranded = self.unbranded
+        return snapshot
+    
+    @staticmethod
+    def block_keys(features):
+        """Return the blocks a product with these features belongs to"""
+        keys = []
+        if features['brand']:
+            keys.append(('brand', features['brand']))
+        if features['model_number']:
+            # Key on the series only, so "pavilion 14" still meets "pavilion 15"
+            keys.append(('series', features['model_number'].split()[0]))
+        if features['processor']:
+            keys.append(('processor', features['processor'].replace(' ', '')))
+        return keys
+    
+    def candidate_positions(self, features):
+        """Return catalog positions worth scoring against a product's features"""
+        if not features['brand']:
+            return range(len(self.products))
+        
+        positions = set(self.unbranded)
+        for key in self.block_keys(features):
+            positions.update(self.blocks.get(key, ()))
+        
+        # Keep catalog order so ties resolve exactly as a full scan would
+        return sorted(positions)
+    
+    def candidates(self, features):
+        """Return the competitor products worth scoring against a product's features"""
+        return [self.products[position] for position in self.candidate_positions(features)]
+
+
+class SellerBlockIndex:
+    """Reverse of CompetitorBlockIndex: which seller products a competitor listing is a candidate for"""
+    
+    def __init__(self, service, products):
+        self.product_ids = set()
+        self.blocks = defaultdict(set)
+        self.unbranded = set()
+        
+        for product in products:
+            features, clean_name = service.get_product_features(product)
+            self.product_ids.add(product.pk)
+            if not features['brand']:
+                self.unbranded.add(product.pk)
+            for key in CompetitorBlockIndex.block_keys(features):
+                self.blocks[key].add(product.pk)
+    
+    def affected_by(self, features):
+        """Return ids of seller products that would score a competitor listing with these features"""
+        # Mirrors CompetitorBlockIndex.candidate_positions from the other side
+        if not features['brand']:
+            return set(self.product_ids)
+        
+        product_ids = set(self.unbranded)
+        for key in CompetitorBlockIndex.block_keys(features):
+            product_ids |= self.blocks.get(key, set())
+        return product_ids
+
+
+class CatalogChangeRecorder:
+    """Write one competitor's scraped listings in bulk and record what changed as CompetitorChange rows.
+    
+    The competitor's catalog is loaded once, keyed on each listing's
+    canonical URL (see matching.listing_key); record() classifies each scraped
+    listing in memory and flush() writes everything recorded since the last
+    flush with a handful of bulk queries (call it once per scraped page).
+    
+    Every run gets the next scrape generation for the competitor and stamps
+    it on each listing it sees. finish() then sweeps the listings still on
+    an older generation, deactivating them with one set-based UPDATE.
+    """
+    
+    def __init__(self, competitor, scraping_log=None, min_coverage=0.5, service=None, generation=None):
+        self.competitor = competitor
+        self.scraping_log = scraping_log
+        # A scrape that saw less than this share of the active catalog probably
+        # broke part way, so nothing is deactivated
+        self.min_coverage = min_coverage
+        self.service = service or PriceComparisonService()
+        
+        # A resumed run keeps the generation it stamped before it was interrupted
+        self.generation = generation or (CompetitorProduct.objects.filter(competitor=competitor).aggregate(
+            generation=Max('scrape_generation')
+        )['generation'] or 0) + 1
+        
+        # Listings by url_key; a listing that moves to another URL is a new listing
+        self.catalog = {
+            competitor_product.url_key: competitor_product
+            for competitor_product in CompetitorProduct.objects.filter(competitor=competitor).only(
+                'id', 'title', 'url_key', 'competitor', 'price', 'url', 'is_active'
+            )
         }
+        
+        self.seen = set()
+        # Seen listings that have nothing else to write but the generation stamp
+        self.unstamped = set()
+        self.dirty = {}
+        self.retitled = set()
+        self.changes = []
+        self.counts = {change_type: 0 for change_type, _ in CompetitorChange.CHANGE_TYPES}
+    
+    def record(self, title, price, url):
+        """Stage a scraped listing; returns (competitor product, CompetitorChange or None), unsaved until flush()"""
+        key = listing_key(url, title)
+        competitor_product = self.catalog.get(key)
+        if key in self.seen:
+            # The same listing shown twice in one run (e.g. on two pages) is recorded once
+            return competitor_product, None
+        
+        if competitor_product is None:
+            competitor_product = CompetitorProduct(
+                title=title, competitor=self.competitor, price=price, url=url, url_key=key,
+                scrape_generation=self.generation
+            )
+            competitor_product.set_match_features(self.service.match_feature_columns(title))
+            self.dirty[key] = competitor_product
+            change_type = 'new'
+            old_title, old_price = '', None
+        else:
+            old_title, old_price = competitor_product.title, competitor_product.price
+            if not competitor_product.is_active:
+                change_type = 'new'
+            elif competitor_product.title != title:
+                change_type = 'title'
+            elif competitor_product.price != price:
+                change_type = 'price'
+            else:
+                change_type = None
+            
+            if change_type or competitor_product.url != url:
+                if competitor_product.title != title:
+                    competitor_product.set_match_features(self.service.match_feature_columns(title))
+                    self.retitled.add(key)
+                competitor_product.title = title
+                competitor_product.price = price
+                competitor_product.url = url
+                competitor_product.is_active = True
+                competitor_product.scrape_generation = self.generation
+                self.dirty[key] = competitor_product
+                self.unstamped.discard(competitor_product.pk)
+            else:
+                self.unstamped.add(competitor_product.pk)
+        
+        self.catalog[key] = competitor_product
+        self.seen.add(key)
+        
+        change = None
+        if change_type:
+            change = CompetitorChange(
+                competitor_product=competitor_product,
+                scraping_log=self.scraping_log,
+                change_type=change_type,
+                old_title=old_title if old_title != title else '',
+                old_price=old_price,
+            )
+            self.changes.append(change)
+            self.counts[change_type] += 1
+        return competitor_product, change
+    
+    def flush(self):
+        """Write the listings, price history and changes recorded since the last flush"""
+        # Listings seen unchanged only need this run's generation
+        unstamped = list(self.unstamped)
+        for start in range(0, len(unstamped), 500):
+            CompetitorProduct.objects.filter(pk__in=unstamped[start:start + 500]).update(scrape_generation=self.generation)
+        self.unstamped = set()
+        
+        if not self.dirty and not self.changes:
+            return
+        
+        # New and updated listings in one upsert keyed on (competitor, url_key);
+        # retitled rows are updated by primary key so their features follow,
+        # and the upsert never rewrites titles behind the search index's back
+        upserts = [
+            competitor_product if competitor_product.pk is None else CompetitorProduct(
+                title=competitor_product.title, competitor=self.competitor, price=competitor_product.price,
+                url=competitor_product.url, url_key=key, is_active=True, scrape_generation=self.generation
+            )
+            for key, competitor_product in self.dirty.items()
+            if key not in self.retitled
+        ]
+        CompetitorProduct.objects.bulk_create(
+            upserts, batch_size=500,
+            update_conflicts=True, unique_fields=['competitor', 'url_key'], update_fields=['price', 'url', 'is_active', 'scrape_generation']
+        )
+        CompetitorProduct.objects.bulk_update(
+            [self.dirty[key] for key in self.retitled],
+            ['title', 'price', 'url', 'is_active', 'scrape_generation', *CompetitorProduct.FEATURE_FIELDS],
+            batch_size=500
+        )
+        
+        # Bulk inserts don't hand back primary keys on every backend
+        new_keys = [key for key, competitor_product in self.dirty.items() if competitor_product.pk is None]
+        if new_keys:
+            for key, pk in CompetitorProduct.objects.filter(
+                competitor=self.competitor, url_key__in=new_keys
+            ).values_list('url_key', 'id'):
+                self.catalog[key].pk = pk
+        
+        # pre_save signals don't run for bulk writes, so log price changes here
+        roll_up_price_history(PriceHistory.objects.bulk_create([
+            PriceHistory(competitor_product=change.competitor_product, old_price=change.old_price,
+                         new_price=change.competitor_product.price)
+            for change in self.changes
+            if change.old_price is not None and change.old_price != change.competitor_product.price
+        ], batch_size=500))
+        CompetitorChange.objects.bulk_create(self.changes, batch_size=500)
+        bump_catalog_version([self.competitor])
+        
+        self.dirty = {}
+        self.retitled = set()
+        self.changes = []
+    
+    def finish(self, deactivate_missing=True):
+        """Flush, then sweep active listings from older generations; returns change counts by type.
+        
+        Pass deactivate_missing=False for a run that failed part way; the
+        coverage guard also skips the sweep if this run saw too little of
+        the catalog.
+        """
+        self.flush()
+        if not deactivate_missing:
+            return dict(self.counts)
+        
+        # Counted in the database so listings stamped before a resume count too
+        seen = CompetitorProduct.objects.filter(competitor=self.competitor, scrape_generation=self.generation).count()
+        stale = CompetitorProduct.objects.filter(
+            competitor=self.competitor, is_active=True, scrape_generation__lt=self.generation
+        )
+        missing = dict(stale.values_list('id', 'price')) if seen else {}
+        if missing and seen >= (seen + len(missing)) * self.min_coverage:
+            stale.update(is_active=False)
+            for competitor_product in self.catalog.values():
+                if competitor_product.pk in missing:
+                    competitor_product.is_active = False
+            CompetitorChange.objects.bulk_create([
+                CompetitorChange(
+                    competitor_product_id=pk,
+                    scraping_log=self.scraping_log,
+                    change_type='deactivated',
+                    old_price=price,
+                )
+                for pk, price in missing.items()
+            ], batch_size=500)
+            bump_catalog_version([self.competitor])
+            self.counts['deactivated'] += len(missing)
+        return dict(self.counts)
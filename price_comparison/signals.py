@@ -1,19 +1,61 @@
-from django.db.models.signals import post_save, pre_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
 from django.dispatch import receiver
+from django.utils import timezone
 from products.models import Product
 from .models import ProductComparison, CompetitorProduct, PriceHistory
-from .services import PriceComparisonService
+from .maintenance import roll_up_price_history
+from .services import PriceComparisonService, bump_catalog_version
+from .tasks import queue_product_comparison
+
+# Product fields that can change a price comparison; other saves (e.g. stock
+# decrements at checkout) never need re-matching
+MATCH_RELEVANT_FIELDS = ('name', 'price', 'category', 'is_active')
+
+
+def match_relevant_values(product):
+    # Read __dict__ directly so deferred fields don't trigger a query
+    return tuple(product.__dict__.get(field) for field in MATCH_RELEVANT_FIELDS)
+
+
+@receiver(post_init, sender=Product)
+def remember_match_relevant_values(sender, instance, **kwargs):
+    """Snapshot match-relevant fields so post_save can tell whether they changed"""
+    instance._match_relevant_values = match_relevant_values(instance)
 
 
 @receiver(post_save, sender=Product)
-def create_or_update_price_comparison(sender, instance, created, **kwargs):
-    """Automatically create/update price comparison when a product is saved"""
-    if instance.seller and instance.is_active:
-        # Initialize price comparison service
-        comparison_service = PriceComparisonService()
-        
-        # Run comparison for this product
-        comparison_service.compare_single_product(instance)
+def create_or_update_price_comparison(sender, instance, created, update_fields=None, **kwargs):
+    """Queue a price comparison refresh when a match-relevant product field changes"""
+    previous = instance._match_relevant_values
+    instance._match_relevant_values = match_relevant_values(instance)
+    
+    if not created:
+        if update_fields is not None and not set(update_fields) & set(MATCH_RELEVANT_FIELDS):
+            return
+        if previous == instance._match_relevant_values:
+            return
+    
+    if not created:
+        # Keep the comparison's copies current for the seller's list and insights;
+        # stamping it also moves the seller's insights cache key (see get_price_insights)
+        ProductComparison.objects.filter(seller_product=instance).update(
+            seller=instance.seller_id, is_active=instance.is_active, category=instance.category,
+            last_compared=timezone.now()
+        )
+    
+    if instance.seller_id and instance.is_active and instance.category == 'laptop':
+        # Matching runs in the background worker once the save is committed
+        product_id = instance.pk
+        transaction.on_commit(lambda: queue_product_comparison(product_id))
+
+
+@receiver(pre_save, sender=CompetitorProduct)
+def refresh_match_features(sender, instance, update_fields=None, **kwargs):
+    """Precompute match features whenever a competitor title is written"""
+    if update_fields is not None and 'title' not in update_fields:
+        return
+    instance.set_match_features(PriceComparisonService().match_feature_columns(instance.title))
 
 
 @receiver(pre_save, sender=CompetitorProduct)
@@ -24,10 +66,17 @@ def track_price_changes(sender, instance, **kwargs):
             old_product = CompetitorProduct.objects.get(pk=instance.pk)
             if old_product.price != instance.price:
                 # Create price history entry
-                PriceHistory.objects.create(
+                roll_up_price_history([PriceHistory.objects.create(
                     competitor_product=instance,
                     old_price=old_product.price,
                     new_price=instance.price
-                )
+                )])
         except CompetitorProduct.DoesNotExist:
             pass  # New product, no need to track
+
+
+@receiver(post_save, sender=CompetitorProduct)
+@receiver(post_delete, sender=CompetitorProduct)
+def bump_competitor_catalog(sender, instance, **kwargs):
+    """Let processes know their snapshot of this competitor's catalog is stale"""
+    bump_catalog_version([instance.competitor])
@@ -0,0 +1,35 @@
+import logging
+
+from celery import shared_task
+from celery.signals import worker_ready
+from kombu.exceptions import OperationalError
+from .services import PriceComparisonService
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def process_comparison_queue():
+    """Refresh comparisons for every product queued by the Product post_save signal"""
+    return PriceComparisonService().process_comparison_queue()
+
+
+def queue_product_comparison(product_id):
+    """Queue a product for comparison, scheduling a drain only if it wasn't already queued.
+    
+    Runs after the product save has committed, so a broker outage is logged
+    rather than raised; the product stays in PendingComparison until the
+    next drain.
+    """
+    if not PriceComparisonService().enqueue_comparison(product_id):
+        return
+    try:
+        process_comparison_queue.delay()
+    except OperationalError as e:
+        logger.warning(f"Could not schedule the comparison queue drain for product {product_id}: {e}")
+
+
+@worker_ready.connect
+def drain_comparison_queue_on_start(sender, **kwargs):
+    """Drain products that were queued while no broker or worker was available"""
+    process_comparison_queue.delay()
@@ -0,0 +1,1206 @@
+import hashlib
+import inspect
+import json
+import tempfile
+import threading
+import warnings
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache.backends.base import CacheKeyWarning
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from jadeed_gadgets.celery import app as celery_app
+from kombu.exceptions import OperationalError
+from products.models import Product
+from .matching import KeyFeatures
+from .models import (
+    CatalogVersion, ComparisonCandidate, CompetitorChange, CompetitorMatch, CompetitorProduct, DailyPrice, PendingComparison, PriceHistory,
+    ProductComparison, ScrapeCheckpoint, ScrapedPage, ScrapingLog
+)
+from .scrapers import (
+    SITES, BrowserPool, Fetcher, FetchError, ListingSite, PakLapSite, PriceOyeSite, SeleniumScraper, build_page,
+    scrape_site
+)
+from .scraping import scrape_competitors
+from .search import search_competitor_products
+from .services import (
+    PriceComparisonService, CompetitorBlockIndex, CatalogChangeRecorder, DifflibScorer, RapidFuzzScorer,
+    shared_competitor_indexes
+)
+from .tasks import process_comparison_queue
+
+User = get_user_model()
+
+CORPUS_PATH = Path(__file__).resolve().parent / 'testdata' / 'matching_corpus_v1.json'
+SCRAPER_FIXTURES = Path(__file__).resolve().parent / 'testdata' / 'scrapers'
+
+
+def load_matching_corpus():
+    """Load the labelled seller/competitor matching corpus"""
+    with open(CORPUS_PATH, encoding='utf-8') as corpus_file:
+        return json.load(corpus_file)
+
+
+def create_corpus_competitors(corpus):
+    """Create the corpus competitor catalog in the test database"""
+    for entry in corpus['competitors']:
+        CompetitorProduct.objects.create(
+            title=entry['title'],
+            competitor=entry['competitor'],
+            price=entry['price'],
+            url=entry['url'],
+        )
+
+
+def create_seller(username='seller'):
+    """Create a seller account that can log in with password 'testpass123'"""
+    return User.objects.create_user(
+        username=username, email=f'{username}@example.com', password='testpass123', role='seller'
+    )
+
+
+def create_matching_fixture(seller_products=6):
+    """Create the corpus competitor catalog plus a seller listing the first corpus seller products.
+
+    Returns (corpus, seller, seller products).
+    """
+    corpus = load_matching_corpus()
+    create_corpus_competitors(corpus)
+    seller = create_seller()
+    products = [
+        Product.objects.create(
+            seller=seller, name=seller_product['name'], brand='Test', price=150000, stock=5, category='laptop'
+        )
+        for seller_product in corpus['sellers'][:seller_products]
+    ]
+    return corpus, seller, products
+
+
+class BlockingIndexTestCase(TestCase):
+    def setUp(self):
+        # Corpus labels were recorded with the difflib reference scorer
+        self.service = PriceComparisonService(scorer='difflib')
+        self.corpus = load_matching_corpus()
+        create_corpus_competitors(self.corpus)
+
+    def full_scan_best_match(self, name, competitor):
+        """Reference matcher that scores every active competitor product"""
+        best_match = None
+        best_score = 0
+        for competitor_product in CompetitorProduct.objects.filter(competitor=competitor, is_active=True):
+            similarity = self.service.calculate_similarity(name, competitor_product.title)
+            if similarity > best_score and similarity >= self.service.min_confidence:
+                best_score = similarity
+                best_match = competitor_product
+        return best_match, best_score
+
+    def test_indexed_matches_equal_full_scan(self):
+        """Test that blocking never changes the chosen match or its confidence"""
+        indexes = self.service.build_competitor_indexes()
+        names = [seller['name'] for seller in self.corpus['sellers']]
+        names += [entry['title'] for entry in self.corpus['competitors']]
+
+        for name in names:
+            matches = self.service.find_best_matches(Product(name=name), indexes=indexes)
+            for competitor in ('paklap', 'priceoye'):
+                expected_match, expected_score = self.full_scan_best_match(name, competitor)
+                self.assertEqual(matches[competitor]['product'], expected_match, name)
+                self.assertAlmostEqual(matches[competitor]['confidence'], expected_score, msg=name)
+
+    def test_matches_follow_corpus_labels(self):
+        """Test that the labelled best match is picked for every seller title"""
+        indexes = self.service.build_competitor_indexes()
+        for seller in self.corpus['sellers']:
+            matches = self.service.find_best_matches(Product(name=seller['name']), indexes=indexes)
+            for competitor, expected_title in seller['expected'].items():
+                match = matches[competitor]['product']
+                self.assertEqual(match.title if match else None, expected_title, seller['name'])
+
+    def test_tfidf_matcher_follows_corpus_labels(self):
+        """Test that TF-IDF candidate generation keeps the labelled matches when k covers the catalog"""
+        service = PriceComparisonService(matcher='tfidf', top_k=len(self.corpus['competitors']), scorer='difflib')
+        products = [Product(pk=i, name=seller['name']) for i, seller in enumerate(self.corpus['sellers'], 1)]
+
+        batch_matches = service.find_best_matches_tfidf(products)
+
+        for product, seller in zip(products, self.corpus['sellers']):
+            for competitor, expected_title in seller['expected'].items():
+                match = batch_matches[product.pk][competitor]['product']
+                self.assertEqual(match.title if match else None, expected_title, seller['name'])
+
+    def test_tfidf_matcher_limits_candidates(self):
+        """Test that a small k still returns a confident match for an exact title"""
+        service = PriceComparisonService(matcher='tfidf', top_k=3)
+        title = 'Dell Inspiron 15 3530 13th Gen Core i5 1334u'
+        product = Product(pk=1, name=title)
+
+        match = service.find_best_matches_tfidf([product])[product.pk]['priceoye']
+
+        self.assertEqual(match['product'].title, title)
+        self.assertGreaterEqual(match['confidence'], service.min_confidence)
+
+    def test_candidates_are_blocked_by_brand(self):
+        """Test that a branded product is not scored against other brands"""
+        index = CompetitorBlockIndex(self.service, CompetitorProduct.objects.filter(competitor='priceoye'))
+        candidates = index.candidates(self.service.extract_key_features('Dell Inspiron 15 3530 13th Gen'))
+
+        self.assertLess(len(candidates), len(index))
+        self.assertTrue(all(
+            'dell' in product.title.lower() or 'inspiron' in product.title.lower()
+            or not self.service.extract_key_features(product.title)['brand']
+            for product in candidates
+        ))
+
+    def test_catalog_snapshot_is_reused_until_version_bump(self):
+        """Test that the shared catalog snapshot matches a fresh load and reloads only bumped competitors"""
+        indexes = shared_competitor_indexes(self.service)
+        with self.assertNumQueries(1):
+            self.assertEqual(shared_competitor_indexes(self.service), indexes)
+
+        fresh_indexes = self.service.build_competitor_indexes()
+        for seller in self.corpus['sellers']:
+            product = Product(name=seller['name'])
+            matches = self.service.find_best_matches(product)
+            for competitor, expected in self.service.find_best_matches(product, indexes=fresh_indexes).items():
+                self.assertEqual(matches[competitor]['product'], expected['product'], seller['name'])
+                if expected['product']:
+                    self.assertEqual(matches[competitor]['product'].price, expected['product'].price)
+                self.assertAlmostEqual(matches[competitor]['confidence'], expected['confidence'])
+
+        version = CatalogVersion.objects.get(competitor='priceoye').version
+        title = 'Lenovo ThinkPad E14 Gen 5 Core i7 1355U 14 inch'
+        listing = CompetitorProduct.objects.create(
+            title=title, competitor='priceoye', price=199999, url='https://example.com/e14'
+        )
+
+        reloaded = shared_competitor_indexes(self.service)
+        self.assertEqual(CatalogVersion.objects.get(competitor='priceoye').version, version + 1)
+        self.assertIs(reloaded['paklap'], indexes['paklap'])
+        self.assertIsNot(reloaded['priceoye'], indexes['priceoye'])
+        self.assertEqual(self.service.find_best_matches(Product(name=title))['priceoye']['product'], listing)
+
+
+class MatchFeaturesTestCase(TestCase):
+    def setUp(self):
+        self.service = PriceComparisonService()
+
+    def test_features_stored_on_save(self):
+        """Test that competitor features are precomputed when a row is written"""
+        competitor_product = CompetitorProduct.objects.create(
+            title='HP Victus 15 FA 1093dx Gaming Core i5 12450H',
+            competitor='paklap',
+            price=200000,
+            url='https://www.paklap.pk/hp-victus-15.html',
+        )
+        competitor_product.refresh_from_db()
+
+        self.assertEqual(
+            competitor_product.get_key_features(),
+            self.service.extract_key_features(competitor_product.title)
+        )
+        self.assertEqual(competitor_product.normalized_title, self.service.clean_product_name(competitor_product.title))
+        self.assertEqual(competitor_product.model_number, 'victus 15')
+
+    def test_backfill_fills_missing_features(self):
+        """Test that the backfill command fills rows written without features"""
+        competitor_product = CompetitorProduct.objects.create(
+            title='Dell Inspiron 15 3530 13th Gen Core i5 1334u',
+            competitor='priceoye',
+            price=150000,
+            url='https://priceoye.pk/laptops/dell/dell-inspiron-15-3530',
+        )
+        CompetitorProduct.objects.filter(pk=competitor_product.pk).update(normalized_title='', brand='')
+
+        call_command('backfill_match_features', stdout=StringIO())
+        competitor_product.refresh_from_db()
+
+        self.assertEqual(competitor_product.brand, 'dell')
+        self.assertTrue(competitor_product.has_match_features)
+
+    def test_stored_features_score_like_raw_titles(self):
+        """Test that scoring from stored columns equals scoring raw titles"""
+        seller_name = 'HP Pavilion 15 Ryzen 7 Touch'
+        competitor_product = CompetitorProduct.objects.create(
+            title='HP Pavilion 15 EH3050au - AMD Ryzen 7 7730U Octa Core (16GB-1TB)',
+            competitor='priceoye',
+            price=198499,
+            url='https://priceoye.pk/laptops/hp/hp-pavilion-15-eh3050au',
+        )
+        competitor_product.refresh_from_db()
+
+        features, clean_name = self.service.get_competitor_features(competitor_product)
+        self.assertAlmostEqual(
+            self.service.score_features(
+                self.service.extract_key_features(seller_name), self.service.clean_product_name(seller_name),
+                features, clean_name
+            ),
+            self.service.calculate_similarity(seller_name, competitor_product.title)
+        )
+
+    def test_extracted_features_are_memoized_records(self):
+        """Test that repeated titles reuse one immutable feature record"""
+        title = 'HP Victus 15 FA 1093dx Gaming Core i5 12450H'
+        features = self.service.extract_key_features(title)
+
+        self.assertIs(self.service.extract_key_features(title), features)
+        self.assertIsInstance(features, KeyFeatures)
+        self.assertEqual(features['model_number'], features.model_number)
+        with self.assertRaises(AttributeError):
+            features.brand = 'dell'
+
+
+class ScorerBackendTestCase(TestCase):
+    def setUp(self):
+        self.corpus = load_matching_corpus()
+        create_corpus_competitors(self.corpus)
+        self.products = [Product(pk=i, name=seller['name']) for i, seller in enumerate(self.corpus['sellers'], 1)]
+
+    def test_cdist_matrix_equals_pairwise_ratio(self):
+        """Test that the bulk rapidfuzz matrix scores exactly like single pairs"""
+        scorer = RapidFuzzScorer()
+        queries = [seller['name'].lower() for seller in self.corpus['sellers']]
+        choices = [entry['title'].lower() for entry in self.corpus['competitors']]
+
+        matrix = scorer.ratio_matrix(queries, choices)
+
+        for row, query in enumerate(queries):
+            for column, choice in enumerate(choices):
+                self.assertEqual(matrix[row][column], scorer.ratio(query, choice))
+
+    def test_bulk_matches_equal_single_product_matches(self):
+        """Test that the bulk path picks the same matches as per-product matching"""
+        for scorer in PriceComparisonService.SCORERS:
+            service = PriceComparisonService(scorer=scorer)
+            indexes = service.build_competitor_indexes()
+            batch_matches = service.find_best_matches_bulk(self.products, indexes=indexes)
+
+            for product in self.products:
+                single_matches = service.find_best_matches(product, indexes=indexes)
+                for competitor, match in single_matches.items():
+                    self.assertEqual(batch_matches[product.pk][competitor]['product'], match['product'])
+                    self.assertAlmostEqual(batch_matches[product.pk][competitor]['confidence'], match['confidence'])
+
+    def test_difflib_scores_only_blocked_candidates(self):
+        """Test that bulk matching with the pure-Python scorer skips the full catalog matrix"""
+        service = PriceComparisonService(scorer='difflib')
+        with mock.patch.object(DifflibScorer, 'ratio_matrix') as ratio_matrix:
+            batch_matches = service.find_best_matches_bulk(self.products)
+
+        ratio_matrix.assert_not_called()
+        self.assertTrue(any(match['product'] for matches in batch_matches.values() for match in matches.values()))
+
+    def test_rapidfuzz_tracks_difflib_reference(self):
+        """Test that rapidfuzz scores stay close to the difflib reference"""
+        reference = PriceComparisonService(scorer='difflib')
+        service = PriceComparisonService(scorer='rapidfuzz')
+        reference_matches = reference.find_best_matches_bulk(self.products)
+        batch_matches = service.find_best_matches_bulk(self.products)
+
+        for product in self.products:
+            for competitor, expected in reference_matches[product.pk].items():
+                match = batch_matches[product.pk][competitor]
+                self.assertEqual(match['product'] is None, expected['product'] is None, product.name)
+                self.assertAlmostEqual(match['confidence'], expected['confidence'], delta=0.05, msg=product.name)
+
+        # Indel similarity counts every common subsequence, so it never undercuts difflib
+        for seller in self.corpus['sellers']:
+            for entry in self.corpus['competitors']:
+                text1 = reference.clean_product_name(seller['name'])
+                text2 = reference.clean_product_name(entry['title'])
+                self.assertGreaterEqual(RapidFuzzScorer().ratio(text1, text2) + 1e-9, DifflibScorer().ratio(text1, text2))
+
+    def test_matching_benchmark_reports_every_scorer(self):
+        """Test that the matching benchmark scores the pair corpus with each scorer and emits JSON"""
+        out = StringIO()
+        call_command('bench_matching', catalog_size=50, products=5, json='-', stdout=out)
+
+        record = json.loads(out.getvalue().strip().splitlines()[-1])
+        self.assertEqual(record['corpus_version'], 1)
+        self.assertEqual(set(record['scorers']), set(PriceComparisonService.SCORERS))
+        for result in record['scorers'].values():
+            self.assertEqual(result['threshold'], PriceComparisonService().min_confidence)
+            self.assertGreater(result['pairs_scored'], 0)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+            self.assertTrue(0 <= result['precision'] <= 1 and 0 <= result['recall'] <= 1)
+
+
+class CompareAllProductsTestCase(TestCase):
+    def setUp(self):
+        self.corpus, self.seller, _ = create_matching_fixture()
+
+    def test_parallel_matches_equal_bulk_matches(self):
+        """Test that chunked process-pool matching agrees with in-process matching"""
+        service = PriceComparisonService()
+        products = list(Product.objects.all())
+        indexes = service.build_competitor_indexes()
+
+        parallel = service.find_best_matches_parallel(products, indexes=indexes, workers=2, chunk_size=2)
+        bulk = service.find_best_matches_bulk(products, indexes=indexes)
+
+        for product in products:
+            for competitor, match in bulk[product.pk].items():
+                self.assertEqual(parallel[product.pk][competitor]['product'], match['product'])
+                self.assertAlmostEqual(parallel[product.pk][competitor]['confidence'], match['confidence'])
+
+    def test_unchanged_comparisons_are_skipped(self):
+        """Test that a rerun only writes comparisons whose match or price changed"""
+        service = PriceComparisonService()
+        service.compare_all_products(seller=self.seller)
+        service.compare_all_products(seller=self.seller)
+        self.assertEqual(service.last_run_stats['unchanged'], 6)
+
+        match = CompetitorMatch.objects.filter(competitor='priceoye').first()
+        CompetitorProduct.objects.filter(pk=match.competitor_product_id).update(price=1000)
+
+        results = service.compare_all_products(seller=self.seller)
+        match.refresh_from_db()
+
+        self.assertEqual(len(results), 6)
+        self.assertGreaterEqual(service.last_run_stats['updated'], 1)
+        self.assertEqual(match.price_difference, 149000)
+
+    def test_new_comparisons_are_bulk_created(self):
+        """Test that products without a comparison row get one"""
+        ProductComparison.objects.all().delete()
+
+        service = PriceComparisonService()
+        service.compare_all_products(seller=self.seller)
+
+        self.assertEqual(service.last_run_stats['created'], 6)
+        self.assertEqual(ProductComparison.objects.count(), 6)
+
+    def test_all_competitors_are_matched_in_one_pass(self):
+        """Test that one scorer call covers every catalog and each matched competitor gets one row"""
+        service = PriceComparisonService()
+        ratio_matrix = service.scorer.ratio_matrix
+        choice_counts = []
+
+        def counting_ratio_matrix(queries, choices):
+            choice_counts.append(len(choices))
+            return ratio_matrix(queries, choices)
+
+        service.scorer.ratio_matrix = counting_ratio_matrix
+        service.compare_all_products(seller=self.seller, workers=1)
+
+        self.assertEqual(choice_counts, [CompetitorProduct.objects.filter(is_active=True).count()])
+        self.assertTrue(CompetitorMatch.objects.exists())
+        for comparison in ProductComparison.objects.all():
+            matches = comparison.get_matches()
+            self.assertEqual(len({match.competitor for match in matches}), len(matches))
+            if matches:
+                self.assertEqual(
+                    comparison.best_competitor_price, min(match.competitor_product.price for match in matches)
+                )
+            else:
+                self.assertEqual(comparison.competitive_status, 'no_match')
+
+    def test_top_candidates_are_persisted(self):
+        """Test that compare runs store ranked candidates: the best match and its runners-up"""
+        service = PriceComparisonService(candidate_count=3)
+        service.compare_all_products(seller=self.seller)
+
+        for match in CompetitorMatch.objects.filter(competitor='priceoye').select_related('seller_product'):
+            candidates = list(match.seller_product.match_candidates.filter(competitor='priceoye'))
+            self.assertLessEqual(len(candidates), 4)
+            self.assertEqual([candidate.rank for candidate in candidates], list(range(1, len(candidates) + 1)))
+            self.assertEqual(candidates[0].competitor_product_id, match.competitor_product_id)
+            self.assertAlmostEqual(candidates[0].score, match.confidence)
+            self.assertEqual(sorted((c.score for c in candidates), reverse=True), [c.score for c in candidates])
+
+        # A rerun replaces the rows instead of adding to them
+        count = ComparisonCandidate.objects.count()
+        service.compare_all_products(seller=self.seller)
+        self.assertEqual(ComparisonCandidate.objects.count(), count)
+
+    def test_picked_candidate_survives_rematching(self):
+        """Test that a seller's pick is kept by compare runs until its listing goes away"""
+        service = PriceComparisonService()
+        service.compare_all_products(seller=self.seller)
+        candidate = ComparisonCandidate.objects.filter(competitor='priceoye', rank=2).select_related(
+            'seller_product__price_comparison'
+        ).first()
+        comparison = candidate.seller_product.price_comparison
+
+        match = service.pick_candidate(comparison, candidate)
+        service.compare_all_products(seller=self.seller)
+        match.refresh_from_db()
+        self.assertEqual(match.competitor_product_id, candidate.competitor_product_id)
+        self.assertTrue(match.pinned)
+
+        CompetitorProduct.objects.filter(pk=candidate.competitor_product_id).update(is_active=False)
+        service.compare_all_products(seller=self.seller)
+        match.refresh_from_db()
+        self.assertNotEqual(match.competitor_product_id, candidate.competitor_product_id)
+        self.assertFalse(match.pinned)
+
+    def test_every_runner_up_can_be_picked(self):
+        """Test that the detail page offers candidate_count runners-up and rejects malformed picks"""
+        service = PriceComparisonService()
+        service.compare_all_products(seller=self.seller)
+        match = CompetitorMatch.objects.filter(
+            competitor='priceoye', pinned=False,
+            seller_product__match_candidates__competitor='priceoye',
+            seller_product__match_candidates__rank=service.candidate_count + 1,
+        ).first()
+        self.assertIsNotNone(match)
+        self.client.login(username='seller', password='testpass123')
+
+        response = self.client.get(reverse('price_comparison:product_detail', args=[match.seller_product_id]))
+        slot = next(slot for slot in response.context['competitor_slots'] if slot['competitor'] == 'priceoye')
+        self.assertEqual(len(slot['candidates']), service.candidate_count)
+        self.assertNotIn(match.competitor_product_id, [candidate.competitor_product_id for candidate in slot['candidates']])
+
+        url = reverse('price_comparison:pick_match', args=[match.seller_product_id])
+        self.assertEqual(self.client.post(url, {'candidate_id': 'abc'}).status_code, 400)
+        self.assertEqual(self.client.post(url).status_code, 400)
+        response = self.client.post(url, {'candidate_id': slot['candidates'][-1].pk})
+        self.assertTrue(response.json()['success'])
+
+    def test_competitive_status_is_maintained(self):
+        """Test that every comparison write keeps the stored status and best price current"""
+        service = PriceComparisonService()
+        service.compare_all_products(seller=self.seller)
+        for comparison in ProductComparison.objects.all():
+            stored = [getattr(comparison, field) for field in ProductComparison.DERIVED_FIELDS]
+            comparison.refresh_competitive_status()
+            self.assertEqual(stored, [getattr(comparison, field) for field in ProductComparison.DERIVED_FIELDS])
+        self.assertEqual(ProductComparison.objects.filter(seller=self.seller, is_active=True, category='laptop').count(), 6)
+
+        product = Product.objects.filter(seller=self.seller).first()
+        product.is_active = False
+        product.save()
+        self.assertFalse(ProductComparison.objects.get(seller_product=product).is_active)
+
+        match = CompetitorMatch.objects.filter(competitor='paklap').first()
+        comparison = ProductComparison.objects.get(seller_product_id=match.seller_product_id)
+        CompetitorProduct.objects.filter(pk=match.competitor_product_id).update(price=1000)
+        service.refresh_price_differences([match.competitor_product_id])
+        comparison.refresh_from_db()
+        self.assertEqual((comparison.competitive_status, comparison.best_competitor_price), ('overpriced', 1000))
+        self.assertIn(comparison, ProductComparison.objects.filter(seller=self.seller, competitive_status='overpriced'))
+
+    def test_price_insights_are_aggregated_and_cached(self):
+        """Test that insights match a per-row classification and are cached until comparisons change"""
+        PriceComparisonService().compare_all_products(seller=self.seller)
+        expected = {'competitive_count': 0, 'overpriced_count': 0, 'underpriced_count': 0, 'no_match_count': 0}
+        for comparison in ProductComparison.objects.all():
+            matches = {match.competitor: match for match in comparison.get_matches()}
+            if matches:
+                difference = (matches.get('paklap') or matches['priceoye']).price_difference
+                status = 'underpriced' if difference < -100 else 'overpriced' if difference > 100 else 'competitive'
+            else:
+                status = 'no_match'
+            expected[f'{status}_count'] += 1
+        cache.clear()
+
+        service = PriceComparisonService()
+        with self.assertNumQueries(2):
+            insights = service.get_price_insights(self.seller)
+        # Only the version check runs on a cache hit
+        with self.assertNumQueries(1):
+            self.assertEqual(service.get_price_insights(self.seller), insights)
+        self.assertEqual({key: insights[key] for key in expected}, expected)
+        self.assertEqual(insights['total_products'], 6)
+
+        product = Product.objects.filter(seller=self.seller).first()
+        product.is_active = False
+        product.save()
+        self.assertEqual(service.get_price_insights(self.seller)['total_products'], 5)
+
+    def test_insights_notice_writes_from_other_processes(self):
+        """Test that comparison writes that skip this process's signals still refresh the cached insights"""
+        service = PriceComparisonService()
+        service.compare_all_products(seller=self.seller)
+        insights = service.get_price_insights(self.seller)
+
+        # Queryset writes send no signals, like a write made by the worker or a scraper
+        comparison = ProductComparison.objects.exclude(competitive_status='overpriced').first()
+        ProductComparison.objects.filter(pk=comparison.pk).update(
+            competitive_status='overpriced', last_compared=timezone.now()
+        )
+        self.assertEqual(service.get_price_insights(self.seller)['overpriced_count'], insights['overpriced_count'] + 1)
+
+        ProductComparison.objects.filter(pk=comparison.pk).delete()
+        self.assertEqual(service.get_price_insights(self.seller)['total_products'], insights['total_products'] - 1)
+
+
+class ComparisonQueueTestCase(TestCase):
+    def setUp(self):
+        self.corpus, self.seller, (self.product,) = create_matching_fixture(seller_products=1)
+        # The Celery app reads its settings once, so override_settings can't switch on eager mode
+        eager = celery_app.conf.task_always_eager
+        celery_app.conf.task_always_eager = True
+        self.addCleanup(setattr, celery_app.conf, 'task_always_eager', eager)
+
+    def test_stock_only_save_is_not_queued(self):
+        """Test that saves which don't touch match fields skip the comparison queue"""
+        product = Product.objects.get(pk=self.product.pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            product.stock -= 1
+            product.save()
+            product.save(update_fields=['stock'])
+
+        self.assertEqual(callbacks, [])
+
+    def test_name_change_is_queued_and_drained(self):
+        """Test that renaming a product queues it and the task refreshes its comparison"""
+        product = Product.objects.get(pk=self.product.pk)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            product.name = self.corpus['sellers'][1]['name']
+            product.save()
+
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(PendingComparison.objects.exists())
+        self.assertTrue(ProductComparison.objects.filter(seller_product=product).exists())
+
+    def test_broker_outage_keeps_product_queued(self):
+        """Test that a save still commits when the drain can't be scheduled, leaving the product queued"""
+        product = Product.objects.get(pk=self.product.pk)
+        with mock.patch.object(process_comparison_queue, 'delay', side_effect=OperationalError('connection refused')):
+            with self.captureOnCommitCallbacks(execute=True):
+                product.name = self.corpus['sellers'][1]['name']
+                product.save()
+
+        self.assertTrue(PendingComparison.objects.filter(seller_product=product).exists())
+
+    def test_repeated_saves_queue_once(self):
+        """Test that a product already waiting in the queue isn't queued twice"""
+        service = PriceComparisonService()
+
+        self.assertTrue(service.enqueue_comparison(self.product.pk))
+        self.assertFalse(service.enqueue_comparison(self.product.pk))
+        self.assertEqual(service.process_comparison_queue(), 1)
+        self.assertFalse(PendingComparison.objects.exists())
+
+
+class CatalogChangesTestCase(TestCase):
+    def setUp(self):
+        self.corpus, self.seller, _ = create_matching_fixture()
+        self.service = PriceComparisonService()
+        self.service.compare_all_products()
+
+    def assert_matches_full_rerun(self):
+        """A full rematch must find nothing left to change after incremental updates"""
+        service = PriceComparisonService()
+        service.compare_all_products()
+        self.assertEqual(service.last_run_stats['updated'], 0)
+
+    def test_recorder_classifies_changes(self):
+        """Test that the recorder tells new listings, title, price and removal changes apart"""
+        listings = list(CompetitorProduct.objects.filter(competitor='priceoye'))
+        recorder = CatalogChangeRecorder('priceoye')
+
+        unchanged, retitled, repriced = listings[:3]
+        self.assertIsNone(recorder.record(unchanged.title, unchanged.price, unchanged.url)[1])
+        self.assertEqual(recorder.record(retitled.title + ' 2025', retitled.price, retitled.url)[1].change_type, 'title')
+        self.assertEqual(recorder.record(repriced.title, repriced.price + 1, repriced.url)[1].change_type, 'price')
+        self.assertEqual(
+            recorder.record('Asus Vivobook 16 X1605 Core i5', 120000, 'https://priceoye.pk/laptops/asus/x1605')[1].change_type,
+            'new'
+        )
+        for listing in listings[3:-1]:
+            recorder.record(listing.title, listing.price, listing.url)
+        counts = recorder.finish()
+
+        self.assertEqual(counts, {'new': 1, 'title': 1, 'price': 1, 'deactivated': 1})
+        self.assertFalse(CompetitorProduct.objects.get(pk=listings[-1].pk).is_active)
+
+    def test_unseen_generations_are_swept(self):
+        """Test that a run deactivates listings it didn't stamp, guarded against partial runs"""
+        listings = list(CompetitorProduct.objects.filter(competitor='priceoye'))
+
+        def scrape(listings, **options):
+            recorder = CatalogChangeRecorder('priceoye')
+            for listing in listings:
+                recorder.record(listing.title, listing.price, listing.url)
+            return recorder, recorder.finish(**options)
+
+        # A failed run or one that saw under half the catalog deactivates nothing
+        self.assertEqual(scrape(listings[:-2], deactivate_missing=False)[1]['deactivated'], 0)
+        self.assertEqual(scrape(listings[:len(listings) // 3])[1]['deactivated'], 0)
+        self.assertEqual(CompetitorProduct.objects.filter(competitor='priceoye', is_active=False).count(), 0)
+
+        recorder, counts = scrape(listings[:-2])
+        self.assertEqual(counts['deactivated'], 2)
+        self.assertEqual(
+            set(CompetitorProduct.objects.filter(competitor='priceoye', is_active=False)), set(listings[-2:])
+        )
+        self.assertEqual(
+            set(CompetitorProduct.objects.filter(competitor='priceoye', scrape_generation=recorder.generation)),
+            set(listings[:-2])
+        )
+        self.assertEqual(CompetitorChange.objects.filter(change_type='deactivated').count(), 2)
+
+    def test_flush_writes_in_bulk(self):
+        """Test that a flush costs the same number of queries for a few listings or many"""
+        listings = list(CompetitorProduct.objects.filter(competitor='paklap')[:20])
+
+        def flush_queries(listings, suffix):
+            recorder = CatalogChangeRecorder('paklap')
+            for listing in listings:
+                recorder.record(listing.title, listing.price + 100, listing.url)
+                recorder.record(f'{listing.title} {suffix}', listing.price, f'{listing.url}?{suffix}')
+            with CaptureQueriesContext(connection) as queries:
+                recorder.flush()
+            return len(queries)
+
+        self.assertEqual(flush_queries(listings[:2], 'a'), flush_queries(listings[2:], 'b'))
+        self.assertEqual(PriceHistory.objects.count(), 20)
+        self.assertEqual(CompetitorChange.objects.filter(change_type='new').count(), 20)
+        history = PriceHistory.objects.get(competitor_product=listings[0])
+        self.assertEqual(history.new_price - history.old_price, 100)
+        self.assertTrue(CompetitorProduct.objects.get(title=f'{listings[0].title} a').has_match_features)
+
+    def test_listings_are_keyed_on_canonical_url(self):
+        """Test that a retitled listing reached through a variant of its URL updates the same row"""
+        listing = CompetitorProduct.objects.filter(competitor='priceoye').first()
+        variant = listing.url.replace('https://', 'http://www.') + '/?utm_source=newsletter#specs'
+        recorder = CatalogChangeRecorder('priceoye')
+
+        competitor_product, change = recorder.record(f'{listing.title} (2025)', listing.price, variant)
+        recorder.record(f'{listing.title} (2025)', listing.price, variant)
+        recorder.flush()
+
+        self.assertEqual(competitor_product.pk, listing.pk)
+        self.assertEqual(change.change_type, 'title')
+        self.assertEqual(CompetitorChange.objects.count(), 1)
+        self.assertEqual(CompetitorProduct.objects.get(pk=listing.pk).title, f'{listing.title} (2025)')
+        self.assertFalse(CompetitorProduct.objects.filter(title=listing.title).exists())
+
+    def test_duplicate_listings_are_merged(self):
+        """Test that the dedupe command folds rows of one listing into the most recently seen one"""
+        match = CompetitorMatch.objects.filter(competitor='paklap').select_related('competitor_product').first()
+        listing = match.competitor_product
+        survivor = CompetitorProduct.objects.create(
+            title=f'{listing.title} Price in Pakistan', competitor='paklap', price=listing.price - 500,
+            url=f'{listing.url}?moved', scrape_generation=1
+        )
+        # Rows written before listings were keyed on their URL
+        CompetitorProduct.objects.filter(pk=survivor.pk).update(url=listing.url.replace('https://www.', 'http://'))
+        PriceHistory.objects.create(competitor_product=listing, old_price=listing.price + 500, new_price=listing.price)
+
+        out = StringIO()
+        call_command('dedupe_competitor_products', dry_run=True, stdout=out)
+        self.assertIn('1 duplicates would be merged', out.getvalue())
+        self.assertTrue(CompetitorProduct.objects.filter(pk=listing.pk).exists())
+
+        call_command('dedupe_competitor_products', competitor='paklap', stdout=StringIO())
+        match.refresh_from_db()
+
+        self.assertFalse(CompetitorProduct.objects.filter(pk=listing.pk).exists())
+        self.assertEqual(match.competitor_product_id, survivor.pk)
+        self.assertEqual(match.price_difference, match.seller_product.price - survivor.price)
+        self.assertEqual(PriceHistory.objects.get().competitor_product_id, survivor.pk)
+        # Rekeyed on its canonical URL, so the next scrape finds it
+        recorder = CatalogChangeRecorder('paklap')
+        self.assertEqual(recorder.record(survivor.title, survivor.price, listing.url)[0].pk, survivor.pk)
+
+    def test_price_change_skips_matching(self):
+        """Test that a price-only change refreshes differences without re-matching anything"""
+        match = CompetitorMatch.objects.filter(competitor='priceoye').select_related('competitor_product').first()
+        recorder = CatalogChangeRecorder('priceoye')
+        recorder.record(match.competitor_product.title, 1000, match.competitor_product.url)
+        recorder.flush()
+
+        results = self.service.apply_catalog_changes()
+        match.refresh_from_db()
+
+        self.assertEqual(results, [])
+        self.assertGreaterEqual(self.service.last_run_stats['repriced'], 1)
+        self.assertEqual(match.price_difference, 149000)
+        self.assertFalse(CompetitorChange.objects.exists())
+        self.assert_matches_full_rerun()
+
+    def test_new_listing_rematches_affected_products_only(self):
+        """Test that a new listing only re-matches products sharing a block with it"""
+        recorder = CatalogChangeRecorder('paklap')
+        recorder.record('Apple Macbook Air 13 M4 16GB 256GB', 300000, 'https://www.paklap.pk/macbook-air-13-m4.html')
+        recorder.flush()
+
+        results = self.service.apply_catalog_changes()
+
+        self.assertLess(len(results), 6)
+        macbook = CompetitorMatch.objects.get(seller_product__name='Apple Macbook Air 13', competitor='paklap')
+        self.assertEqual(macbook.competitor_product.title, 'Apple Macbook Air 13 M4 16GB 256GB')
+        self.assert_matches_full_rerun()
+
+    def test_deactivated_match_is_replaced(self):
+        """Test that products matched to a vanished listing are re-matched"""
+        match = CompetitorMatch.objects.filter(competitor='priceoye').first()
+        vanished = match.competitor_product_id
+        recorder = CatalogChangeRecorder('priceoye')
+        for listing in CompetitorProduct.objects.filter(competitor='priceoye').exclude(pk=vanished):
+            recorder.record(listing.title, listing.price, listing.url)
+        recorder.finish()
+
+        self.service.apply_catalog_changes()
+
+        self.assertFalse(CompetitorMatch.objects.filter(
+            seller_product_id=match.seller_product_id, competitor='priceoye', competitor_product_id=vanished
+        ).exists())
+        self.assert_matches_full_rerun()
+
+
+class StubListingHandler(BaseHTTPRequestHandler):
+    """Serve the recorded listing pages the way the competitor sites page them"""
+    requests = []
+    failures = {}
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+        self.requests.append(self.path)
+
+        # Failures are keyed by path, or by path and query to fail a single page
+        key = self.path if self.path in self.failures else parts.path
+        if self.failures.get(key):
+            self.failures[key] -= 1
+            self.send_response(503)
+            self.end_headers()
+            return
+
+        if parts.path == '/laptops-prices.html':
+            fixture = SCRAPER_FIXTURES / f"paklap_p{query.get('p', ['1'])[0]}.html"
+        elif parts.path == '/laptops/':
+            fixture = SCRAPER_FIXTURES / f"priceoye_page{query.get('page', ['1'])[0]}.html"
+            if not fixture.exists():
+                fixture = SCRAPER_FIXTURES / 'priceoye_page3.html'
+        else:
+            fixture = None
+
+        if fixture is None or not fixture.exists():
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        body = fixture.read_bytes()
+        # PakLap answers conditional requests; PriceOye pages are only compared by content hash
+        etag = f'"{hashlib.md5(body).hexdigest()}"' if parts.path == '/laptops-prices.html' else None
+        if etag and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        if etag:
+            self.send_header('ETag', etag)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ScraperEngineTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubListingHandler)
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        StubListingHandler.requests = []
+        StubListingHandler.failures = {}
+
+    def test_paklap_pages_discovered_from_pagination(self):
+        """Test that numbered pages linked from page one are all fetched"""
+        pages, engine, errors, warnings = scrape_site(
+            PakLapSite(start_url=f'{self.base_url}/laptops-prices.html'), engine='http'
+        )
+
+        self.assertEqual((engine, errors), ('http', []))
+        self.assertEqual([len(page.listings) for page in pages], [4, 4, 4])
+        self.assertIn('/laptops-prices.html?p=3', StubListingHandler.requests)
+        listing = pages[0].listings[0]
+        self.assertEqual(listing.price, 250000)
+        self.assertTrue(listing.url.startswith('https://www.paklap.pk/'))
+        self.assertTrue(listing.title.startswith('Lenovo Slim 5 14 - Meteor Lake'))
+
+    def test_priceoye_pages_probed_until_exhausted(self):
+        """Test that a listing without pagination links is paged through its page parameter"""
+        pages, engine, errors, warnings = scrape_site(PriceOyeSite(start_url=f'{self.base_url}/laptops/'), engine='http')
+
+        self.assertEqual([len(page.listings) for page in pages], [4, 4])
+        self.assertEqual(len({listing.url for page in pages for listing in page.listings}), 8)
+        self.assertEqual(errors, [])
+
+    def test_transient_errors_are_retried(self):
+        """Test that 503s are retried with backoff before giving up"""
+        site = PriceOyeSite(start_url=f'{self.base_url}/laptops/')
+        StubListingHandler.failures = {'/laptops/': 2}
+        pages, engine, errors, warnings = scrape_site(site, engine='http', fetcher=Fetcher(backoff=0.01))
+        self.assertEqual(sum(len(page.listings) for page in pages), 8)
+
+        StubListingHandler.failures = {'/laptops/': 10}
+        with self.assertRaises(FetchError):
+            scrape_site(site, engine='http', fetcher=Fetcher(retries=1, backoff=0.01))
+
+    def test_scrape_command_records_listings(self):
+        """Test that the scrape command writes the fetched listings and logs the run"""
+        call_command(
+            'scrape_priceoye', engine='http', start_url=f'{self.base_url}/laptops/', stdout=StringIO()
+        )
+
+        log = ScrapingLog.objects.get(competitor='priceoye')
+        self.assertEqual(log.status, 'completed')
+        self.assertEqual(log.new_products, 8)
+        self.assertEqual(CompetitorProduct.objects.filter(competitor='priceoye', is_active=True).count(), 8)
+        self.assertEqual(CompetitorChange.objects.filter(change_type='new').count(), 8)
+
+    def test_parser_yields_listings_lazily(self):
+        """Test that the lxml parser stage is a generator and handles empty pages"""
+        site = PakLapSite()
+        html = (SCRAPER_FIXTURES / 'paklap_p2.html').read_text(encoding='utf-8')
+
+        listings = site.iter_listings(html, site.start_url)
+
+        self.assertTrue(inspect.isgenerator(listings))
+        self.assertEqual(len(list(listings)), 4)
+        self.assertEqual(list(site.iter_listings('', site.start_url)), [])
+
+    def test_snapshots_feed_parse_benchmark(self):
+        """Test that fetched pages can be saved and benchmarked per competitor"""
+        with tempfile.TemporaryDirectory() as snapshot_dir:
+            scrape_site(PriceOyeSite(start_url=f'{self.base_url}/laptops/'), engine='http', snapshot_dir=snapshot_dir)
+            self.assertTrue((Path(snapshot_dir) / 'priceoye_page2.html').exists())
+
+            out = StringIO()
+            call_command('bench_scrape_parse', snapshot_dir=snapshot_dir, repeat=1, stdout=out)
+
+        self.assertRegex(out.getvalue(), r'priceoye: \d+ pages, 8 listings')
+
+    def test_competitors_scraped_together(self):
+        """Test that one failing competitor is logged without stopping the others"""
+        runs = scrape_competitors([
+            PakLapSite(start_url=f'{self.base_url}/missing.html'),
+            PriceOyeSite(start_url=f'{self.base_url}/laptops/'),
+        ], engine='http')
+
+        self.assertEqual([run.log.status for run in runs], ['failed', 'completed'])
+        self.assertEqual(CompetitorProduct.objects.filter(competitor='priceoye').count(), 8)
+        self.assertFalse(CompetitorProduct.objects.filter(competitor='paklap').exists())
+
+    def test_recovered_http_failure_completes_the_run(self):
+        """Test that a Selenium fallback that renders every page completes the run and sweeps stale listings"""
+        site = PakLapSite(start_url=f'{self.base_url}/missing.html')
+        stale = CompetitorProduct.objects.create(
+            title='HP 250 G8 Core i3', competitor='paklap', price=90000, url='https://www.paklap.pk/hp-250-g8.html'
+        )
+
+        def render(scraper):
+            # Stands in for Chrome: the fixture pages as the browser would have rendered them
+            return [
+                build_page(
+                    site, number, site.page_url(number),
+                    (SCRAPER_FIXTURES / f'paklap_p{number}.html').read_text(encoding='utf-8')
+                )
+                for number in (1, 2, 3)
+            ]
+
+        with mock.patch.object(SeleniumScraper, 'scrape', render):
+            run, = scrape_competitors([site], engine='auto')
+
+        self.assertEqual((run.engine, run.errors), ('selenium', []))
+        self.assertEqual(run.log.status, 'completed')
+        self.assertIn('404', run.log.warnings)
+        self.assertEqual(run.log.errors, '')
+        self.assertEqual(CompetitorProduct.objects.filter(competitor='paklap', is_active=True).count(), 12)
+        stale.refresh_from_db()
+        self.assertFalse(stale.is_active)
+
+    def test_unchanged_pages_are_skipped(self):
+        """Test that a rescrape of unchanged pages skips parsing and writes nothing"""
+        sites = [
+            PakLapSite(start_url=f'{self.base_url}/laptops-prices.html'),
+            PriceOyeSite(start_url=f'{self.base_url}/laptops/'),
+        ]
+        scrape_competitors(sites, engine='http')
+        self.assertEqual(ScrapedPage.objects.count(), 5)
+
+        StubListingHandler.requests = []
+        with CaptureQueriesContext(connection) as queries:
+            runs = scrape_competitors(sites, engine='http')
+
+        self.assertEqual(
+            [(run.log.pages_processed, run.log.pages_skipped) for run in runs], [(0, 3), (0, 2)]
+        )
+        self.assertTrue(all(page.unchanged for run in runs for page in run.pages))
+        # Only the scrape generation is stamped on the listings seen
+        self.assertEqual([
+            query['sql'].split(' WHERE ')[0] for query in queries.captured_queries
+            if query['sql'].startswith(('INSERT INTO "price_comparison_competitor', 'UPDATE "price_comparison_competitor'))
+        ], [
+            f'UPDATE "price_comparison_competitorproduct" SET "scrape_generation" = {generation}'
+            for generation, pages in ((2, 3), (2, 2)) for _ in range(pages)
+        ])
+        self.assertEqual(CompetitorProduct.objects.filter(is_active=True).count(), 20)
+        self.assertEqual(CompetitorChange.objects.count(), 20)
+
+        # A page whose product cards changed is parsed again
+        ScrapedPage.objects.filter(url__endswith='?page=2').update(content_hash='stale')
+        run, = scrape_competitors([sites[1]], engine='http')
+        self.assertEqual((run.log.pages_processed, run.log.pages_skipped), (1, 1))
+
+        run, = scrape_competitors([sites[1]], engine='http', use_page_cache=False)
+        self.assertEqual((run.log.pages_processed, run.log.pages_skipped), (2, 0))
+
+    def test_interrupted_run_resumes_from_checkpoint(self):
+        """Test that saved pages survive a failed run and --resume only fetches the rest"""
+        site = PakLapSite(start_url=f'{self.base_url}/laptops-prices.html')
+        StubListingHandler.failures = {'/laptops-prices.html?p=3': 10}
+        run, = scrape_competitors([site], engine='http', fetcher=Fetcher(retries=0))
+
+        self.assertEqual(run.log.status, 'failed')
+        self.assertEqual(run.log.checkpoint.last_page, 2)
+        self.assertEqual(run.log.checkpoint.next_url, f'{self.base_url}/laptops-prices.html?p=3')
+        self.assertEqual(CompetitorProduct.objects.filter(competitor='paklap').count(), 8)
+
+        StubListingHandler.failures = {}
+        StubListingHandler.requests = []
+        call_command(
+            'scrape_paklap', engine='http', resume=True, start_url=f'{self.base_url}/laptops-prices.html',
+            stdout=StringIO()
+        )
+
+        log = ScrapingLog.objects.get()
+        self.assertEqual((log.pk, log.status), (run.log.pk, 'completed'))
+        self.assertEqual((log.products_scraped, log.new_products, log.pages_processed), (12, 12, 3))
+        self.assertEqual(log.checkpoint.last_page, 3)
+        self.assertNotIn('/laptops-prices.html?p=2', StubListingHandler.requests)
+        self.assertEqual(
+            CompetitorProduct.objects.filter(
+                competitor='paklap', is_active=True, scrape_generation=log.checkpoint.generation
+            ).count(),
+            12
+        )
+
+    def test_browser_resumes_from_the_recorded_url(self):
+        """Test that a resumed run renders from the checkpoint's URL, not one rebuilt from the page number"""
+        site = PakLapSite(start_url=f'{self.base_url}/laptops-prices.html')
+        ScrapeCheckpoint.objects.create(
+            scraping_log=ScrapingLog.objects.create(competitor='paklap', status='failed'),
+            generation=1, last_page=2, next_url=f'{self.base_url}/laptops-prices.html?cursor=abc'
+        )
+        started_at = []
+
+        def render(scraper):
+            started_at.append(scraper.start_url())
+            return []
+
+        with mock.patch.object(SeleniumScraper, 'scrape', render):
+            scrape_competitors([site], engine='selenium', resume=True)
+
+        self.assertEqual(started_at, [f'{self.base_url}/laptops-prices.html?cursor=abc'])
+
+    def test_site_adapters_register_themselves(self):
+        """Test that every competitor with a site adapter is picked up by the scrape commands"""
+        self.assertEqual(SITES, {'paklap': PakLapSite, 'priceoye': PriceOyeSite})
+        self.assertTrue(all(issubclass(site, ListingSite) for site in SITES.values()))
+        self.assertEqual(set(SITES), {competitor for competitor, _ in CompetitorProduct.COMPETITOR_CHOICES})
+
+
+class RecordingDriver:
+    """Stands in for a WebDriver in the browser pool tests"""
+
+    def __init__(self):
+        self.heap = 0
+        self.quit_called = False
+
+    def execute_script(self, script):
+        return self.heap
+
+    def delete_all_cookies(self):
+        pass
+
+    def quit(self):
+        self.quit_called = True
+
+
+class BrowserPoolTestCase(TestCase):
+    def test_drivers_are_reused_and_recycled(self):
+        """Test that idle drivers are reused until their page budget or heap limit runs out"""
+        pool = BrowserPool(size=1, recycle_after=2, max_heap_mb=100, driver_factory=RecordingDriver)
+
+        driver = pool.acquire()
+        pool.record_page_load(driver, 'paklap', 1.5)
+        pool.release(driver)
+        self.assertIs(pool.acquire(), driver)
+
+        pool.record_page_load(driver, 'paklap', 0.5)
+        pool.release(driver)
+        self.assertTrue(driver.quit_called)
+
+        bloated = pool.acquire()
+        self.assertIsNot(bloated, driver)
+        bloated.heap = 200 * 1024 * 1024
+        pool.release(bloated)
+        self.assertTrue(bloated.quit_called)
+
+        pool.record_page_load(pool.acquire(), 'priceoye', 3.0)
+        self.assertEqual(pool.page_load_stats('paklap'), {'pages': 2, 'mean': 1.0, 'median': 1.5, 'max': 1.5})
+        self.assertEqual(pool.page_load_stats()['pages'], 3)
+
+    def test_discarding_a_driver_wakes_a_waiting_scrape(self):
+        """Test that a scrape waiting on a full pool gets a replacement when a driver is discarded"""
+        pool = BrowserPool(size=1, driver_factory=RecordingDriver)
+        broken = pool.acquire()
+        leased = []
+        waiter = threading.Thread(target=lambda: leased.append(pool.acquire(timeout=5)))
+        waiter.start()
+
+        pool.release(broken, broken=True)
+        waiter.join(timeout=5)
+        self.assertEqual(len(leased), 1)
+        self.assertIsNot(leased[0], broken)
+        self.assertEqual(pool.created, 1)
+
+        with self.assertRaisesMessage(FetchError, 'No browser came free within 0.01s'):
+            pool.acquire(timeout=0.01)
+
+
+class PriceHistoryRollupTestCase(TestCase):
+    def setUp(self):
+        self.listing = CompetitorProduct.objects.create(
+            title='Lenovo Slim 5 14 Core Ultra 5', competitor='paklap', price=250000,
+            url='https://www.paklap.pk/lenovo-slim-5.html'
+        )
+
+    def reprice(self, price):
+        recorder = CatalogChangeRecorder('paklap')
+        recorder.record(self.listing.title, price, self.listing.url)
+        recorder.flush()
+
+    def test_price_changes_roll_up_daily(self):
+        """Test that bulk and single price changes fold into one rollup row per day"""
+        self.reprice(240000)
+        self.reprice(260000)
+        self.listing.refresh_from_db()
+        self.listing.price = 255000
+        self.listing.save()
+
+        rollup = DailyPrice.objects.get(competitor_product=self.listing)
+        self.assertEqual(rollup.day, timezone.localdate())
+        self.assertEqual((rollup.min_price, rollup.max_price, rollup.last_price), (240000, 260000, 255000))
+        self.assertEqual(rollup.changes, 3)
+
+    def test_old_history_is_compacted(self):
+        """Test that compaction rebuilds old days from raw rows and deletes only those rows"""
+        self.reprice(240000)
+        self.reprice(245000)
+        self.reprice(230000)
+        old, older, recent = PriceHistory.objects.order_by('changed_at')
+        PriceHistory.objects.filter(pk__in=[old.pk, older.pk]).update(changed_at=timezone.now() - timedelta(days=40))
+        DailyPrice.objects.all().delete()
+
+        call_command('compact_price_history', days=30, stdout=StringIO())
+
+        self.assertEqual(list(PriceHistory.objects.all()), [recent])
+        rollup = DailyPrice.objects.get()
+        self.assertEqual(rollup.day, timezone.localdate() - timedelta(days=40))
+        self.assertEqual((rollup.min_price, rollup.max_price, rollup.last_price, rollup.changes), (240000, 250000, 245000, 2))
+
+        call_command('compact_price_history', rebuild=True, stdout=StringIO())
+        self.assertEqual(DailyPrice.objects.count(), 2)
+
+    def test_price_curve_served_from_rollup(self):
+        """Test that the price curve endpoint reads the rollup, not the raw history"""
+        product = Product.objects.create(
+            seller=create_seller(), name='Lenovo Slim 5', brand='Lenovo', price=245000, stock=5, category='laptop'
+        )
+        CompetitorMatch.objects.update_or_create(
+            seller_product=product, competitor='paklap', defaults={'competitor_product': self.listing}
+        )
+        self.reprice(240000)
+        PriceHistory.objects.all().delete()
+        self.client.login(username='seller', password='testpass123')
+
+        response = self.client.get(reverse('price_comparison:price_curve_api', args=[product.id]), {'days': 30})
+
+        curve, = response.json()['curves']
+        self.assertEqual(curve['competitor'], 'PakLap')
+        self.assertEqual(curve['points'], [{
+            'day': timezone.localdate().isoformat(), 'min': '240000.00', 'max': '250000.00', 'last': '240000.00'
+        }])
+
+
+class CompetitorSearchTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        create_corpus_competitors(load_matching_corpus())
+
+    def test_prefix_search_is_ranked_and_synced_by_upserts(self):
+        """Test that search finds titles by word prefix and follows bulk upserts"""
+        results = search_competitor_products('dell inspir', competitor='priceoye')
+
+        self.assertTrue(results)
+        self.assertTrue(all('dell inspiron' in result['title'].lower() for result in results))
+
+        recorder = CatalogChangeRecorder('priceoye')
+        recorder.record('Zephyrus G14 Ryzen 9 Gaming', 450000, 'https://priceoye.pk/laptops/asus/zephyrus-g14')
+        recorder.flush()
+        cache.clear()
+        self.assertEqual(
+            [result['title'] for result in search_competitor_products('zephyrus g14')], ['Zephyrus G14 Ryzen 9 Gaming']
+        )
+
+        CompetitorProduct.objects.filter(title__startswith='Zephyrus').update(is_active=False)
+        cache.clear()
+        self.assertEqual(search_competitor_products('zephyrus g14'), [])
+
+    def test_repeated_queries_are_cached(self):
+        """Test that a repeated query is answered without touching the database"""
+        results = search_competitor_products('HP Victus')
+
+        with self.assertNumQueries(0):
+            self.assertEqual(search_competitor_products('hp  victus'), results)
+
+    def test_long_queries_make_valid_cache_keys(self):
+        """Test that spaces and long input in a query don't end up in the cache key"""
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', CacheKeyWarning)
+            search_competitor_products('hp victus gaming ' * 40)
+
+    def test_broad_queries_rank_every_match(self):
+        """Test that an older listing still ranks first when many newer ones match the query"""
+        best = CompetitorProduct.objects.create(
+            title='Acer Swift', competitor='paklap', price=200000, url='https://www.paklap.pk/acer-swift.html'
+        )
+        CompetitorProduct.objects.bulk_create([
+            CompetitorProduct(
+                title=f'Acer Aspire 3 Core i5 16GB 512GB SSD Silver Backlit Keyboard Variant {i}',
+                competitor='paklap', price=150000, url=f'https://www.paklap.pk/acer-aspire-{i}.html', url_key=f'aspire-{i}'
+            )
+            for i in range(600)
+        ])
+
+        self.assertEqual(search_competitor_products('acer', limit=1)[0]['id'], best.pk)
+
+    def test_search_api(self):
+        """Test that the search endpoint returns the ranked results"""
+        user = User.objects.create_user(username='buyer', email='buyer@example.com', password='testpass123')
+        self.client.force_login(user)
+
+        response = self.client.get(reverse('price_comparison:search_api'), {'q': 'lenovo', 'competitor': 'paklap'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], search_competitor_products('lenovo', competitor='paklap'))
@@ -14,6 +14,8 @@ urlpatterns = [
     # AJAX endpoints
     path('refresh/<int:product_id>/', views.refresh_product_comparison, name='refresh_product'),
     path('refresh-all/', views.refresh_all_comparisons, name='refresh_all'),
+    path('pick-match/<int:product_id>/', views.pick_comparison_match, name='pick_match'),
     path('api/insights/', views.pricing_insights_api, name='insights_api'),
     path('api/search/', views.competitor_search_api, name='search_api'),
+    path('api/price-curve/<int:product_id>/', views.price_curve_api, name='price_curve_api'),
 ]
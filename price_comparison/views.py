@@ -3,12 +3,16 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
 from django.core.paginator import Paginator
-from django.db.models import Q
+from django.utils import timezone
 from accounts.decorators import seller_required
 from products.models import Product
-from .models import ProductComparison, CompetitorProduct, ScrapingLog
+from .models import (
+    ProductComparison, ComparisonCandidate, CompetitorMatch, CompetitorProduct, DailyPrice, ScrapingLog
+)
+from .search import search_competitor_products
 from .services import PriceComparisonService
 import json
+from datetime import timedelta
 
 
 @login_required
@@ -23,11 +27,11 @@ def price_comparison_dashboard(request):
     
     # Get recent comparisons (only for laptops)
     recent_comparisons = ProductComparison.objects.filter(
-        seller_product__seller=seller,
-        seller_product__is_active=True,
-        seller_product__category='laptop'  # Only laptops
-    ).select_related(
-        'seller_product', 'best_paklap_match', 'best_priceoye_match'
+        seller=seller,
+        is_active=True,
+        category='laptop'  # Only laptops
+    ).select_related('seller_product').prefetch_related(
+        'seller_product__competitor_matches__competitor_product'
     ).order_by('-last_compared')[:10]
     
     # Get recent scraping logs
@@ -39,6 +43,7 @@ def price_comparison_dashboard(request):
         'insights': insights,
         'recent_comparisons': recent_comparisons,
         'recent_logs': recent_logs,
+        'competitor_choices': CompetitorProduct.COMPETITOR_CHOICES,
     }
     
     return render(request, 'price_comparison/dashboard.html', context)
@@ -55,13 +60,13 @@ def product_comparisons_list(request):
     category_filter = request.GET.get('category', '')
     competitive_status = request.GET.get('status', '')
     
-    # Base queryset (only for laptops)
+    # Base queryset (only for laptops); the product fields are copied onto each comparison
     comparisons = ProductComparison.objects.filter(
-        seller_product__seller=seller,
-        seller_product__is_active=True,
-        seller_product__category='laptop'  # Only laptops
-    ).select_related(
-        'seller_product', 'best_paklap_match', 'best_priceoye_match'
+        seller=seller,
+        is_active=True,
+        category='laptop'  # Only laptops
+    ).select_related('seller_product').prefetch_related(
+        'seller_product__competitor_matches__competitor_product'
     ).order_by('-last_compared')
     
     # Apply filters
@@ -72,30 +77,12 @@ def product_comparisons_list(request):
     
     if category_filter:
         comparisons = comparisons.filter(
-            seller_product__category=category_filter
+            category=category_filter
         )
     
-    if competitive_status:
-        if competitive_status == 'competitive':
-            comparisons = comparisons.filter(
-                Q(paklap_price_difference__gte=-100, paklap_price_difference__lte=100) |
-                Q(priceoye_price_difference__gte=-100, priceoye_price_difference__lte=100)
-            )
-        elif competitive_status == 'overpriced':
-            comparisons = comparisons.filter(
-                Q(paklap_price_difference__gt=100) |
-                Q(priceoye_price_difference__gt=100)
-            )
-        elif competitive_status == 'underpriced':
-            comparisons = comparisons.filter(
-                Q(paklap_price_difference__lt=-100) |
-                Q(priceoye_price_difference__lt=-100)
-            )
-        elif competitive_status == 'no_match':
-            comparisons = comparisons.filter(
-                best_paklap_match__isnull=True,
-                best_priceoye_match__isnull=True
-            )
+    # Served by the (seller, is_active, category, competitive_status, last_compared) index
+    if competitive_status in dict(ProductComparison.COMPETITIVE_STATUS_CHOICES):
+        comparisons = comparisons.filter(competitive_status=competitive_status)
     
     # Pagination
     paginator = Paginator(comparisons, 20)
@@ -111,6 +98,7 @@ def product_comparisons_list(request):
         'category_filter': category_filter,
         'competitive_status': competitive_status,
         'categories': categories,
+        'competitor_choices': CompetitorProduct.COMPETITOR_CHOICES,
     }
     
     return render(request, 'price_comparison/product_list.html', context)
@@ -129,8 +117,7 @@ def product_comparison_detail(request, product_id):
         context = {
             'product': product,
             'comparison': None,
-            'similar_paklap': [],
-            'similar_priceoye': [],
+            'competitor_slots': [],
             'is_accessory': True
         }
         return render(request, 'price_comparison/product_detail.html', context)
@@ -146,33 +133,36 @@ def product_comparison_detail(request, product_id):
         else:
             messages.error(request, 'Could not create price comparison for this product.')
     
-    # Get similar products from competitors
-    similar_paklap = CompetitorProduct.objects.filter(
-        competitor='paklap',
-        is_active=True
-    ).exclude(id=comparison.best_paklap_match.id if comparison.best_paklap_match else None)
-    
-    similar_priceoye = CompetitorProduct.objects.filter(
-        competitor='priceoye',
-        is_active=True
-    ).exclude(id=comparison.best_priceoye_match.id if comparison.best_priceoye_match else None)
-    
-    # Find similar products by name matching
-    if comparison.best_paklap_match:
-        similar_paklap = similar_paklap.filter(
-            title__icontains=product.name.split()[0] if product.name.split() else ''
-        )[:5]
+    matches = {
+        match.competitor: match
+        for match in CompetitorMatch.objects.filter(seller_product=product).select_related('competitor_product')
+    }
     
-    if comparison.best_priceoye_match:
-        similar_priceoye = similar_priceoye.filter(
-            title__icontains=product.name.split()[0] if product.name.split() else ''
-        )[:5]
+    # Runner-up candidates the matcher scored for this product, best first
+    candidates = ComparisonCandidate.objects.filter(
+        seller_product=product,
+        competitor_product__is_active=True
+    ).exclude(
+        competitor_product_id__in=[match.competitor_product_id for match in matches.values()]
+    ).select_related('competitor_product')
+    
+    # One card per competitor with its match and the runners-up stored besides it
+    candidate_count = PriceComparisonService().candidate_count
+    competitor_slots = [
+        {
+            'competitor': competitor,
+            'name': name,
+            'match': matches.get(competitor),
+            'candidates': [candidate for candidate in candidates if candidate.competitor == competitor][:candidate_count],
+        }
+        for competitor, name in CompetitorProduct.COMPETITOR_CHOICES
+    ]
     
     context = {
         'product': product,
         'comparison': comparison,
-        'similar_paklap': similar_paklap,
-        'similar_priceoye': similar_priceoye,
+        'competitor_slots': competitor_slots,
+        'has_candidates': any(slot['candidates'] for slot in competitor_slots),
     }
     
     return render(request, 'price_comparison/product_detail.html', context)
@@ -203,18 +193,60 @@ def refresh_product_comparison(request, product_id):
                 'error': 'Could not create price comparison for this product.'
             }, status=400)
         
-        return JsonResponse({
+        response = {
             'success': True,
             'message': 'Comparison updated successfully!',
-            'paklap_price': str(comparison.best_paklap_match.price) if comparison.best_paklap_match else None,
-            'priceoye_price': str(comparison.best_priceoye_match.price) if comparison.best_priceoye_match else None,
-            'paklap_difference': str(comparison.paklap_price_difference) if comparison.paklap_price_difference else None,
-            'priceoye_difference': str(comparison.priceoye_price_difference) if comparison.priceoye_price_difference else None,
-        })
+        }
+        matches = {match.competitor: match for match in comparison.get_matches()}
+        for competitor in CompetitorProduct.COMPETITORS:
+            match = matches.get(competitor)
+            response[f'{competitor}_price'] = str(match.competitor_product.price) if match else None
+            response[f'{competitor}_difference'] = str(match.price_difference) if match and match.price_difference else None
+        return JsonResponse(response)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
 
+@login_required
+@seller_required
+def pick_comparison_match(request, product_id):
+    """Override a product's match with one of its stored candidates, or go back to the matcher's pick"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    
+    seller = request.user
+    comparison = get_object_or_404(
+        ProductComparison.objects.select_related('seller_product'), seller_product_id=product_id, seller=seller
+    )
+    comparison_service = PriceComparisonService()
+    
+    competitor = request.POST.get('unpin')
+    if competitor:
+        if competitor not in dict(CompetitorProduct.COMPETITOR_CHOICES):
+            return JsonResponse({'error': 'Unknown competitor.'}, status=400)
+        comparison_service.unpin_match(comparison, competitor)
+        return JsonResponse({'success': True, 'message': 'Automatic matching restored.'})
+    
+    try:
+        candidate_id = int(request.POST.get('candidate_id', ''))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid candidate.'}, status=400)
+    candidate = get_object_or_404(
+        ComparisonCandidate.objects.select_related('competitor_product'),
+        pk=candidate_id, seller_product_id=product_id, competitor_product__is_active=True
+    )
+    match = comparison_service.pick_candidate(comparison, candidate)
+    
+    return JsonResponse({
+        'success': True,
+        'message': 'Match updated successfully!',
+        'competitor': candidate.competitor,
+        'price': str(candidate.competitor_product.price),
+        'difference': str(match.price_difference),
+        'confidence': round(candidate.score, 3),
+    })
+
+
 @login_required
 @seller_required
 def refresh_all_comparisons(request):
@@ -227,11 +259,15 @@ def refresh_all_comparisons(request):
     try:
         comparison_service = PriceComparisonService()
         results = comparison_service.compare_all_products(seller=seller)
+        stats = comparison_service.last_run_stats
         
         return JsonResponse({
             'success': True,
             'message': f'Updated {len(results)} product comparisons successfully!',
-            'updated_count': len(results)
+            'updated_count': len(results),
+            'changed_count': stats['created'] + stats['updated'],
+            'duration_seconds': round(stats['seconds'], 3),
+            'products_per_second': round(stats['products_per_second'], 1),
         })
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
@@ -249,6 +285,53 @@ def pricing_insights_api(request):
     return JsonResponse(insights)
 
 
+@login_required
+@seller_required
+def price_curve_api(request, product_id):
+    """API endpoint for the daily competitor price curves of a seller's product"""
+    product = get_object_or_404(Product, id=product_id, seller=request.user)
+    try:
+        days = min(max(int(request.GET.get('days', 90)), 1), 730)
+    except ValueError:
+        days = 90
+    
+    matches = [
+        match.competitor_product
+        for match in sorted(
+            CompetitorMatch.objects.filter(seller_product=product).select_related('competitor_product'),
+            key=lambda match: CompetitorProduct.COMPETITORS.index(match.competitor)
+        )
+    ]
+    
+    # Served from the daily rollup only, never the raw price history
+    points = {match.id: [] for match in matches}
+    for rollup in DailyPrice.objects.filter(
+        competitor_product__in=matches, day__gte=timezone.localdate() - timedelta(days=days)
+    ):
+        points[rollup.competitor_product_id].append({
+            'day': rollup.day.isoformat(),
+            'min': str(rollup.min_price),
+            'max': str(rollup.max_price),
+            'last': str(rollup.last_price),
+        })
+    
+    return JsonResponse({
+        'product': product.id,
+        'price': str(product.price),
+        'days': days,
+        'curves': [
+            {
+                'competitor': match.get_competitor_display(),
+                'competitor_product': match.id,
+                'title': match.title,
+                'current_price': str(match.price),
+                'points': points[match.id],
+            }
+            for match in matches
+        ],
+    })
+
+
 def competitor_search_api(request):
     """API endpoint to search competitor products"""
     query = request.GET.get('q', '')
@@ -257,24 +340,5 @@ def competitor_search_api(request):
     if not query or len(query) < 3:
         return JsonResponse({'results': []})
     
-    products = CompetitorProduct.objects.filter(
-        title__icontains=query,
-        is_active=True
-    )
-    
-    if competitor:
-        products = products.filter(competitor=competitor)
-    
-    products = products[:10]
-    
-    results = []
-    for product in products:
-        results.append({
-            'id': product.id,
-            'title': product.title,
-            'price': str(product.price),
-            'competitor': product.get_competitor_display(),
-            'url': product.url
-        })
-    
-    return JsonResponse({'results': results})
+    # Ranked title search over the FTS index, cached briefly for repeated keystrokes
+    return JsonResponse({'results': search_competitor_products(query, competitor=competitor)})
@@ -0,0 +1,29 @@
+"""Process-pool workers for bulk price comparison.
+
+This module avoids importing models at import time so spawned worker
+processes can load it before Django is set up.
+"""
+
+_service = None
+_indexes = None
+
+
+def init_match_worker(service_options, indexes):
+    """Set up Django and the matching service once per worker process"""
+    global _service, _indexes
+    
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+    
+    from .services import PriceComparisonService
+    _service = PriceComparisonService(**service_options)
+    # The pool already uses every core, so keep each worker's scorer single-threaded
+    _service.scorer.workers = 1
+    _indexes = indexes
+
+
+def match_chunk(product_features):
+    """Match a chunk of (features, cleaned name) pairs against the snapshot"""
+    return _service.match_features_bulk(product_features, _indexes)
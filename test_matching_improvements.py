@@ -7,157 +7,40 @@ the HP Victus 15 vs HP Pavilion 14 matching issue.
 
 import sys
 import os
-import re
 from difflib import SequenceMatcher
 
-# Simulate the improved PriceComparisonService logic
+# Use the matcher's own feature extraction instead of a copy of it
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from price_comparison.matching import clean_product_name, extract_key_features, score_features
+
+
 class ImprovedPriceComparisonService:
-    """Simulation of the improved service for testing"""
+    """Django-free stand-in for PriceComparisonService built on the shared matching module"""
     
     def __init__(self):
         self.min_confidence = 0.4  # Increased from 0.3 for better accuracy
     
     def clean_product_name(self, name):
         """Clean and normalize product name for better matching"""
-        # Convert to lowercase
-        name = name.lower()
-        
-        # Remove common words that don't help with matching
-        stop_words = ['laptop', 'computer', 'pc', 'the', 'and', 'with', 'for', 'of', 'in', 'inch', '"', 'prices', 'pakistan']
-        
-        # Remove special characters and extra spaces
-        name = re.sub(r'[^\w\s]', ' ', name)
-        name = re.sub(r'\s+', ' ', name).strip()
-        
-        # Remove stop words
-        words = [word for word in name.split() if word not in stop_words]
-        
-        return ' '.join(words)
+        return clean_product_name(name)
     
     def extract_key_features(self, name):
         """Extract key features like model numbers, screen sizes, etc."""
-        name_lower = name.lower()
-        features = {
-            'brand': None,
-            'model_number': None,
-            'screen_size': None,
-            'processor': None,
-            'special_features': []
-        }
-        
-        # Extract brand
-        brands = ['hp', 'dell', 'lenovo', 'asus', 'acer', 'msi', 'apple', 'samsung']
-        for brand in brands:
-            if brand in name_lower:
-                features['brand'] = brand
-                break
-        
-        # Extract model numbers (improved to include victus and other models)
-        model_pattern = r'(pavilion|inspiron|thinkpad|vivobook|aspire|victus|latitude|precision|ideapad|legion|zenbook|tuf|rog)\s*(\d+)'
-        model_match = re.search(model_pattern, name_lower)
-        if model_match:
-            features['model_number'] = f"{model_match.group(1)} {model_match.group(2)}"
-        
-        # Extract screen size
-        size_pattern = r'(\d+\.?\d*)\s*inch|\b(\d+)\s*"|\b(\d+)\s*in\b'
-        size_match = re.search(size_pattern, name_lower)
-        if size_match:
-            features['screen_size'] = size_match.group(1) or size_match.group(2) or size_match.group(3)
-        
-        # Extract processor info
-        processor_pattern = r'(core\s*i\d+|ryzen\s*\d+|celeron|pentium|m\d+)'
-        processor_match = re.search(processor_pattern, name_lower)
-        if processor_match:
-            features['processor'] = processor_match.group(1)
-        
-        # Extract special features
-        special_features = ['gaming', 'touch', 'convertible', '2in1', 'ultrabook', 'business']
-        for feature in special_features:
-            if feature in name_lower:
-                features['special_features'].append(feature)
-        
-        return features
+        return extract_key_features(name)
     
     def calculate_similarity(self, text1, text2):
         """Calculate similarity between two text strings using improved feature-based matching"""
-        # Extract features from both products
-        features1 = self.extract_key_features(text1)
-        features2 = self.extract_key_features(text2)
-        
-        # Clean text for basic comparison
         clean_text1 = self.clean_product_name(text1)
         clean_text2 = self.clean_product_name(text2)
         
-        # Use sequence matcher for basic similarity
+        # Use sequence matcher for basic similarity, like the difflib scorer
         basic_similarity = SequenceMatcher(None, clean_text1, clean_text2).ratio()
         
-        # Feature-based scoring
-        feature_score = 0.0
-        feature_weight = 0.0
-        
-        # Brand matching (very important - 30% weight)
-        if features1['brand'] and features2['brand']:
-            feature_weight += 0.3
-            if features1['brand'] == features2['brand']:
-                feature_score += 0.3
-            # Penalize different brands heavily
-            else:
-                feature_score -= 0.2  # Negative score for different brands
-        
-        # Model number matching (very important - 25% weight)
-        if features1['model_number'] and features2['model_number']:
-            feature_weight += 0.25
-            if features1['model_number'] == features2['model_number']:
-                feature_score += 0.25
-            # Partial model match (e.g., pavilion 15 vs pavilion 14)
-            elif features1['model_number'].split()[0] == features2['model_number'].split()[0]:
-                # Same series but different size - much lower score
-                feature_score += 0.05
-            # Different model series - negative score
-            else:
-                feature_score -= 0.15
-        
-        # Screen size matching (important - 15% weight)
-        if features1['screen_size'] and features2['screen_size']:
-            feature_weight += 0.15
-            if features1['screen_size'] == features2['screen_size']:
-                feature_score += 0.15
-        
-        # Processor matching (important - 15% weight)
-        if features1['processor'] and features2['processor']:
-            feature_weight += 0.15
-            if features1['processor'] == features2['processor']:
-                feature_score += 0.15
-        
-        # Special features matching (moderate - 15% weight)
-        if features1['special_features'] or features2['special_features']:
-            feature_weight += 0.15
-            common_features = set(features1['special_features']).intersection(set(features2['special_features']))
-            all_features = set(features1['special_features']).union(set(features2['special_features']))
-            if all_features:
-                feature_similarity = len(common_features) / len(all_features)
-                feature_score += 0.15 * feature_similarity
-        
-        # Word-based similarity for remaining comparison
-        words1 = set(clean_text1.split())
-        words2 = set(clean_text2.split())
-        
-        word_similarity = 0.0
-        if words1 and words2:
-            common_words = words1.intersection(words2)
-            word_similarity = len(common_words) / max(len(words1), len(words2))
-        
-        # Combine scores with weights
-        if feature_weight > 0:
-            # Normalize feature score
-            normalized_feature_score = feature_score / feature_weight if feature_weight > 0 else 0
-            # 70% feature-based, 20% word-based, 10% basic similarity
-            final_similarity = (normalized_feature_score * 0.7) + (word_similarity * 0.2) + (basic_similarity * 0.1)
-        else:
-            # Fallback to original method if no features extracted
-            final_similarity = (basic_similarity * 0.6) + (word_similarity * 0.4)
-        
-        return min(final_similarity, 1.0)  # Ensure score doesn't exceed 1.0
+        return score_features(
+            self.extract_key_features(text1), clean_text1,
+            self.extract_key_features(text2), clean_text2,
+            basic_similarity
+        )
 
 
 def test_matching_scenarios():
@@ -102,6 +102,7 @@ def test_price_comparison():
     print("=" * 50)
     
     try:
+        from price_comparison.models import CompetitorProduct
         from price_comparison.services import PriceComparisonService
         from products.models import Product
         
@@ -122,21 +123,16 @@ def test_price_comparison():
         print(f"   • Product: {product.name}")
         print(f"   • Your Price: PKR {product.price:,}")
         
-        if comparison.best_paklap_match:
-            print(f"   • PakLap Match: {comparison.best_paklap_match.title}")
-            print(f"   • PakLap Price: PKR {comparison.best_paklap_match.price:,}")
-            print(f"   • PakLap Confidence: {comparison.match_confidence_paklap:.2f}")
-            print(f"   • Price Difference: PKR {comparison.paklap_price_difference:,}")
-        else:
-            print(f"   • No PakLap match found")
-        
-        if comparison.best_priceoye_match:
-            print(f"   • PriceOye Match: {comparison.best_priceoye_match.title}")
-            print(f"   • PriceOye Price: PKR {comparison.best_priceoye_match.price:,}")
-            print(f"   • PriceOye Confidence: {comparison.match_confidence_priceoye:.2f}")
-            print(f"   • Price Difference: PKR {comparison.priceoye_price_difference:,}")
-        else:
-            print(f"   • No PriceOye match found")
+        matches = {match.competitor: match for match in comparison.get_matches()}
+        for competitor, name in CompetitorProduct.COMPETITOR_CHOICES:
+            match = matches.get(competitor)
+            if match:
+                print(f"   • {name} Match: {match.competitor_product.title}")
+                print(f"   • {name} Price: PKR {match.competitor_product.price:,}")
+                print(f"   • {name} Confidence: {match.confidence:.2f}")
+                print(f"   • Price Difference: PKR {match.price_difference:,}")
+            else:
+                print(f"   • No {name} match found")
         
         return True
         